@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Los módulos compartidos entre las apps del curso (comun/) están en la raíz del repositorio
+_RAIZ_REPO = str(Path(__file__).resolve().parents[2])
+if _RAIZ_REPO not in sys.path:
+    sys.path.append(_RAIZ_REPO)
@@ -2,17 +2,18 @@
 import redis
 import json
 from typing import Optional, Any
-import os
+from monitoring.tracing import tracer
+from app.config import settings
+from app.cache.redis_registry import redis_registry
+from app.middleware.deadline import timeout_restante
 
 class GenericCacheConfig:
     def __init__(self):
-        # Conexión genérica a Redis
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=os.getenv('REDIS_PORT', 6379),
-            db=0,
-            decode_responses=True
-        )
+        # Timeout de socket; con deadline activo se usa el menor de los dos
+        self.socket_timeout = settings.redis_socket_timeout
+
+        # Cliente sobre el pool compartido del propósito 'cache'
+        self.redis_client = redis.Redis(connection_pool=redis_registry.pool('cache'))
 
         # TTLs genéricos por tipo de dato
         self.cache_ttl = {
@@ -28,18 +29,26 @@ class GenericCacheConfig:
 
     def set_cache(self, key: str, value: Any, ttl_type: str = 'tipo_a') -> bool:
         """Almacena datos en cache con TTL específico."""
+        if timeout_restante(self.socket_timeout) <= 0:
+            return False  # Sin presupuesto: no gastamos tiempo en el cache
         try:
             serialized_value = json.dumps(value)
             ttl = self.cache_ttl.get(ttl_type, 300)
-            return self.redis_client.setex(key, ttl, serialized_value)
+            with tracer.span("cache.set", kind="client", **{"cache.key": key}):
+                return self.redis_client.setex(key, ttl, serialized_value)
         except Exception as e:
             print(f"Error setting cache: {e}")
             return False
 
     def get_cache(self, key: str) -> Optional[Any]:
         """Recupera datos del cache."""
+        if timeout_restante(self.socket_timeout) <= 0:
+            return None  # Sin presupuesto: se trata como miss
         try:
-            cached_value = self.redis_client.get(key)
+            with tracer.span("cache.get", kind="client", **{"cache.key": key}) as span:
+                cached_value = self.redis_client.get(key)
+                if span is not None:
+                    span.set_attribute("cache.hit", cached_value is not None)
             if cached_value:
                 return json.loads(cached_value)
             return None
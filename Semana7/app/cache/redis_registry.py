@@ -0,0 +1,115 @@
+# app/cache/redis_registry.py
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import settings as default_settings
+
+logger = logging.getLogger(__name__)
+
+
+class RedisRegistry:
+    """
+    Registro único de conexiones a Redis. Cada propósito (cache, rate_limit,
+    metrics) usa su base de datos lógica y comparte un pool síncrono y otro
+    asíncrono, con los mismos timeouts y health checks para toda la app.
+    Los clientes `redis.Redis` son envoltorios baratos sobre el pool.
+    """
+
+    def __init__(self, settings=default_settings):
+        self.settings = settings
+        self._pools: Dict[str, redis.ConnectionPool] = {}
+        self._async_pools: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _db(self, purpose: str) -> int:
+        if purpose not in self.settings.redis_dbs:
+            raise ValueError(f"Propósito de Redis desconocido: {purpose}")
+        return self.settings.redis_dbs[purpose]
+
+    def _pool_kwargs(self, purpose: str) -> Dict[str, Any]:
+        s = self.settings
+        return {
+            "host": s.redis_host,
+            "port": s.redis_port,
+            "password": s.redis_password,
+            "db": self._db(purpose),
+            "decode_responses": True,
+            "socket_timeout": s.redis_socket_timeout,
+            "socket_connect_timeout": s.redis_connect_timeout,
+            "health_check_interval": s.redis_health_check_interval,
+            "max_connections": s.redis_max_connections,
+            "timeout": s.redis_pool_timeout,
+        }
+
+    def pool(self, purpose: str) -> redis.ConnectionPool:
+        with self._lock:
+            if purpose not in self._pools:
+                self._pools[purpose] = redis.BlockingConnectionPool(**self._pool_kwargs(purpose))
+            return self._pools[purpose]
+
+    async def async_pool(self, purpose: str):
+        # Las conexiones asyncio quedan ligadas a su event loop
+        loop = asyncio.get_running_loop()
+        anterior = None
+        with self._lock:
+            entry = self._async_pools.get(purpose)
+            if entry is None or entry[0] is not loop:
+                anterior = entry
+                entry = (loop, aioredis.BlockingConnectionPool(**self._pool_kwargs(purpose)))
+                self._async_pools[purpose] = entry
+        if anterior is not None:
+            # El pool de otro loop se reemplaza: cerramos sus conexiones en vez de dejarlas colgadas
+            try:
+                await anterior[1].disconnect()
+            except Exception as e:
+                logger.warning("No se pudo cerrar el pool async anterior de %s: %s", purpose, e)
+        return entry[1]
+
+    def client(self, purpose: str) -> redis.Redis:
+        return redis.Redis(connection_pool=self.pool(purpose))
+
+    async def async_client(self, purpose: str) -> aioredis.Redis:
+        return aioredis.Redis(connection_pool=await self.async_pool(purpose))
+
+    def health_check(self) -> Dict[str, Dict[str, Any]]:
+        """Hace PING por cada propósito y mide la latencia."""
+        result = {}
+        for purpose in self.settings.redis_dbs:
+            start = time.perf_counter()
+            try:
+                self.client(purpose).ping()
+                result[purpose] = {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+            except Exception as e:
+                result[purpose] = {"ok": False, "error": str(e)}
+        return result
+
+    @staticmethod
+    def _stats(pool, max_connections) -> Dict[str, Any]:
+        # API pública de redis-py (get_connection_count): pares (cantidad, atributos) por estado
+        por_estado = {attrs.get("db.client.connection.state"): n for n, attrs in pool.get_connection_count()}
+        in_use, available = por_estado.get("used", 0), por_estado.get("idle", 0)
+        return {
+            "in_use": in_use,
+            "available": available,
+            "created": in_use + available,
+            "max_connections": max_connections,
+        }
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Uso de los pools (conexiones en uso, libres y creadas) por propósito."""
+        max_conn = self.settings.redis_max_connections
+        stats = {}
+        for purpose, pool in self._pools.items():
+            stats[purpose] = {"sync": self._stats(pool, max_conn)}
+        for purpose, (_, pool) in self._async_pools.items():
+            stats.setdefault(purpose, {})["async"] = self._stats(pool, max_conn)
+        return stats
+
+
+redis_registry = RedisRegistry()
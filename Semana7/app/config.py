@@ -0,0 +1,27 @@
+# app/config.py
+import os
+
+
+class Settings:
+    """Configuración centralizada de la aplicación (leída una sola vez del entorno)."""
+
+    def __init__(self):
+        # Redis
+        self.redis_host = os.getenv("REDIS_HOST", "localhost")
+        self.redis_port = int(os.getenv("REDIS_PORT", "6379"))
+        self.redis_password = os.getenv("REDIS_PASSWORD") or None
+        self.redis_socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+        self.redis_connect_timeout = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0"))
+        self.redis_max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.redis_pool_timeout = float(os.getenv("REDIS_POOL_TIMEOUT", "1.0"))
+        self.redis_health_check_interval = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+        # Base de datos lógica de Redis por propósito
+        self.redis_dbs = {
+            "cache": int(os.getenv("REDIS_DB_CACHE", "0")),
+            "rate_limit": int(os.getenv("REDIS_DB_RATE_LIMIT", "1")),
+            "metrics": int(os.getenv("REDIS_DB_METRICS", "2")),
+        }
+
+
+settings = Settings()
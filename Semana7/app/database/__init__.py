@@ -0,0 +1,110 @@
+# app/database/__init__.py
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import declarative_base, sessionmaker
+from monitoring.tracing import tracer
+from app.middleware.deadline import DeadlineExceeded, remaining_budget
+from app.database.index_advisor import IndexAdvisor, WorkloadCollector
+from app.database.query_registry import attach_prepared, prepared_connect_args
+from app.database.query_instrumentation import QueryInstrumentation
+from app.database.profiling import request_profiler
+from monitoring.db_stats import DB_STATS_PATH, DbStatsCollector, StatsStore
+
+# URL de la base de datos del dominio (PostgreSQL en producción, SQLite en local)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./salon.db")
+
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# Sentencias preparadas en el servidor cuando el driver lo soporta
+connect_args.update(prepared_connect_args(DATABASE_URL))
+engine = create_engine(DATABASE_URL, connect_args=connect_args)
+attach_prepared(engine)
+
+# Un span por sentencia SQL en los requests muestreados
+tracer.instrument_engine(engine)
+
+
+def apply_deadline_timeouts(engine):
+    """
+    Deriva el timeout de cada sentencia del presupuesto restante del request:
+    PostgreSQL usa statement_timeout, MySQL MAX_EXECUTION_TIME y SQLite un
+    progress handler que aborta la consulta cuando el deadline se agota
+    (o cuando el cliente se desconecta).
+    """
+    dialect = engine.dialect.name
+
+    if dialect == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _progress_handler(dbapi_conn, record):
+            def abortar_si_vencido():
+                restante = remaining_budget()
+                return 1 if restante is not None and restante <= 0 else 0
+            dbapi_conn.set_progress_handler(abortar_si_vencido, 10000)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _statement_timeout(conn, cursor, statement, parameters, context, executemany):
+        restante = remaining_budget()
+        if restante is not None and restante <= 0:
+            raise DeadlineExceeded("Presupuesto agotado antes de ejecutar la consulta")
+        if dialect not in ("postgresql", "mysql"):
+            return
+        timeout_ms = 0 if restante is None else max(int(restante * 1000), 1)
+        # Solo emitimos el SET si cambia respecto al valor de esta conexión
+        if conn.info.get("statement_timeout_ms") == timeout_ms:
+            return
+        if dialect == "postgresql":
+            cursor.execute(f"SET statement_timeout = {timeout_ms}")
+        else:
+            cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {timeout_ms}")
+        conn.info["statement_timeout_ms"] = timeout_ms
+
+    # Un rollback puede deshacer el SET (en PostgreSQL es transaccional) y al volver
+    # al pool la conexión pasa a otro request: en ambos casos el valor cacheado ya no es fiable
+    @event.listens_for(engine, "rollback")
+    def _olvidar_timeout_rollback(conn):
+        conn.info.pop("statement_timeout_ms", None)
+
+    @event.listens_for(engine, "checkin")
+    def _olvidar_timeout_checkin(dbapi_conn, connection_record):
+        connection_record.info.pop("statement_timeout_ms", None)
+
+
+apply_deadline_timeouts(engine)
+
+# Registro del workload real para el asesor de índices (opcional, ej. en staging)
+workload_collector = WorkloadCollector()
+if os.getenv("INDEX_ADVISOR_ENABLED", "0") == "1":
+    workload_collector.attach(engine)
+index_advisor = IndexAdvisor(engine, workload_collector)
+
+# Fingerprints, percentiles y detección de N+1 de todas las sentencias
+query_instrumentation = QueryInstrumentation(strict=os.getenv("N_PLUS_ONE_STRICT", "0") == "1")
+query_instrumentation.attach(engine)
+
+# SQL adjunto a los perfiles de request bajo demanda
+request_profiler.attach(engine)
+
+# Historial de estadísticas de la BD y regresiones tras deploy (DB_STATS_COLLECTOR=1)
+db_stats_collector = DbStatsCollector(engine, StatsStore(DB_STATS_PATH), query_instrumentation)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Base para los modelos del dominio
+Base = declarative_base()
+
+
+# Dependencia para obtener la sesión en los endpoints
+@tracer.trace_dependency
+def get_db():
+    # Si el request se está perfilando, también se muestrea este hilo del threadpool
+    request_profiler.marcar_hilo()
+    db = SessionLocal()
+    try:
+        yield db
+    except OperationalError as e:
+        # SQLite interrumpida por el progress handler / statement_timeout de PG
+        if remaining_budget() == 0:
+            raise DeadlineExceeded("Consulta cancelada por deadline") from e
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,276 @@
+# app/database/index_advisor.py
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+_TABLES = re.compile(
+    r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|JOIN|ON|LEFT|RIGHT|INNER|GROUP|ORDER|LIMIT)(\w+))?",
+    re.IGNORECASE,
+)
+_PREDICATE = re.compile(
+    r"(?:(\w+)\.)?(\w+)\s*(=|IN\b|BETWEEN\b|>=|<=|>|<)", re.IGNORECASE
+)
+_WHERE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_ORDER = re.compile(r"\bORDER\s+BY\b(.*?)(?:\bLIMIT\b|\bOFFSET\b|$)", re.IGNORECASE | re.DOTALL)
+_SYSTEM_TABLES = re.compile(r"sqlite_(?:temp_)?master|pg_catalog|pg_stat|information_schema", re.IGNORECASE)
+_KEYWORDS = {"and", "or", "not", "exists", "select", "null", "is", "case", "when", "then"}
+
+
+def normalize_sql(statement: str) -> str:
+    """Quita literales y espacios para agrupar sentencias iguales con distintos valores."""
+    return _SPACES.sub(" ", _LITERALS.sub("?", statement)).strip()
+
+
+@dataclass
+class StatementStats:
+    sql: str
+    params: Any = None
+    calls: int = 0
+    total_ms: float = 0.0
+
+
+@dataclass
+class IndexCandidate:
+    table: str
+    columns: Tuple[str, ...]
+    reasons: List[str] = field(default_factory=list)
+    estimated_benefit_ms: float = 0.0
+    statements: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    def create_sql(self, dialect: str = "postgresql") -> str:
+        concurrently = "CONCURRENTLY " if dialect == "postgresql" else ""
+        return (f"CREATE INDEX {concurrently}IF NOT EXISTS {self.name} "
+                f"ON {self.table}({', '.join(self.columns)});")
+
+
+class WorkloadCollector:
+    """
+    Registra, vía eventos de SQLAlchemy, las sentencias que la app ejecuta realmente.
+    Los eventos llegan desde los hilos de los requests: `statements` y las
+    pausas se tocan bajo `_lock`.
+    """
+
+    def __init__(self, max_statements: int = 500):
+        self.max_statements = max_statements
+        self.statements: Dict[str, StatementStats] = {}
+        self._pausas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def paused(self) -> bool:
+        return self._pausas > 0
+
+    @contextmanager
+    def pausado(self):
+        """No registra sentencias mientras dura el bloque (admite pausas anidadas o concurrentes)."""
+        with self._lock:
+            self._pausas += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pausas -= 1
+
+    def attach(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("advisor_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            start = conn.info["advisor_start"].pop()
+            self.record(statement, parameters, (time.perf_counter() - start) * 1000)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(exception_context):
+            # La sentencia falló: no habrá after_cursor_execute
+            conn = exception_context.connection
+            if conn is not None and conn.info.get("advisor_start"):
+                conn.info["advisor_start"].pop()
+
+    def record(self, statement: str, params: Any = None, duration_ms: float = 0.0):
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            return
+        if _SYSTEM_TABLES.search(statement):
+            return
+        key = normalize_sql(statement)
+        with self._lock:
+            if self._pausas:
+                return
+            stats = self.statements.get(key)
+            if stats is None:
+                if len(self.statements) >= self.max_statements:
+                    return
+                stats = self.statements[key] = StatementStats(sql=statement, params=params)
+            stats.calls += 1
+            stats.total_ms += duration_ms
+
+    def snapshot(self) -> List[StatementStats]:
+        """Copia de las sentencias registradas (calls y total_ms al momento de la copia)."""
+        with self._lock:
+            return [replace(stats) for stats in self.statements.values()]
+
+
+class IndexAdvisor:
+    """
+    Propone índices a partir del workload observado: ejecuta EXPLAIN sobre cada
+    sentencia (PostgreSQL) o EXPLAIN QUERY PLAN (SQLite), detecta full scans y
+    ordenamientos en memoria y arma índices candidatos (igualdad, orden, rango),
+    ordenados por beneficio estimado.
+    """
+
+    def __init__(self, engine, collector: Optional[WorkloadCollector] = None):
+        self.engine = engine
+        self.collector = collector or WorkloadCollector()
+
+    # --- planes ---
+    def explain(self, conn, sql: str, params: Any) -> Dict[str, List[str]]:
+        """Devuelve {'full_scans': [tablas], 'filesorts': [tablas o '*']}."""
+        dialect = self.engine.dialect.name
+        issues = {"full_scans": [], "filesorts": []}
+        if dialect == "sqlite":
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            for row in rows:
+                detail = row[-1]
+                match = re.match(r"SCAN (?:TABLE )?(\w+)", detail)
+                if match and "USING" not in detail:
+                    issues["full_scans"].append(match.group(1))
+                if "USE TEMP B-TREE FOR ORDER BY" in detail:
+                    issues["filesorts"].append("*")
+        elif dialect == "postgresql":
+            raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params or {}).scalar()
+            plan = raw if isinstance(raw, list) else json.loads(raw)
+            self._walk_pg(plan[0]["Plan"], issues)
+        return issues
+
+    def _walk_pg(self, node: Dict[str, Any], issues: Dict[str, List[str]]):
+        if node.get("Node Type") == "Seq Scan" and "Filter" in node:
+            issues["full_scans"].append(node["Relation Name"])
+        if node.get("Node Type") in ("Sort", "Incremental Sort"):
+            issues["filesorts"].append("*")
+        for child in node.get("Plans", []):
+            self._walk_pg(child, issues)
+
+    # --- columnas usadas por la sentencia ---
+    @staticmethod
+    def _aliases(sql: str) -> Dict[str, str]:
+        aliases = {}
+        for table, alias in _TABLES.findall(sql):
+            aliases[table.lower()] = table.lower()
+            if alias:
+                aliases[alias.lower()] = table.lower()
+        return aliases
+
+    def columns_by_table(self, sql: str) -> Dict[str, Dict[str, List[str]]]:
+        aliases = self._aliases(sql)
+        tables = set(aliases.values())
+        single = next(iter(tables)) if len(tables) == 1 else None
+        result: Dict[str, Dict[str, List[str]]] = {}
+
+        def add(alias: str, column: str, kind: str):
+            column = column.lower()
+            if column in _KEYWORDS:
+                return
+            table = aliases.get(alias.lower()) if alias else single
+            if table is None:
+                return
+            cols = result.setdefault(table, {"eq": [], "range": [], "order": []})
+            if column not in cols[kind]:
+                cols[kind].append(column)
+
+        where = _WHERE.search(sql)
+        if where:
+            for alias, column, op in _PREDICATE.findall(where.group(1)):
+                kind = "eq" if op.upper() in ("=", "IN") else "range"
+                # 'a.x = b.y' es un join: solo cuenta la columna del lado izquierdo
+                add(alias, column, kind)
+        order = _ORDER.search(sql)
+        if order:
+            for item in order.group(1).split(","):
+                match = re.match(r"\s*(?:(\w+)\.)?(\w+)", item)
+                if match:
+                    add(match.group(1), match.group(2), "order")
+        return result
+
+    def _existing_prefixes(self) -> Dict[str, List[Tuple[str, ...]]]:
+        inspector = inspect(self.engine)
+        existing = {}
+        for table in inspector.get_table_names():
+            cols = [tuple(c.lower() for c in idx["column_names"] if c) for idx in inspector.get_indexes(table)]
+            pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+            if pk:
+                cols.append(tuple(c.lower() for c in pk))
+            existing[table.lower()] = cols
+        return existing
+
+    # --- recomendación ---
+    def recommend(self, limit: int = 10) -> List[IndexCandidate]:
+        candidates: Dict[Tuple[str, Tuple[str, ...]], IndexCandidate] = {}
+        # Los EXPLAIN del propio advisor no son parte del workload
+        with self.collector.pausado():
+            existing = self._existing_prefixes()
+            with self.engine.connect() as conn:
+                self._analyze(conn, candidates, existing)
+
+        ranked = sorted(candidates.values(), key=lambda c: (c.estimated_benefit_ms, c.statements), reverse=True)
+        return ranked[:limit]
+
+    def _analyze(self, conn, candidates, existing):
+        for stats in self.collector.snapshot():
+            try:
+                issues = self.explain(conn, stats.sql, stats.params)
+            except Exception as e:
+                print(f"❌ No se pudo analizar el plan de: {stats.sql[:80]} ({e})")
+                continue
+            if not issues["full_scans"] and not issues["filesorts"]:
+                continue
+            # SQLite reporta el alias ('SCAN c'); lo traducimos a la tabla
+            aliases = self._aliases(stats.sql)
+            scanned_tables = {aliases.get(t.lower(), t.lower()) for t in issues["full_scans"]}
+
+            for table, cols in self.columns_by_table(stats.sql).items():
+                scanned = table in scanned_tables
+                sorted_ = bool(issues["filesorts"]) and bool(cols["order"])
+                if not (scanned or sorted_):
+                    continue
+                # Regla igualdad -> orden -> rango
+                columns = list(cols["eq"])
+                columns += [c for c in cols["order"] if c not in columns]
+                columns += [c for c in cols["range"] if c not in columns][:1]
+                columns = tuple(columns[:4])
+                if not columns or any(idx[:len(columns)] == columns for idx in existing.get(table, [])):
+                    continue
+
+                weight = (1.0 if scanned else 0.0) + (0.5 if sorted_ else 0.0)
+                cand = candidates.setdefault((table, columns), IndexCandidate(table, columns))
+                cand.estimated_benefit_ms += stats.total_ms * weight
+                cand.statements += 1
+                if scanned and "full scan" not in cand.reasons:
+                    cand.reasons.append("full scan")
+                if sorted_ and "filesort" not in cand.reasons:
+                    cand.reasons.append("filesort")
+
+    def emit_migration(self, candidates: List[IndexCandidate]) -> str:
+        """Genera un script SQL de migración con los índices propuestos."""
+        dialect = self.engine.dialect.name
+        lines = [
+            "-- Migración generada por IndexAdvisor",
+            "-- Ordenada por beneficio estimado (ms de consultas afectadas)",
+        ]
+        for cand in candidates:
+            lines.append(f"-- {cand.name}: {', '.join(cand.reasons)}; "
+                         f"beneficio estimado {cand.estimated_benefit_ms:.1f}ms en {cand.statements} sentencia(s)")
+            lines.append(cand.create_sql(dialect))
+        return "\n".join(lines) + "\n"
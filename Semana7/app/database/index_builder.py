@@ -0,0 +1,122 @@
+# app/database/index_builder.py
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+
+_CREATE_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+ON\s+(\w+)",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class IndexBuildResult:
+    name: str
+    table: str
+    status: str  # 'created' | 'exists' | 'rebuilt' | 'failed'
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class IndexBuildRunner:
+    """
+    Construye índices fuera de transacción (AUTOCOMMIT), como exige
+    CREATE INDEX CONCURRENTLY en PostgreSQL.
+
+    - Los índices de tablas distintas se construyen en paralelo (con límite);
+      los de una misma tabla van en serie, porque dos builds concurrentes
+      sobre la misma tabla se esperan entre sí.
+    - Es idempotente: salta los índices válidos y reconstruye los que quedaron
+      INVALID por un build interrumpido.
+    """
+
+    def __init__(self, engine, max_parallel: int = 2,
+                 on_progress: Optional[Callable[[int, int, IndexBuildResult], None]] = None):
+        self.engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+        self.dialect = engine.dialect.name
+        self.max_parallel = max_parallel
+        self.on_progress = on_progress or self._print_progress
+        self._done = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def _print_progress(done: int, total: int, result: IndexBuildResult):
+        icon = "❌" if result.status == "failed" else "✅"
+        detail = f" ({result.error})" if result.error else ""
+        print(f"{icon} [{done}/{total}] {result.name} en {result.table}: {result.status} "
+              f"en {result.seconds:.2f}s{detail}")
+
+    def _prepare(self, sql: str) -> str:
+        if self.dialect != "postgresql":
+            # CONCURRENTLY solo existe en PostgreSQL
+            sql = re.sub(r"\s+CONCURRENTLY", "", sql, flags=re.IGNORECASE)
+        return sql
+
+    def _index_state(self, conn, name: str) -> Optional[str]:
+        """None si no existe, 'valid' o 'invalid'."""
+        if self.dialect == "postgresql":
+            valid = conn.execute(text(
+                "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name"
+            ), {"name": name}).scalar()
+        elif self.dialect == "sqlite":
+            valid = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"
+            ), {"name": name}).scalar()
+        else:
+            return None  # Sin catálogo conocido: confiamos en IF NOT EXISTS
+        if valid is None:
+            return None
+        return "valid" if valid else "invalid"
+
+    def _build_one(self, name: str, table: str, sql: str) -> IndexBuildResult:
+        start = time.perf_counter()
+        try:
+            with self.engine.connect() as conn:
+                state = self._index_state(conn, name)
+                if state == "valid":
+                    return IndexBuildResult(name, table, "exists", time.perf_counter() - start)
+                status = "created"
+                if state == "invalid":
+                    # Restos de un CREATE INDEX CONCURRENTLY interrumpido
+                    conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                    status = "rebuilt"
+                conn.exec_driver_sql(self._prepare(sql))
+            return IndexBuildResult(name, table, status, time.perf_counter() - start)
+        except Exception as e:
+            return IndexBuildResult(name, table, "failed", time.perf_counter() - start, str(e))
+
+    def _build_table(self, items, total: int) -> List[IndexBuildResult]:
+        results = []
+        for name, table, sql in items:
+            result = self._build_one(name, table, sql)
+            results.append(result)
+            with self._lock:
+                self._done += 1
+                done = self._done
+            self.on_progress(done, total, result)
+        return results
+
+    def run(self, statements: List[str]) -> List[IndexBuildResult]:
+        by_table: "OrderedDict[str, list]" = OrderedDict()
+        results: List[IndexBuildResult] = []
+        for sql in statements:
+            match = _CREATE_INDEX.search(sql)
+            if not match:
+                results.append(IndexBuildResult("?", "?", "failed", error=f"No es un CREATE INDEX: {sql[:60]}"))
+                continue
+            name, table = match.group(1), match.group(2)
+            by_table.setdefault(table, []).append((name, table, sql))
+
+        total = sum(len(items) for items in by_table.values())
+        self._done = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.max_parallel)) as pool:
+            for table_results in pool.map(lambda items: self._build_table(items, total), by_table.values()):
+                results.extend(table_results)
+        return results
@@ -1,6 +1,7 @@
 # app/database/indexes.py
-from sqlalchemy import text
+import asyncio
 from app.database import engine
+from app.database.index_builder import IndexBuildRunner
 
 class DomainIndexes:
     """Índices específicos para optimizar consultas del dominio de Peluquería"""
@@ -11,7 +12,11 @@ class DomainIndexes:
         indexes = [
             # 🔸 Búsquedas frecuentes de citas por fecha, cliente y estado
             "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_cita_fecha_estado ON salon_cita(fecha_cita, estado);",
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_cita_cliente ON salon_cita(cliente_id, fecha_cita DESC);",
+
+            # 🔸 Claves de orden completas para la paginación por cursor
+            # (idx_salon_cita_cliente_orden también cubre el historial por cliente y fecha)
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_cita_cliente_orden ON salon_cita(cliente_id, fecha_cita DESC, hora_inicio DESC, id DESC);",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_cita_agenda ON salon_cita(fecha_cita, hora_inicio, id);",
 
             # 🔸 Filtrado por servicio (para reportes y agenda)
             "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_cita_servicio ON salon_cita(servicio_id, fecha_cita DESC);",
@@ -43,14 +48,15 @@ class DomainIndexes:
             ]
 
     @staticmethod
-    async def create_indexes_for_domain(domain_prefix: str):
-        """Crea índices específicos para el dominio indicado"""
+    def build_indexes_for_domain(domain_prefix: str, max_parallel: int = 2):
+        """
+        Crea los índices del dominio fuera de transacción, en paralelo por tabla.
+        Se puede relanzar sin riesgo: salta los existentes y rehace los INVALID.
+        """
         indexes = DomainIndexes.get_domain_indexes(domain_prefix)
+        return IndexBuildRunner(engine, max_parallel=max_parallel).run(indexes)
 
-        with engine.connect() as connection:
-            for index_sql in indexes:
-                try:
-                    connection.execute(text(index_sql))
-                    print(f"✅ Índice creado: {index_sql[:80]}...")
-                except Exception as e:
-                    print(f"❌ Error creando índice: {e}")
+    @staticmethod
+    async def create_indexes_for_domain(domain_prefix: str, max_parallel: int = 2):
+        """Versión async: ejecuta el build en un hilo para no bloquear el event loop"""
+        return await asyncio.to_thread(DomainIndexes.build_indexes_for_domain, domain_prefix, max_parallel)
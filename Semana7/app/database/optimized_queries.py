@@ -31,23 +31,25 @@ class DomainOptimizedQueries:
                 FROM salon_estilista e
                 JOIN salon_horario h ON e.id = h.estilista_id
                 WHERE h.dia_semana = :dia_semana
+                AND h.hora_inicio <= :hora_inicio AND h.hora_fin >= :hora_fin
                 AND NOT EXISTS (
                     SELECT 1 FROM salon_cita c
                     WHERE c.estilista_id = e.id
                     AND c.fecha_cita = :fecha
-                    AND (:hora_inicio, :hora_fin) OVERLAPS (c.hora_inicio, c.hora_fin)
+                    AND c.hora_inicio < :hora_fin AND c.hora_fin > :hora_inicio
                     AND c.estado IN ('confirmada', 'pendiente')
                 )
                 ORDER BY e.nombre;
             """,
 
             # 🔸 Servicios más agendados en un rango de fechas (para reportes de demanda)
+            # Suma el agregado diario (salon_demanda_diaria) en vez de recorrer las citas
             'servicios_mas_demandados': """
-                SELECT s.nombre, COUNT(*) as total
-                FROM salon_cita c
-                JOIN salon_servicio s ON c.servicio_id = s.id
-                WHERE c.fecha_cita BETWEEN :fecha_inicio AND :fecha_fin
-                AND c.estado = 'confirmada'
+                SELECT s.nombre, SUM(d.total) as total
+                FROM salon_demanda_diaria d
+                JOIN salon_servicio s ON d.servicio_id = s.id
+                WHERE d.fecha BETWEEN :fecha_inicio AND :fecha_fin
+                AND d.total > 0
                 GROUP BY s.nombre
                 ORDER BY total DESC
                 LIMIT 10;
@@ -59,7 +61,18 @@ class DomainOptimizedQueries:
                 FROM salon_cita c
                 JOIN salon_servicio s ON c.servicio_id = s.id
                 WHERE c.cliente_id = :cliente_id
-                ORDER BY c.fecha_cita DESC
+                ORDER BY c.fecha_cita DESC, c.hora_inicio DESC, c.id DESC
+                LIMIT :limit;
+            """,
+
+            # 🔸 Historial: páginas siguientes por cursor (keyset), sin OFFSET
+            'historial_cliente_keyset': """
+                SELECT c.id, c.fecha_cita, c.hora_inicio, s.nombre as servicio, c.estado
+                FROM salon_cita c
+                JOIN salon_servicio s ON c.servicio_id = s.id
+                WHERE c.cliente_id = :cliente_id
+                AND (c.fecha_cita, c.hora_inicio, c.id) < (:fecha_cita, :hora_inicio, :id)
+                ORDER BY c.fecha_cita DESC, c.hora_inicio DESC, c.id DESC
                 LIMIT :limit;
             """,
 
@@ -73,8 +86,23 @@ class DomainOptimizedQueries:
                 JOIN salon_estilista e ON c.estilista_id = e.id
                 WHERE c.fecha_cita >= CURRENT_DATE
                 AND c.estado IN ('confirmada', 'pendiente')
-                ORDER BY c.fecha_cita, c.hora_inicio
-                LIMIT 50;
+                ORDER BY c.fecha_cita, c.hora_inicio, c.id
+                LIMIT :limit;
+            """,
+
+            # 🔸 Próximas citas: páginas siguientes por cursor (keyset)
+            'proximas_citas_keyset': """
+                SELECT c.id, c.fecha_cita, c.hora_inicio, c.hora_fin,
+                       cli.nombre as cliente, s.nombre as servicio, e.nombre as estilista
+                FROM salon_cita c
+                JOIN salon_cliente cli ON c.cliente_id = cli.id
+                JOIN salon_servicio s ON c.servicio_id = s.id
+                JOIN salon_estilista e ON c.estilista_id = e.id
+                WHERE c.fecha_cita >= CURRENT_DATE
+                AND c.estado IN ('confirmada', 'pendiente')
+                AND (c.fecha_cita, c.hora_inicio, c.id) > (:fecha_cita, :hora_inicio, :id)
+                ORDER BY c.fecha_cita, c.hora_inicio, c.id
+                LIMIT :limit;
             """
         }
 
@@ -37,25 +37,27 @@ class DatabasePerformanceMonitor:
         """
 
         result = db.execute(text(stats_query))
-        return [dict(row) for row in result]
+        return [dict(row._mapping) for row in result]
 
     @staticmethod
     def analyze_slow_queries(db: Session, domain_prefix: str = "salon_"):
         """
         Analiza las consultas lentas específicas del dominio de peluquería.
         Se enfoca en la tabla principal: 'cita', relacionada con agenda y servicios.
+        Usa las columnas de PostgreSQL 13+ (total_exec_time / mean_exec_time).
+        Para el historial y regresiones ver monitoring/db_stats.py.
         """
         slow_queries = f"""
-        SELECT query, calls, total_time, mean_time
+        SELECT query, calls, total_exec_time, mean_exec_time
         FROM pg_stat_statements
         WHERE query LIKE '%cita%'  -- Tabla principal del dominio Peluquería
-        ORDER BY mean_time DESC
+        ORDER BY mean_exec_time DESC
         LIMIT 10;
         """
 
         try:
             result = db.execute(text(slow_queries))
-            return [dict(row) for row in result]
+            return [dict(row._mapping) for row in result]
         except Exception as e:
             print(f"❌ Error analizando consultas lentas del dominio 'salon_': {e}")
             return []
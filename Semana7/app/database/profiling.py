@@ -0,0 +1,261 @@
+# app/database/profiling.py
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+# Token que autoriza a pedir un perfil (header X-Profile o ?__profile=); vacío = deshabilitado
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fracción de requests perfilados sin pedirlo (0 = solo bajo demanda)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Directorio opcional donde además se guardan los perfiles (.speedscope.json)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+
+# Frames hoja de un hilo dormido: no aportan al perfil
+_IDLE_FRAMES = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("base_events.py", "_run_once"), ("thread.py", "_worker"),
+}
+
+Frame = Tuple[str, str, int]  # (función, archivo, línea)
+
+
+def capture_stack(frame) -> Tuple[Frame, ...]:
+    """Stack de raíz a hoja de un frame de sys._current_frames()."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def is_idle(stack: Tuple[Frame, ...]) -> bool:
+    if not stack:
+        return True
+    name, filename, _ = stack[-1]
+    return (os.path.basename(filename), name) in _IDLE_FRAMES
+
+
+def to_collapsed(samples: Counter) -> str:
+    """Formato 'collapsed stacks' (flamegraph.pl / speedscope): 'a;b;c N' por línea."""
+    lines = []
+    for stack, count in samples.most_common():
+        names = ";".join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack)
+        lines.append(f"{names} {count}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def to_speedscope(samples: Counter, name: str, interval_ms: float,
+                  extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Perfil 'sampled' en el formato de archivo de https://www.speedscope.app."""
+    frames: List[Dict[str, Any]] = []
+    index: Dict[Frame, int] = {}
+    stacks, weights = [], []
+    for stack, count in samples.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            ids.append(index[frame])
+        stacks.append(ids)
+        weights.append(count * interval_ms)
+    profile = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "semana7-profiler",
+    }
+    if extra:
+        profile.update(extra)
+    return profile
+
+
+class StackSampler:
+    """
+    Hilo que toma el stack de los hilos cada `interval_ms` y acumula los
+    stacks no ociosos. Con `hilos` solo muestrea esos idents (el set puede
+    crecer mientras corre, ej. al entrar el request a un hilo del threadpool);
+    sin él, todos los hilos del proceso.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, hilos: Optional[Set[int]] = None):
+        self.interval = interval_ms / 1000
+        self.hilos = hilos
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        propio = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == propio or (self.hilos is not None and ident not in self.hilos):
+                    continue
+                stack = capture_stack(frame)
+                if not is_idle(stack):
+                    self.samples[stack] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        return self.samples
+
+
+class RequestProfile:
+    __slots__ = ("id", "nombre", "inicio", "duracion_ms", "samples", "statements", "interval_ms", "hilos")
+
+    def __init__(self, nombre: str, interval_ms: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.nombre = nombre
+        self.inicio = time.time()
+        self.duracion_ms = 0.0
+        self.samples: Counter = Counter()
+        self.statements: List[Dict[str, Any]] = []
+        self.interval_ms = interval_ms
+        # Hilos donde corrió el request: el del event loop y los del threadpool que usó
+        self.hilos: Set[int] = {threading.get_ident()}
+
+    def resumen(self) -> Dict[str, Any]:
+        return {"id": self.id, "request": self.nombre, "timestamp": self.inicio,
+                "duration_ms": round(self.duracion_ms, 3), "samples": sum(self.samples.values()),
+                "sql_statements": len(self.statements)}
+
+    def speedscope(self) -> Dict[str, Any]:
+        return to_speedscope(self.samples, self.nombre, self.interval_ms,
+                             extra={"request": self.resumen(), "sql": self.statements})
+
+    def collapsed(self) -> str:
+        return to_collapsed(self.samples)
+
+
+_perfil_actual: ContextVar[Optional[RequestProfile]] = ContextVar("perfil_actual", default=None)
+
+
+class RequestProfiler:
+    """
+    Perfilado bajo demanda de requests individuales (staging/producción):
+    se activa con el header 'X-Profile: <PROFILE_TOKEN>', con '?__profile=<token>'
+    o por muestreo (PROFILE_SAMPLE_RATE). Guarda los últimos perfiles en memoria
+    (y en PROFILE_DIR si está configurado) junto con el SQL ejecutado.
+    """
+
+    def __init__(self, token: str = PROFILE_TOKEN, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 interval_ms: float = PROFILE_INTERVAL_MS, max_profiles: int = 20,
+                 directory: str = PROFILE_DIR):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        self.max_profiles = max_profiles
+        self.directory = directory
+        self.profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Un solo perfil a la vez: el muestreo ve todos los hilos del proceso
+        self._en_curso = threading.Lock()
+
+    def autorizado(self, pedido: Optional[str]) -> bool:
+        """Compara el token en tiempo constante (en bytes: admite texto no ASCII)."""
+        return bool(pedido and self.token) and hmac.compare_digest(pedido.encode(), self.token.encode())
+
+    def should_profile(self, headers, query_params) -> bool:
+        if self.autorizado(headers.get("x-profile") or query_params.get("__profile")):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def marcar_hilo(self):
+        """Suma el hilo actual al perfil en curso (los endpoints síncronos corren en el threadpool)."""
+        perfil = _perfil_actual.get()
+        if perfil is not None:
+            perfil.hilos.add(threading.get_ident())
+
+    def attach(self, engine):
+        """Adjunta al perfil activo las sentencias SQL que ejecuta el request."""
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if context is not None and _perfil_actual.get() is not None:
+                self.marcar_hilo()
+                context._profile_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            perfil = _perfil_actual.get()
+            inicio = getattr(context, "_profile_start", None)
+            if perfil is None or inicio is None:
+                return
+            duracion = (time.perf_counter() - inicio) * 1000
+            perfil.statements.append({"sql": statement, "duration_ms": round(duracion, 3),
+                                      "thread": threading.current_thread().name})
+
+    @contextmanager
+    def profile(self, nombre: str):
+        """Perfila el bloque; devuelve None si ya hay otro perfil en curso."""
+        if not self._en_curso.acquire(blocking=False):
+            yield None
+            return
+        perfil = RequestProfile(nombre, self.interval_ms)
+        sampler = StackSampler(self.interval_ms, perfil.hilos)
+        token = _perfil_actual.set(perfil)
+        inicio = time.perf_counter()
+        sampler.start()
+        try:
+            yield perfil
+        finally:
+            perfil.samples = sampler.stop()
+            perfil.duracion_ms = (time.perf_counter() - inicio) * 1000
+            _perfil_actual.reset(token)
+            self._en_curso.release()
+            self._guardar(perfil)
+
+    def _guardar(self, perfil: RequestProfile):
+        with self._lock:
+            self.profiles[perfil.id] = perfil
+            while len(self.profiles) > self.max_profiles:
+                self.profiles.popitem(last=False)
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"{perfil.id}.speedscope.json")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(perfil.speedscope(), f)
+            except OSError as e:
+                print(f"❌ No se pudo guardar el perfil {perfil.id}: {e}")
+        print(f"🔬 Perfil {perfil.id} de {perfil.nombre}: {perfil.duracion_ms:.1f}ms, "
+              f"{sum(perfil.samples.values())} muestras, {len(perfil.statements)} sentencias SQL")
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self.profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [p.resumen() for p in reversed(self.profiles.values())]
+
+
+request_profiler = RequestProfiler()
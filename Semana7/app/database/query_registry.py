@@ -0,0 +1,217 @@
+# app/database/query_registry.py
+import datetime
+import os
+from collections import namedtuple
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, Integer, String, Time, bindparam, column, event, text
+from sqlalchemy.types import TypeEngine
+
+from app.database.optimized_queries import DomainOptimizedQueries
+from comun.pagination import CursorInvalido, decode_cursor, encode_cursor
+
+# Preparar en el servidor las consultas registradas desde su primera ejecución (psycopg 3);
+# el resto de sentencias sigue con el prepare_threshold por defecto del driver
+PREPARE_REGISTERED = os.getenv("PREPARE_REGISTERED_QUERIES", "1") == "1"
+# Tamaño de la caché de sentencias por conexión (asyncpg / sqlite3); vacío = la del driver
+STATEMENT_CACHE_SIZE = os.getenv("STATEMENT_CACHE_SIZE")
+
+
+def prepared_connect_args(url: str) -> Dict[str, Any]:
+    """
+    Argumentos de conexión para la caché de sentencias del driver, solo si se
+    configuró STATEMENT_CACHE_SIZE. psycopg2 y los drivers MySQL no preparan
+    en el servidor; psycopg 3 prepara por ejecución (ver attach_prepared).
+    """
+    if not STATEMENT_CACHE_SIZE:
+        return {}
+    if url.startswith("postgresql+asyncpg:"):
+        return {"statement_cache_size": int(STATEMENT_CACHE_SIZE)}
+    if url.startswith("sqlite"):
+        return {"cached_statements": int(STATEMENT_CACHE_SIZE)}
+    return {}
+
+
+def attach_prepared(engine):
+    """
+    Con psycopg 3, ejecuta las consultas del registro con prepare=True (marcadas
+    con la opción de ejecución `preparar`), sin cambiar el umbral de la conexión.
+    """
+    if not PREPARE_REGISTERED or engine.dialect.driver != "psycopg":
+        return
+
+    @event.listens_for(engine, "do_execute")
+    def _preparar(cursor, statement, parameters, context):
+        if context.execution_options.get("preparar"):
+            cursor.execute(statement, parameters, prepare=True)
+            return True
+
+
+@dataclass(frozen=True)
+class QuerySpec:
+    """Declaración tipada de una consulta: parámetros y columnas del resultado."""
+    params: Dict[str, TypeEngine]
+    columns: Dict[str, TypeEngine]
+
+
+# Tipos de las consultas de DomainOptimizedQueries.get_optimized_queries_salon()
+SALON_QUERY_SPECS: Dict[str, QuerySpec] = {
+    "citas_por_estilista": QuerySpec(
+        params={"estilista_id": Integer(), "fecha": Date()},
+        columns={"id": Integer(), "fecha_cita": Date(), "hora_inicio": Time(), "hora_fin": Time(),
+                 "cliente": String(), "servicio": String(), "estado": String()},
+    ),
+    "estilistas_disponibles": QuerySpec(
+        params={"dia_semana": Integer(), "fecha": Date(), "hora_inicio": Time(), "hora_fin": Time()},
+        columns={"id": Integer(), "nombre": String(), "dia_semana": Integer(),
+                 "hora_inicio": Time(), "hora_fin": Time()},
+    ),
+    "servicios_mas_demandados": QuerySpec(
+        params={"fecha_inicio": Date(), "fecha_fin": Date()},
+        columns={"nombre": String(), "total": Integer()},
+    ),
+    "historial_cliente": QuerySpec(
+        params={"cliente_id": Integer(), "limit": Integer()},
+        columns={"id": Integer(), "fecha_cita": Date(), "hora_inicio": Time(),
+                 "servicio": String(), "estado": String()},
+    ),
+    "historial_cliente_keyset": QuerySpec(
+        params={"cliente_id": Integer(), "fecha_cita": Date(), "hora_inicio": Time(), "id": Integer(),
+                "limit": Integer()},
+        columns={"id": Integer(), "fecha_cita": Date(), "hora_inicio": Time(),
+                 "servicio": String(), "estado": String()},
+    ),
+    "proximas_citas": QuerySpec(
+        params={"limit": Integer()},
+        columns={"id": Integer(), "fecha_cita": Date(), "hora_inicio": Time(), "hora_fin": Time(),
+                 "cliente": String(), "servicio": String(), "estilista": String()},
+    ),
+    "proximas_citas_keyset": QuerySpec(
+        params={"fecha_cita": Date(), "hora_inicio": Time(), "id": Integer(), "limit": Integer()},
+        columns={"id": Integer(), "fecha_cita": Date(), "hora_inicio": Time(), "hora_fin": Time(),
+                 "cliente": String(), "servicio": String(), "estilista": String()},
+    ),
+}
+
+
+class CompiledQuery:
+    """
+    Consulta con nombre compilada una sola vez: el mismo objeto text() se
+    reutiliza en cada ejecución, así SQLAlchemy acierta en su caché de
+    compilación y el driver en su caché de sentencias preparadas.
+    """
+
+    __slots__ = ("name", "spec", "statement", "record")
+
+    def __init__(self, name: str, sql: str, spec: QuerySpec):
+        self.name = name
+        self.spec = spec
+        self.statement = (
+            text(sql.strip().rstrip(";"))
+            .bindparams(*[bindparam(p, type_=t) for p, t in spec.params.items()])
+            .columns(*[column(c, t) for c, t in spec.columns.items()])
+            .execution_options(preparar=True)
+        )
+        # namedtuple: registro inmutable sin __dict__ (slots vacíos)
+        self.record = namedtuple(f"{name}_row", list(spec.columns))
+
+    def coerce(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Valida nombres y tipos de los parámetros; acepta fechas y horas en ISO."""
+        faltantes = set(self.spec.params) - set(params)
+        sobrantes = set(params) - set(self.spec.params)
+        if faltantes or sobrantes:
+            raise TypeError(f"Parámetros inválidos para '{self.name}': "
+                            f"faltan {sorted(faltantes)}, sobran {sorted(sobrantes)}")
+        valores = {}
+        for nombre, tipo in self.spec.params.items():
+            valor = params[nombre]
+            esperado = tipo.python_type
+            if isinstance(valor, str) and esperado is datetime.date:
+                valor = datetime.date.fromisoformat(valor)
+            elif isinstance(valor, str) and esperado is datetime.time:
+                valor = datetime.time.fromisoformat(valor)
+            # bool es subclase de int: True no debe pasar como un id
+            if valor is not None and (not isinstance(valor, esperado)
+                                      or (isinstance(valor, bool) and esperado is not bool)):
+                raise TypeError(f"'{nombre}' en '{self.name}' debe ser {esperado.__name__}, "
+                                f"no {type(valor).__name__}")
+            valores[nombre] = valor
+        return valores
+
+
+class QueryRegistry:
+    """Registro de consultas con nombre, compiladas al registrarse."""
+
+    def __init__(self):
+        self._queries: Dict[str, CompiledQuery] = {}
+
+    def register(self, name: str, sql: str, spec: QuerySpec) -> CompiledQuery:
+        query = self._queries[name] = CompiledQuery(name, sql, spec)
+        return query
+
+    def get(self, name: str) -> CompiledQuery:
+        try:
+            return self._queries[name]
+        except KeyError:
+            raise KeyError(f"Consulta no registrada: '{name}'") from None
+
+    def names(self) -> List[str]:
+        return list(self._queries)
+
+    @classmethod
+    def from_domain(cls, domain_prefix: str, specs: Dict[str, QuerySpec]) -> "QueryRegistry":
+        registry = cls()
+        for name, sql in DomainOptimizedQueries.get_queries_for_domain(domain_prefix).items():
+            registry.register(name, sql, specs[name])
+        return registry
+
+
+salon_queries = QueryRegistry.from_domain("salon_", SALON_QUERY_SPECS)
+
+
+class QueryDAO:
+    """
+    Ejecuta consultas del registro sobre una Session o Connection y devuelve
+    registros livianos (namedtuples) en lugar de objetos ORM.
+    """
+
+    def __init__(self, bind, registry: QueryRegistry = salon_queries):
+        self.bind = bind
+        self.registry = registry
+
+    def _execute(self, name: str, params: Dict[str, Any]):
+        query = self.registry.get(name)
+        return query, self.bind.execute(query.statement, query.coerce(params))
+
+    def all(self, name: str, **params) -> List[tuple]:
+        query, result = self._execute(name, params)
+        make = query.record._make
+        return [make(row) for row in result]
+
+    def first(self, name: str, **params) -> Optional[tuple]:
+        query, result = self._execute(name, params)
+        row = result.first()
+        return None if row is None else query.record._make(row)
+
+    def page(self, name: str, cursor: Optional[str], limit: int,
+             keys: Tuple[str, ...] = ("fecha_cita", "hora_inicio", "id"), **params) -> Tuple[List[tuple], Optional[str]]:
+        """
+        Paginación por clave: la primera página usa `name` y las siguientes
+        `name_keyset`, filtrando por la última clave vista en lugar de OFFSET.
+        Devuelve (registros, next_cursor).
+        """
+        if cursor:
+            # Los valores del cursor se convierten al tipo de cada parámetro de la consulta keyset
+            tipos = self.registry.get(f"{name}_keyset").spec.params
+            valores = decode_cursor(cursor, [column(k, tipos[k]) for k in keys])
+            try:
+                filas = self.all(f"{name}_keyset", limit=limit + 1, **dict(zip(keys, valores)), **params)
+            except (TypeError, ValueError) as e:
+                raise CursorInvalido("Cursor inválido") from e
+        else:
+            filas = self.all(name, limit=limit + 1, **params)
+        if len(filas) <= limit:
+            return filas, None
+        filas = filas[:limit]
+        return filas, encode_cursor([getattr(filas[-1], k) for k in keys])
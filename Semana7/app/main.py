@@ -1,7 +1,25 @@
 # app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.routers.optimized_routers import router as optimized_router
 from app.middleware.rate_limiter import RateLimitingMiddleware
+from app.routers.monitoring_routers import router as monitoring_router
+from app.middleware.middleware_monitoring import TracingMiddleware, BlockingCallGuardMiddleware, QueryCountMiddleware, ProfilingMiddleware
+from monitoring.tracing import TRACING_ENABLED, tracer
+from monitoring.event_loop import loop_monitor
+from monitoring.profiling import CONTINUOUS_PROFILER_ENABLED, continuous_profiler
+from monitoring.db_stats import DB_STATS_ENABLED
+from app.middleware.deadline import DeadlineMiddleware, DeadlineExceeded
+from app.database import SessionLocal
+from app.services import demand_service
+from app.services.availability_service import AVAILABILITY_IN_MEMORY, availability_service
+
+# El agregado diario de demanda se mantiene con los flush de las sesiones de la app
+demand_service.attach(SessionLocal)
+
+# La caché de disponibilidad sigue los commits de las mismas sesiones
+if AVAILABILITY_IN_MEMORY:
+    availability_service.attach(SessionLocal)
 
 # Crea la instancia de la aplicación FastAPI
 app = FastAPI(
@@ -13,8 +31,75 @@ app = FastAPI(
 # Añade el middleware de Rate Limiting
 app.add_middleware(RateLimitingMiddleware, requests_limit=100, window_size=60)
 
+# Deadline por request y cancelación si el cliente se desconecta
+app.add_middleware(DeadlineMiddleware)
+
+# Sentencias SQL por request y detección de N+1
+app.add_middleware(QueryCountMiddleware)
+
+# Perfil por request bajo demanda (X-Profile: <PROFILE_TOKEN>) o por muestreo
+app.add_middleware(ProfilingMiddleware)
+
+# Tracing por request (más externo que el rate limiter para medirlo también); TRACING=1
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
+# Modo desarrollo: los requests fallan si algo bloquea el event loop
+if loop_monitor.strict:
+    app.add_middleware(BlockingCallGuardMiddleware)
+
 # Incluye el router con los endpoints optimizados
 app.include_router(optimized_router)
+app.include_router(monitoring_router)
+
+@app.on_event("startup")
+def iniciar_exportador_spans():
+    if TRACING_ENABLED:
+        tracer.exporter.start()
+
+@app.on_event("shutdown")
+def detener_exportador_spans():
+    if TRACING_ENABLED:
+        tracer.exporter.shutdown()
+
+@app.on_event("startup")
+def preparar_demanda_diaria():
+    # Primer arranque (o tabla recién creada): se rellena desde salon_cita; después no hace nada
+    with SessionLocal() as db:
+        demand_service.asegurar_demanda(db)
+
+@app.on_event("startup")
+async def iniciar_monitor_event_loop():
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def detener_monitor_event_loop():
+    await loop_monitor.stop()
+
+@app.on_event("startup")
+def iniciar_profiler_continuo():
+    if CONTINUOUS_PROFILER_ENABLED:
+        continuous_profiler.start()
+
+@app.on_event("shutdown")
+def detener_profiler_continuo():
+    continuous_profiler.stop()
+
+@app.on_event("startup")
+def iniciar_colector_db_stats():
+    if DB_STATS_ENABLED:
+        from app.database import db_stats_collector
+        db_stats_collector.start()
+
+@app.on_event("shutdown")
+def detener_colector_db_stats():
+    if DB_STATS_ENABLED:
+        from app.database import db_stats_collector
+        db_stats_collector.stop()
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
 # Endpoint raíz para verificar que la API está funcionando
 @app.get("/")
@@ -0,0 +1,162 @@
+# app/middleware/deadline.py
+import json
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import anyio
+
+# Presupuesto por defecto y por prefijo de ruta (segundos)
+DEFAULT_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "10"))
+ROUTE_DEADLINES: Dict[str, float] = {
+    "/salon/citas": 2.0,       # agenda: debe responder rápido
+    "/salon/servicios": 2.0,
+    "/monitoring": 30.0,
+}
+
+
+class DeadlineExceeded(Exception):
+    """El request agotó su presupuesto de tiempo o el cliente se desconectó."""
+
+
+class Deadline:
+    """
+    Límite de tiempo del request. Es un objeto mutable para que los contextos
+    copiados (hilos del threadpool, tareas) vean la cancelación por desconexión.
+    """
+
+    __slots__ = ("expires_at", "cancelled")
+
+    def __init__(self, timeout: float):
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        if self.cancelled:
+            return 0.0
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+
+_deadline_actual: ContextVar[Optional[Deadline]] = ContextVar("deadline_actual", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline_actual.get()
+
+
+def remaining_budget() -> Optional[float]:
+    """Segundos restantes del request actual (None si no hay deadline)."""
+    deadline = _deadline_actual.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def timeout_restante(default: float) -> float:
+    """El menor entre un timeout configurado y el presupuesto restante."""
+    restante = remaining_budget()
+    return default if restante is None else min(default, restante)
+
+
+def check_deadline():
+    """Lanza DeadlineExceeded si ya no queda presupuesto."""
+    restante = remaining_budget()
+    if restante is not None and restante <= 0:
+        raise DeadlineExceeded("Presupuesto de tiempo del request agotado")
+
+
+def get_deadline() -> Optional[Deadline]:
+    """Dependencia de FastAPI para leer el deadline del request."""
+    return _deadline_actual.get()
+
+
+class DeadlineMiddleware:
+    """
+    Middleware ASGI que asigna un deadline a cada request (header
+    'X-Request-Timeout' en segundos, acotado por la configuración de la ruta),
+    responde 504 si se agota y cancela el trabajo en curso si llega un
+    'http.disconnect' del cliente.
+    """
+
+    def __init__(self, app, default_timeout: float = DEFAULT_TIMEOUT,
+                 route_deadlines: Optional[Dict[str, float]] = None):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.route_deadlines = ROUTE_DEADLINES if route_deadlines is None else route_deadlines
+
+    def _timeout_para(self, scope) -> float:
+        path = scope.get("path", "")
+        limite = self.default_timeout
+        for prefijo, segundos in self.route_deadlines.items():
+            if path.startswith(prefijo):
+                limite = segundos
+                break
+        for nombre, valor in scope.get("headers", []):
+            if nombre == b"x-request-timeout":
+                try:
+                    pedido = float(valor)
+                except ValueError:
+                    break
+                # nan, inf, 0 o negativos se ignoran; el header solo puede acortar el límite
+                if math.isfinite(pedido) and pedido > 0:
+                    return min(pedido, limite)
+                break
+        return limite
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timeout = self._timeout_para(scope)
+        deadline = Deadline(timeout)
+        token = _deadline_actual.set(deadline)
+
+        # Un solo lector del canal 'receive' (para no robarle mensajes a la app):
+        # reenvía el body en streaming, con un buffer de un mensaje para respetar la
+        # contrapresión de uploads grandes, y detecta el 'http.disconnect'.
+        hacia_app, desde_cliente = anyio.create_memory_object_stream(1)
+        respuesta_iniciada = False
+
+        async def receive_app():
+            try:
+                return await desde_cliente.receive()
+            except anyio.EndOfStream:
+                return {"type": "http.disconnect"}
+
+        async def send_app(message):
+            nonlocal respuesta_iniciada
+            if message["type"] == "http.response.start":
+                respuesta_iniciada = True
+            await send(message)
+
+        async def vigilar_desconexion(cancel_scope):
+            async with hacia_app:
+                while True:
+                    message = await receive()
+                    if message["type"] == "http.disconnect":
+                        deadline.cancelled = True
+                        cancel_scope.cancel()
+                        return
+                    await hacia_app.send(message)
+
+        try:
+            with anyio.move_on_after(timeout) as scope_deadline:
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(vigilar_desconexion, tg.cancel_scope)
+                    await self.app(scope, receive_app, send_app)
+                    tg.cancel_scope.cancel()
+        finally:
+            desde_cliente.close()
+            _deadline_actual.reset(token)
+
+        if scope_deadline.cancelled_caught:
+            deadline.cancelled = True
+            if not respuesta_iniciada:
+                body = json.dumps({"detail": f"Tiempo límite de {timeout}s excedido"}).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 504,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,98 @@
+# app/middleware/middleware_monitoring.py
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from monitoring.tracing import tracer as default_tracer
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Abre el span raíz de cada request muestreado. Los spans de dependencias,
+    SQL y cache se cuelgan de este span gracias al contextvar del tracer.
+    El header 'X-Trace: <PROFILE_TOKEN>' fuerza el muestreo de un request
+    puntual; sin el token correcto se ignora y decide el muestreo normal.
+    """
+
+    def __init__(self, app, tracer=None, profiler=None):
+        super().__init__(app)
+        self.tracer = tracer or default_tracer
+        if profiler is None:
+            from app.database.profiling import request_profiler as profiler
+        self.profiler = profiler
+
+    async def dispatch(self, request: Request, call_next):
+        force = self.profiler.autorizado(request.headers.get("X-Trace"))
+        with self.tracer.start_trace(
+            f"{request.method} {request.url.path}",
+            force=force,
+            **{"http.method": request.method, "http.path": request.url.path},
+        ) as span:
+            if span is None:
+                return await call_next(request)
+
+            with self.tracer.span("middleware.call_next", kind="middleware"):
+                response = await call_next(request)
+            span.set_attribute("http.status_code", response.status_code)
+            response.headers["X-Trace-Id"] = span.trace_id
+            return response
+
+
+class BlockingCallGuardMiddleware(BaseHTTPMiddleware):
+    """
+    Modo desarrollo: si durante el request algo bloqueó el event loop más del
+    umbral, ese request falla con BlockingCallError (y con él, el test).
+    """
+
+    def __init__(self, app, monitor=None):
+        super().__init__(app)
+        from monitoring.event_loop import loop_monitor
+        self.monitor = monitor or loop_monitor
+
+    async def dispatch(self, request: Request, call_next):
+        # Solo cuentan los bloqueos de este request, no los de otros concurrentes
+        with self.monitor.request_scope():
+            response = await call_next(request)
+            self.monitor.check()
+        return response
+
+
+class QueryCountMiddleware(BaseHTTPMiddleware):
+    """
+    Cuenta las sentencias SQL de cada request (headers X-DB-Queries y
+    X-DB-Time-ms) y deja que la instrumentación marque los patrones N+1.
+    """
+
+    def __init__(self, app, instrumentation=None):
+        super().__init__(app)
+        if instrumentation is None:
+            from app.database import query_instrumentation as instrumentation
+        self.instrumentation = instrumentation
+
+    async def dispatch(self, request: Request, call_next):
+        nombre = f"{request.method} {request.url.path}"
+        with self.instrumentation.request_scope(nombre) as queries:
+            response = await call_next(request)
+        response.headers["X-DB-Queries"] = str(queries.statements)
+        response.headers["X-DB-Time-ms"] = f"{queries.total_ms:.2f}"
+        return response
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Perfila el request si lo pide un header/query autorizado o si sale en el
+    muestreo. El perfil queda en /monitoring/profiles/{id} (header X-Profile-Id).
+    """
+
+    def __init__(self, app, profiler=None):
+        super().__init__(app)
+        if profiler is None:
+            from app.database.profiling import request_profiler as profiler
+        self.profiler = profiler
+
+    async def dispatch(self, request: Request, call_next):
+        if not self.profiler.should_profile(request.headers, request.query_params):
+            return await call_next(request)
+        with self.profiler.profile(f"{request.method} {request.url.path}") as perfil:
+            response = await call_next(request)
+        if perfil is not None:
+            response.headers["X-Profile-Id"] = perfil.id
+        return response
@@ -1,42 +1,66 @@
 # app/middleware/rate_limiter.py
-from fastapi import Request, HTTPException
+from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-import redis
+from starlette.responses import JSONResponse
+import anyio
+import logging
 import time
-import os
+from app.cache.redis_registry import redis_registry
+from app.config import settings
+from app.middleware.deadline import timeout_restante
+
+logger = logging.getLogger(__name__)
 
 class RateLimitingMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, requests_limit: int = 100, window_size: int = 60):
         super().__init__(app)
         self.requests_limit = requests_limit
         self.window_size = window_size
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=os.getenv('REDIS_PORT', 6379),
-            db=1,  # Usar una base de datos diferente para el rate limiter
-            decode_responses=True
-        )
+
+    async def _contar_peticiones(self, client_key: str, now: float) -> int:
+        # Cliente asíncrono del pool compartido (base de datos lógica del rate limiter),
+        # así no bloqueamos el event loop esperando a Redis.
+        redis_client = await redis_registry.async_client('rate_limit')
+        with anyio.fail_after(timeout_restante(settings.redis_socket_timeout)):
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.zremrangebyscore(client_key, '-inf', now - self.window_size)
+            pipe.zcard(client_key)
+            _, request_count = await pipe.execute()
+        return request_count
+
+    async def _registrar_peticion(self, client_key: str, now: float, path: str):
+        redis_client = await redis_registry.async_client('rate_limit')
+        with anyio.fail_after(timeout_restante(settings.redis_socket_timeout)):
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.zadd(client_key, {f"{now}:{path}": now})
+            pipe.expire(client_key, self.window_size)
+            await pipe.execute()
 
     async def dispatch(self, request: Request, call_next):
         # Usamos la IP del cliente como clave, o un identificador de usuario si está autenticado
         client_key = request.client.host
-        
-        # Limpiamos el contador de peticiones viejas
-        self.redis_client.zremrangebyscore(client_key, '-inf', time.time() - self.window_size)
-        
-        # Contamos las peticiones en la ventana de tiempo
-        request_count = self.redis_client.zcard(client_key)
-        
+        now = time.time()
+
+        try:
+            # Limpiamos el contador de peticiones viejas y contamos las de la ventana
+            request_count = await self._contar_peticiones(client_key, now)
+        except Exception as e:
+            # Si Redis no responde a tiempo dejamos pasar la petición
+            logger.warning("Error en rate limiter: %s", e)
+            return await call_next(request)
+
         if request_count >= self.requests_limit:
-            raise HTTPException(
+            # Dentro de un middleware un HTTPException terminaría en 500: respondemos directamente
+            return JSONResponse(
                 status_code=429,
-                detail=f"Demasiadas peticiones. Inténtelo de nuevo en {self.window_size} segundos."
+                content={"detail": f"Demasiadas peticiones. Inténtelo de nuevo en {self.window_size} segundos."}
             )
-            
+
         # Agregamos la petición actual con el timestamp
-        self.redis_client.zadd(client_key, {f"{time.time()}:{request.url.path}": time.time()})
-        self.redis_client.expire(client_key, self.window_size)
+        try:
+            await self._registrar_peticion(client_key, now, request.url.path)
+        except Exception as e:
+            logger.warning("Error en rate limiter: %s", e)
 
         response = await call_next(request)
-        return response
\ No newline at end of file
+        return response
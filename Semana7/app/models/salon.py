@@ -0,0 +1,70 @@
+# app/models/salon.py
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String, Time
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class SalonCliente(Base):
+    __tablename__ = "salon_cliente"
+
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String(120), nullable=False)
+    telefono = Column(String(30), nullable=True)
+
+
+class SalonEstilista(Base):
+    __tablename__ = "salon_estilista"
+
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String(120), nullable=False)
+
+    horarios = relationship("SalonHorario", back_populates="estilista")
+
+
+class SalonServicio(Base):
+    __tablename__ = "salon_servicio"
+
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String(120), nullable=False)
+    categoria = Column(String(60), nullable=True)
+    duracion_min = Column(Integer, nullable=False, default=30)
+    precio = Column(Float, nullable=False, default=0)
+
+
+class SalonHorario(Base):
+    """Horario laboral de un estilista para un día de la semana (0 = lunes)."""
+    __tablename__ = "salon_horario"
+
+    id = Column(Integer, primary_key=True)
+    estilista_id = Column(Integer, ForeignKey("salon_estilista.id"), nullable=False)
+    dia_semana = Column(Integer, nullable=False)
+    hora_inicio = Column(Time, nullable=False)
+    hora_fin = Column(Time, nullable=False)
+
+    estilista = relationship("SalonEstilista", back_populates="horarios")
+
+
+class SalonCita(Base):
+    __tablename__ = "salon_cita"
+
+    id = Column(Integer, primary_key=True)
+    cliente_id = Column(Integer, ForeignKey("salon_cliente.id"), nullable=False)
+    estilista_id = Column(Integer, ForeignKey("salon_estilista.id"), nullable=False)
+    servicio_id = Column(Integer, ForeignKey("salon_servicio.id"), nullable=False)
+    fecha_cita = Column(Date, nullable=False)
+    hora_inicio = Column(Time, nullable=False)
+    hora_fin = Column(Time, nullable=False)
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente | confirmada | cancelada
+
+    cliente = relationship("SalonCliente")
+    estilista = relationship("SalonEstilista")
+    servicio = relationship("SalonServicio")
+
+
+class SalonDemandaDiaria(Base):
+    """Citas confirmadas por servicio y día, mantenida por app/services/demand_service.py."""
+    __tablename__ = "salon_demanda_diaria"
+
+    fecha = Column(Date, primary_key=True)
+    servicio_id = Column(Integer, ForeignKey("salon_servicio.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
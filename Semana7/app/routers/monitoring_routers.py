@@ -0,0 +1,113 @@
+# app/routers/monitoring_routers.py
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from monitoring.event_loop import loop_monitor
+from monitoring.profiling import continuous_profiler
+from app.cache.redis_registry import redis_registry
+
+# Endpoints internos de diagnóstico y métricas
+router = APIRouter(prefix="/monitoring", tags=["Monitoreo"])
+
+
+@router.get("/event-loop")
+async def get_event_loop_metrics():
+    """Histograma de lag del event loop y últimos bloqueos detectados (con stack)."""
+    return loop_monitor.snapshot()
+
+
+@router.get("/redis")
+def get_redis_status():
+    """Health check por propósito y uso de los pools compartidos de Redis."""
+    return {"health": redis_registry.health_check(), "pools": redis_registry.pool_stats()}
+
+
+# Los endpoints que exponen SQL o stacks, o que cuestan consultas a la BD, piden este token
+def requiere_token_perfilado(request: Request):
+    """Mismo token que pide un perfil (X-Profile o ?__profile=); sin PROFILE_TOKEN no hay acceso."""
+    from app.database.profiling import request_profiler
+    pedido = request.headers.get("x-profile") or request.query_params.get("__profile")
+    if not request_profiler.autorizado(pedido):
+        raise HTTPException(status_code=403, detail="Token de perfilado inválido")
+
+
+@router.get("/index-advisor", dependencies=[Depends(requiere_token_perfilado)])
+def get_index_advisor(limit: int = 10):
+    """Índices candidatos según el workload observado, con su migración SQL."""
+    from app.database import index_advisor
+    candidates = index_advisor.recommend(limit=limit)
+    return {
+        "statements_observed": len(index_advisor.collector.statements),
+        "candidates": [
+            {
+                "name": c.name,
+                "table": c.table,
+                "columns": list(c.columns),
+                "reasons": c.reasons,
+                "estimated_benefit_ms": round(c.estimated_benefit_ms, 3),
+                "statements": c.statements,
+            }
+            for c in candidates
+        ],
+        "migration": index_advisor.emit_migration(candidates),
+    }
+
+
+@router.get("/sql", dependencies=[Depends(requiere_token_perfilado)])
+def get_sql_metrics(limit: int = 20, order_by: str = "total_ms"):
+    """Fingerprints SQL con conteo y percentiles, y requests marcados como N+1."""
+    from app.database import query_instrumentation
+    return query_instrumentation.snapshot(limit=limit, order_by=order_by)
+
+
+@router.get("/profiles", dependencies=[Depends(requiere_token_perfilado)])
+def list_profiles():
+    """Últimos perfiles de request guardados."""
+    from app.database.profiling import request_profiler
+    return request_profiler.list()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(requiere_token_perfilado)])
+def get_profile(profile_id: str, format: str = "speedscope"):
+    """Perfil en formato speedscope (JSON, con el SQL ejecutado) o collapsed stacks."""
+    from app.database.profiling import request_profiler
+    perfil = request_profiler.get(profile_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    if format == "collapsed":
+        return PlainTextResponse(perfil.collapsed())
+    return JSONResponse(perfil.speedscope(), headers={
+        "Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'})
+
+
+@router.get("/profiler", dependencies=[Depends(requiere_token_perfilado)])
+def get_continuous_profile(last: int = 0, top: int = 15):
+    """Reparto de CPU por categoría y stacks más calientes de las últimas ventanas."""
+    return continuous_profiler.summary(last=last or None, top=top)
+
+
+@router.get("/profiler/folded", dependencies=[Depends(requiere_token_perfilado)])
+def get_continuous_profile_folded(last: int = 0):
+    """Stacks plegados agregados (para flamegraph.pl o speedscope)."""
+    return PlainTextResponse(continuous_profiler.folded(last=last or None))
+
+
+@router.get("/db-stats", dependencies=[Depends(requiere_token_perfilado)])
+def get_db_stats():
+    """Último snapshot de estadísticas de la BD y regresiones desde el último deploy."""
+    from app.database import db_stats_collector
+    return db_stats_collector.summary()
+
+
+@router.get("/db-stats/trends", dependencies=[Depends(requiere_token_perfilado)])
+def get_db_stats_trends(hours: float = 24, limit: int = 20, fingerprint: Optional[str] = None):
+    """Latencia media por fingerprint en el tiempo, ordenada por cuánto empeora."""
+    from app.database import db_stats_collector
+    return db_stats_collector.trends(hours=hours, limit=limit, fingerprint_=fingerprint)
+
+
+@router.post("/db-stats/deploys", dependencies=[Depends(requiere_token_perfilado)])
+def mark_deploy(version: str):
+    """Marca un deploy: las regresiones se comparan antes vs. después de este punto."""
+    from app.database import db_stats_collector
+    return {"id": db_stats_collector.mark_deploy(version), "version": version}
@@ -1,7 +1,13 @@
 # app/routers/salon_optimized.py
-from fastapi import APIRouter, HTTPException
+import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
 from ..cache.cache_decorators import cache_result
 from ..cache.redis_config import cache_manager
+from ..database import get_db
+from ..database.query_registry import CursorInvalido, QueryDAO
+from ..services.availability_service import AVAILABILITY_IN_MEMORY, availability_service
 
 # Prefijo de ruta y etiquetas para documentación
 router = APIRouter(prefix="/salon", tags=["Peluquería Optimizada"])
@@ -51,3 +57,58 @@ async def get_servicios_disponibles():
         {"id": 4, "nombre": "Tratamiento capilar", "duracion": "60 min"},
     ]
     return catalogo_servicios
+
+
+# --- Disponibilidad: en memoria, con la consulta SQL como respaldo ---
+@router.get("/disponibilidad")
+def get_estilistas_disponibles(fecha: datetime.date, hora_inicio: datetime.time,
+                               hora_fin: datetime.time, db: Session = Depends(get_db)):
+    """
+    Estilistas libres en un horario. Se responde desde el servicio de
+    disponibilidad en memoria; si está deshabilitado o falla, se ejecuta
+    la consulta 'estilistas_disponibles'.
+    """
+    if hora_fin <= hora_inicio:
+        raise HTTPException(status_code=400, detail="hora_fin debe ser posterior a hora_inicio")
+    if AVAILABILITY_IN_MEMORY:
+        try:
+            return {"fuente": "memoria",
+                    "estilistas": availability_service.estilistas_disponibles(fecha, hora_inicio, hora_fin)}
+        except Exception as e:
+            print(f"❌ Error en disponibilidad en memoria, usando SQL: {e}")
+    filas = QueryDAO(db).all("estilistas_disponibles", dia_semana=fecha.weekday(), fecha=fecha,
+                             hora_inicio=hora_inicio, hora_fin=hora_fin)
+    return {"fuente": "sql", "estilistas": [fila._asdict() for fila in filas]}
+
+
+# --- Reporte de demanda: suma el agregado diario ---
+@router.get("/reportes/servicios-demandados")
+def get_servicios_mas_demandados(fecha_inicio: datetime.date, fecha_fin: datetime.date,
+                                 db: Session = Depends(get_db)):
+    """Top 10 de servicios con citas confirmadas en el rango, desde salon_demanda_diaria."""
+    filas = QueryDAO(db).all("servicios_mas_demandados", fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    return [fila._asdict() for fila in filas]
+
+
+
+# --- Listados paginados por cursor (keyset) ---
+def _pagina(dao: QueryDAO, nombre: str, cursor: Optional[str], limit: int, **params):
+    try:
+        filas, next_cursor = dao.page(nombre, cursor, limit, **params)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": [fila._asdict() for fila in filas], "next_cursor": next_cursor}
+
+
+@router.get("/clientes/{cliente_id}/historial")
+def get_historial_cliente(cliente_id: int, cursor: Optional[str] = None,
+                          limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    """Historial de citas del cliente, de la más reciente a la más antigua."""
+    return _pagina(QueryDAO(db), "historial_cliente", cursor, limit, cliente_id=cliente_id)
+
+
+@router.get("/citas/proximas")
+def get_proximas_citas(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200),
+                       db: Session = Depends(get_db)):
+    """Próximas citas confirmadas o pendientes, en orden de agenda."""
+    return _pagina(QueryDAO(db), "proximas_citas", cursor, limit)
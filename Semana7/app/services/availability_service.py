@@ -0,0 +1,293 @@
+# app/services/availability_service.py
+import datetime
+import os
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select
+
+from app.database import SessionLocal
+from app.models.salon import SalonCita, SalonEstilista, SalonHorario
+
+# Estados que ocupan el hueco en la agenda (igual que la consulta SQL)
+ESTADOS_ACTIVOS = ("confirmada", "pendiente")
+# Días de agenda que se mantienen en memoria (los menos consultados se descartan)
+AVAILABILITY_MAX_DIAS = int(os.getenv("AVAILABILITY_MAX_DIAS", "60"))
+
+
+def _min(t: datetime.time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def _time(minutos: int) -> datetime.time:
+    return datetime.time(minutos // 60, minutos % 60)
+
+
+class AgendaDia:
+    """Citas de un estilista en un día, ordenadas por inicio (en minutos)."""
+
+    __slots__ = ("inicios", "citas", "max_duracion")
+
+    def __init__(self):
+        self.inicios: List[int] = []
+        self.citas: List[Tuple[int, int, int]] = []  # (inicio, fin, cita_id)
+        self.max_duracion = 0
+
+    def agregar(self, inicio: int, fin: int, cita_id: int):
+        i = bisect_left(self.citas, (inicio, fin, cita_id))
+        self.citas.insert(i, (inicio, fin, cita_id))
+        self.inicios.insert(i, inicio)
+        self.max_duracion = max(self.max_duracion, fin - inicio)
+
+    def quitar(self, inicio: int, fin: int, cita_id: int):
+        i = bisect_left(self.citas, (inicio, fin, cita_id))
+        if i < len(self.citas) and self.citas[i][2] == cita_id:
+            del self.citas[i]
+            del self.inicios[i]
+
+    def libre(self, inicio: int, fin: int) -> bool:
+        # Solo pueden solaparse las citas que empiezan antes de `fin`; y entre
+        # ellas, ninguna que empiece antes de inicio - max_duracion llega a `inicio`.
+        i = bisect_left(self.inicios, fin) - 1
+        limite = inicio - self.max_duracion
+        while i >= 0 and self.inicios[i] >= limite:
+            if self.citas[i][1] > inicio:
+                return False
+            i -= 1
+        return True
+
+
+class AvailabilityService:
+    """
+    Disponibilidad de estilistas en memoria, para no ejecutar el NOT EXISTS
+    de 'estilistas_disponibles' en cada consulta. Ambos caminos responden lo
+    mismo: el hueco debe caber en un horario del estilista y no solaparse con
+    sus citas activas.
+
+    - Los horarios se cargan una vez; la agenda de cada día se carga la primera
+      vez que se consulta ese día (una sola consulta para todos los estilistas).
+      Las consultas a la BD se hacen fuera del lock: mientras un día se carga,
+      los commits que lo tocan se guardan y se reaplican al terminar.
+    - Se mantienen a lo sumo `max_dias` días (LRU); los días ya pasados se
+      descartan al cargar uno nuevo.
+    - Los cambios en SalonCita se aplican de forma incremental cuando la sesión
+      hace commit (eventos after_flush / after_commit); un rollback los descarta.
+      La invalidación es local al proceso: con varios workers o réplicas cada
+      uno solo ve sus propios commits, así que esta caché es para despliegues
+      de un solo proceso (en otro caso, AVAILABILITY_IN_MEMORY=0).
+    - Si la caché no está habilitada o falla, el router usa la consulta SQL.
+    """
+
+    def __init__(self, session_factory, max_dias: int = AVAILABILITY_MAX_DIAS):
+        self.session_factory = session_factory
+        self.max_dias = max(1, max_dias)
+        self._lock = threading.RLock()
+        self._estilistas: Optional[Dict[int, str]] = None
+        self._version_horarios = 0
+        self._horarios: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self._agenda: Dict[Tuple[int, datetime.date], AgendaDia] = {}
+        self._dias_cargados: "OrderedDict[datetime.date, None]" = OrderedDict()
+        # día en carga -> commits recibidos mientras tanto (se reaplican al terminar)
+        self._cargando: Dict[datetime.date, list] = {}
+        self._citas: Dict[int, Tuple[int, datetime.date, int, int]] = {}
+        self._conectadas: list = []
+
+    # --- carga perezosa (fuera del lock) ---
+    def _cargar_horarios(self):
+        with self._lock:
+            version = self._version_horarios
+        with self.session_factory() as session:
+            estilistas = dict(session.execute(select(SalonEstilista.id, SalonEstilista.nombre)).all())
+            horarios: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+            for est_id, dia, inicio, fin in session.execute(select(
+                SalonHorario.estilista_id, SalonHorario.dia_semana, SalonHorario.hora_inicio, SalonHorario.hora_fin
+            )):
+                insort(horarios.setdefault((est_id, dia), []), (_min(inicio), _min(fin)))
+        with self._lock:
+            # Si se invalidó durante la carga, lo leído puede estar desactualizado
+            if version == self._version_horarios:
+                self._horarios = horarios
+                self._estilistas = estilistas
+
+    def _cargar_dia(self, fecha: datetime.date):
+        with self._lock:
+            if fecha in self._dias_cargados:
+                return
+            self._cargando.setdefault(fecha, [])
+        try:
+            with self.session_factory() as session:
+                filas = session.execute(
+                    select(SalonCita.id, SalonCita.estilista_id, SalonCita.hora_inicio, SalonCita.hora_fin)
+                    .where(SalonCita.fecha_cita == fecha, SalonCita.estado.in_(ESTADOS_ACTIVOS))
+                ).all()
+        except Exception:
+            with self._lock:
+                if fecha not in self._dias_cargados:
+                    self._cargando.pop(fecha, None)
+            raise
+        with self._lock:
+            if fecha in self._dias_cargados:  # otro hilo lo cargó antes
+                return
+            for cita_id, est_id, inicio, fin in filas:
+                self._agregar(cita_id, est_id, fecha, _min(inicio), _min(fin))
+            self._dias_cargados[fecha] = None
+            # Los commits concurrentes con la consulta pueden no estar en `filas`
+            for cambio in self._cargando.pop(fecha, []):
+                self.aplicar_cita(*cambio)
+            self._expulsar(conservar=fecha)
+
+    def _expulsar(self, conservar: datetime.date):
+        hoy = datetime.date.today()
+        for fecha in [f for f in self._dias_cargados if f < hoy and f != conservar]:
+            self._descartar_dia(fecha)
+        while len(self._dias_cargados) > self.max_dias:
+            self._descartar_dia(next(iter(self._dias_cargados)))
+
+    def _descartar_dia(self, fecha: datetime.date):
+        del self._dias_cargados[fecha]
+        for clave in [k for k in self._agenda if k[1] == fecha]:
+            for _, _, cita_id in self._agenda.pop(clave).citas:
+                self._citas.pop(cita_id, None)
+
+    @contextmanager
+    def _dia(self, fecha: datetime.date):
+        """Carga horarios y el día si hace falta y devuelve con el lock tomado."""
+        while True:
+            if self._estilistas is None:
+                self._cargar_horarios()
+            self._cargar_dia(fecha)
+            self._lock.acquire()
+            # Pudo invalidarse o descartarse entre la carga y el lock
+            if self._estilistas is not None and fecha in self._dias_cargados:
+                break
+            self._lock.release()
+        try:
+            self._dias_cargados.move_to_end(fecha)
+            yield
+        finally:
+            self._lock.release()
+
+    def _agregar(self, cita_id: int, est_id: int, fecha: datetime.date, inicio: int, fin: int):
+        if cita_id in self._citas:
+            return
+        self._agenda.setdefault((est_id, fecha), AgendaDia()).agregar(inicio, fin, cita_id)
+        self._citas[cita_id] = (est_id, fecha, inicio, fin)
+
+    def _quitar(self, cita_id: int):
+        previa = self._citas.pop(cita_id, None)
+        if previa is not None:
+            est_id, fecha, inicio, fin = previa
+            self._agenda[(est_id, fecha)].quitar(inicio, fin, cita_id)
+
+    # --- actualización incremental ---
+    def aplicar_cita(self, cita_id: int, estilista_id: int, fecha: datetime.date,
+                     hora_inicio: datetime.time, hora_fin: datetime.time, estado: Optional[str]):
+        """Refleja una cita creada, modificada, cancelada (estado inactivo) o borrada (estado None)."""
+        with self._lock:
+            self._quitar(cita_id)
+            if fecha in self._cargando:
+                self._cargando[fecha].append((cita_id, estilista_id, fecha, hora_inicio, hora_fin, estado))
+            # Si el día no está cargado se leerá completo desde la BD cuando se consulte
+            if estado in ESTADOS_ACTIVOS and fecha in self._dias_cargados:
+                self._agregar(cita_id, estilista_id, fecha, _min(hora_inicio), _min(hora_fin))
+
+    def invalidar_horarios(self):
+        with self._lock:
+            self._estilistas = None
+            self._version_horarios += 1
+
+    def attach(self, session_factory=None):
+        """Escucha los commits de las sesiones creadas por `session_factory` (una sola vez)."""
+        target = session_factory or self.session_factory
+        if target in self._conectadas:
+            return
+        self._conectadas.append(target)
+
+        @event.listens_for(target, "after_flush")
+        def _registrar(session, flush_context):
+            # Copiamos los valores ahora: tras el commit los objetos quedan expirados
+            cambios = session.info.setdefault("disponibilidad", [])
+            for obj in session.new | session.dirty | session.deleted:
+                if isinstance(obj, SalonCita):
+                    estado = None if obj in session.deleted else obj.estado
+                    cambios.append((obj.id, obj.estilista_id, obj.fecha_cita,
+                                    obj.hora_inicio, obj.hora_fin, estado))
+                elif isinstance(obj, (SalonHorario, SalonEstilista)):
+                    cambios.append(None)
+
+        @event.listens_for(target, "after_commit")
+        def _aplicar(session):
+            for cambio in session.info.pop("disponibilidad", []):
+                if cambio is None:
+                    self.invalidar_horarios()
+                else:
+                    self.aplicar_cita(*cambio)
+
+        @event.listens_for(target, "after_rollback")
+        def _descartar(session):
+            session.info.pop("disponibilidad", None)
+
+    # --- consultas ---
+    def esta_libre(self, estilista_id: int, fecha: datetime.date,
+                   hora_inicio: datetime.time, hora_fin: datetime.time) -> bool:
+        with self._dia(fecha):
+            agenda = self._agenda.get((estilista_id, fecha))
+            return agenda is None or agenda.libre(_min(hora_inicio), _min(hora_fin))
+
+    def estilistas_disponibles(self, fecha: datetime.date, hora_inicio: datetime.time,
+                               hora_fin: datetime.time) -> List[dict]:
+        """
+        Mismas columnas que la consulta SQL, pero solo para los horarios que
+        cubren el hueco pedido y sin citas que se solapen.
+        """
+        inicio, fin = _min(hora_inicio), _min(hora_fin)
+        dia = fecha.weekday()
+        resultado = []
+        with self._dia(fecha):
+            for est_id, nombre in self._estilistas.items():
+                for h_ini, h_fin in self._horarios.get((est_id, dia), ()):
+                    if h_ini <= inicio and fin <= h_fin:
+                        agenda = self._agenda.get((est_id, fecha))
+                        if agenda is None or agenda.libre(inicio, fin):
+                            resultado.append({"id": est_id, "nombre": nombre, "dia_semana": dia,
+                                              "hora_inicio": _time(h_ini), "hora_fin": _time(h_fin)})
+                        break
+        resultado.sort(key=lambda r: r["nombre"])
+        return resultado
+
+    def huecos_libres(self, fecha: datetime.date, duracion_min: int) -> Dict[int, List[Tuple[datetime.time, datetime.time]]]:
+        """Huecos de al menos `duracion_min` minutos por estilista dentro de su horario."""
+        dia = fecha.weekday()
+        huecos: Dict[int, List[Tuple[datetime.time, datetime.time]]] = {}
+        with self._dia(fecha):
+            for est_id in self._estilistas:
+                agenda = self._agenda.get((est_id, fecha))
+                citas = agenda.citas if agenda else []
+                for h_ini, h_fin in self._horarios.get((est_id, dia), ()):
+                    cursor = h_ini
+                    for c_ini, c_fin, _ in citas:
+                        if c_fin <= cursor or c_ini >= h_fin:
+                            continue
+                        if c_ini - cursor >= duracion_min:
+                            huecos.setdefault(est_id, []).append((_time(cursor), _time(c_ini)))
+                        cursor = max(cursor, c_fin)
+                    if h_fin - cursor >= duracion_min:
+                        huecos.setdefault(est_id, []).append((_time(cursor), _time(h_fin)))
+        return huecos
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "estilistas": len(self._estilistas or {}),
+                "dias_cargados": len(self._dias_cargados),
+                "max_dias": self.max_dias,
+                "citas_en_memoria": len(self._citas),
+            }
+
+
+# Caché de disponibilidad del dominio (AVAILABILITY_IN_MEMORY=0 usa solo SQL)
+AVAILABILITY_IN_MEMORY = os.getenv("AVAILABILITY_IN_MEMORY", "1") == "1"
+availability_service = AvailabilityService(SessionLocal)
@@ -0,0 +1,150 @@
+# app/services/demand_service.py
+from collections import Counter
+from typing import Tuple
+
+from sqlalchemy import delete, event, func, inspect, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.salon import SalonCita, SalonDemandaDiaria
+
+ESTADO_CONTADO = "confirmada"
+
+
+def _antes_y_despues(cita: SalonCita, eliminada: bool) -> Tuple[tuple, tuple]:
+    """Claves (fecha, servicio_id) que la cita sumaba antes y suma después del flush."""
+    estado = inspect(cita)
+
+    def previo(attr):
+        hist = estado.attrs[attr].history
+        return hist.deleted[0] if hist.deleted else getattr(cita, attr)
+
+    if estado.pending:
+        antes = None
+    else:
+        antes = (previo("fecha_cita"), previo("servicio_id")) if previo("estado") == ESTADO_CONTADO else None
+    if eliminada:
+        despues = None
+    else:
+        despues = (cita.fecha_cita, cita.servicio_id) if cita.estado == ESTADO_CONTADO else None
+    return antes, despues
+
+
+def _upsert(dialect: str):
+    """INSERT ... ON CONFLICT del dialecto, o None si no tiene uno."""
+    tabla = SalonDemandaDiaria.__table__
+    if dialect in ("sqlite", "postgresql"):
+        stmt = sqlite_insert(tabla) if dialect == "sqlite" else pg_insert(tabla)
+        return stmt.on_conflict_do_update(
+            index_elements=[tabla.c.fecha, tabla.c.servicio_id],
+            set_={"total": tabla.c.total + stmt.excluded.total},
+        )
+    if dialect == "mysql":
+        stmt = mysql_insert(tabla)
+        return stmt.on_duplicate_key_update(total=tabla.c.total + stmt.inserted.total)
+    return None
+
+
+def _sumar_generico(conn, filas):
+    """Resto de dialectos: UPDATE del total y, si la fila no existía, INSERT."""
+    tabla = SalonDemandaDiaria.__table__
+    for fila in filas:
+        resultado = conn.execute(
+            update(tabla)
+            .where(tabla.c.fecha == fila["fecha"], tabla.c.servicio_id == fila["servicio_id"])
+            .values(total=tabla.c.total + fila["total"])
+        )
+        if resultado.rowcount == 0:
+            conn.execute(insert(tabla), fila)
+
+
+def _capturar_cambios(session, flush_context, instances):
+    # Antes del flush: el historial de atributos todavía tiene los valores previos
+    deltas: Counter = Counter()
+    for cita in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(cita, SalonCita):
+            continue
+        antes, despues = _antes_y_despues(cita, cita in session.deleted)
+        if antes == despues:
+            continue
+        if antes:
+            deltas[antes] -= 1
+        if despues:
+            deltas[despues] += 1
+    if deltas:
+        session.info.setdefault("demanda_deltas", Counter()).update(deltas)
+
+
+def _aplicar_deltas(session, flush_context):
+    """Aplica los deltas en la misma transacción que el cambio de las citas."""
+    deltas = session.info.pop("demanda_deltas", None)
+    if not deltas:
+        return
+    filas = [{"fecha": fecha, "servicio_id": servicio_id, "total": delta}
+             for (fecha, servicio_id), delta in deltas.items() if delta]
+    if filas:
+        conn = session.connection()
+        upsert = _upsert(conn.dialect.name)
+        if upsert is None:
+            _sumar_generico(conn, filas)
+        else:
+            conn.execute(upsert, filas)
+
+
+def _descartar_deltas(session):
+    session.info.pop("demanda_deltas", None)
+
+
+def attach(session_factory):
+    """
+    Mantiene salon_demanda_diaria con los flush de las sesiones creadas por
+    `session_factory` (el sessionmaker de la app), no con todas las sesiones
+    del proceso.
+    """
+    if event.contains(session_factory, "before_flush", _capturar_cambios):
+        return
+    event.listen(session_factory, "before_flush", _capturar_cambios)
+    event.listen(session_factory, "after_flush", _aplicar_deltas)
+    event.listen(session_factory, "after_rollback", _descartar_deltas)
+
+
+def backfill_demanda(session: Session) -> int:
+    """
+    Reconstruye salon_demanda_diaria desde salon_cita (carga inicial o si se
+    hicieron UPDATE masivos que no pasan por los eventos del ORM).
+    """
+    session.execute(delete(SalonDemandaDiaria))
+    agregado = (
+        select(SalonCita.fecha_cita, SalonCita.servicio_id, func.count())
+        .where(SalonCita.estado == ESTADO_CONTADO)
+        .group_by(SalonCita.fecha_cita, SalonCita.servicio_id)
+    )
+    resultado = session.execute(
+        insert(SalonDemandaDiaria).from_select(["fecha", "servicio_id", "total"], agregado)
+    )
+    session.commit()
+    return resultado.rowcount
+
+
+def asegurar_demanda(session: Session) -> int:
+    """
+    Arranque de la app: crea salon_demanda_diaria si falta y, solo si está
+    vacía, la rellena desde salon_cita. Idempotente: con datos no toca nada.
+    """
+    bind = session.get_bind()
+    if not inspect(bind).has_table(SalonCita.__tablename__):
+        return 0
+    SalonDemandaDiaria.__table__.create(bind, checkfirst=True)
+    if session.scalar(select(SalonDemandaDiaria.fecha).limit(1)) is not None:
+        return 0
+    return backfill_demanda(session)
+
+
+if __name__ == "__main__":
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(engine, tables=[SalonDemandaDiaria.__table__])
+    with SessionLocal() as db:
+        print(f"✅ salon_demanda_diaria reconstruida: {backfill_demanda(db)} filas")
@@ -0,0 +1,102 @@
+# monitoring/benchmark_queries.py
+"""
+Compara la agenda por estilista ejecutada con el registro de consultas
+(sentencia compilada una vez + registros livianos) contra la misma consulta
+hecha ad-hoc con el ORM (construcción de la query + hidratación de objetos).
+
+Uso: python -m monitoring.benchmark_queries [iteraciones] [citas]
+"""
+import datetime
+import statistics
+import sys
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.database.query_registry import QueryDAO, attach_prepared, prepared_connect_args
+from app.models.salon import SalonCita, SalonCliente, SalonEstilista, SalonServicio
+
+FECHA = datetime.date(2025, 10, 20)
+
+
+def seed(session: Session, citas: int = 2000, estilistas: int = 10):
+    session.add_all([SalonEstilista(id=i, nombre=f"Estilista {i}") for i in range(1, estilistas + 1)])
+    session.add_all([SalonCliente(id=i, nombre=f"Cliente {i}") for i in range(1, 201)])
+    session.add_all([SalonServicio(id=i, nombre=f"Servicio {i}", duracion_min=30) for i in range(1, 11)])
+    for i in range(citas):
+        inicio = datetime.time(8 + i % 10, (i * 7) % 60)
+        session.add(SalonCita(
+            cliente_id=1 + i % 200, estilista_id=1 + i % estilistas, servicio_id=1 + i % 10,
+            fecha_cita=FECHA + datetime.timedelta(days=i // 200), hora_inicio=inicio,
+            hora_fin=datetime.time(inicio.hour + 1, inicio.minute),
+            estado="confirmada" if i % 3 else "pendiente",
+        ))
+    session.commit()
+
+
+def agenda_orm(session: Session, estilista_id: int):
+    citas = (
+        session.query(SalonCita)
+        .options(joinedload(SalonCita.cliente), joinedload(SalonCita.servicio))
+        .filter(SalonCita.estilista_id == estilista_id, SalonCita.fecha_cita == FECHA)
+        .order_by(SalonCita.hora_inicio)
+        .all()
+    )
+    resultado = [(c.id, c.fecha_cita, c.hora_inicio, c.hora_fin, c.cliente.nombre, c.servicio.nombre, c.estado)
+                 for c in citas]
+    session.expunge_all()  # cada request real empieza con la sesión vacía
+    return resultado
+
+
+def agenda_registry(session: Session, estilista_id: int):
+    return QueryDAO(session).all("citas_por_estilista", estilista_id=estilista_id, fecha=FECHA)
+
+
+def _medir(func: Callable, session: Session, iterations: int) -> Dict[str, float]:
+    tiempos = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(session, 1 + i % 10)
+        tiempos.append((time.perf_counter() - start) * 1000)
+    tiempos.sort()
+    return {
+        "avg_ms": round(statistics.mean(tiempos), 4),
+        "p50_ms": round(tiempos[len(tiempos) // 2], 4),
+        "p95_ms": round(tiempos[int(len(tiempos) * 0.95) - 1], 4),
+    }
+
+
+def run_benchmark(iterations: int = 500, citas: int = 2000, url: str = "sqlite://") -> Dict[str, Dict[str, float]]:
+    connect_args = prepared_connect_args(url)
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool if url == "sqlite://" else None)
+    attach_prepared(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, citas)
+        # Calentamiento: cachés de compilación y de sentencias
+        agenda_orm(session, 1)
+        agenda_registry(session, 1)
+        resultados = {
+            "orm_ad_hoc": _medir(agenda_orm, session, iterations),
+            "query_registry": _medir(agenda_registry, session, iterations),
+        }
+    engine.dispose()
+    resultados["speedup"] = round(resultados["orm_ad_hoc"]["avg_ms"] / resultados["query_registry"]["avg_ms"], 2)
+    return resultados
+
+
+if __name__ == "__main__":
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    total_citas = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    resultados = run_benchmark(iteraciones, total_citas)
+    print("📊 Agenda por estilista")
+    for nombre in ("orm_ad_hoc", "query_registry"):
+        r = resultados[nombre]
+        print(f"  {nombre:<16} avg {r['avg_ms']:.3f}ms | p50 {r['p50_ms']:.3f}ms | p95 {r['p95_ms']:.3f}ms")
+    print(f"🚀 Speedup: x{resultados['speedup']}")
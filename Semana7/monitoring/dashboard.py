@@ -1,16 +1,11 @@
 # monitoring/dashboard.py
-import redis
 import time
-import os
+from app.cache.redis_registry import redis_registry
 
 def display_metrics():
     """Muestra un dashboard simple en la consola."""
-    redis_client = redis.Redis(
-        host=os.getenv('REDIS_HOST', 'localhost'),
-        port=os.getenv('REDIS_PORT', 6379),
-        db=0,
-        decode_responses=True
-    )
+    redis_client = redis_registry.client('cache')
+    metrics_client = redis_registry.client('metrics')
     
     while True:
         # Obtener métricas de Redis
@@ -20,8 +15,8 @@ def display_metrics():
         hit_ratio = (keyspace_hits / (keyspace_hits + keyspace_misses)) * 100 if (keyspace_hits + keyspace_misses) > 0 else 0
         
         # Obtener métricas de la aplicación
-        total_hits = sum([int(redis_client.get(k) or 0) for k in redis_client.keys('metrics:cache_hits:*')])
-        total_misses = sum([int(redis_client.get(k) or 0) for k in redis_client.keys('metrics:cache_misses:*')])
+        total_hits = sum(int(metrics_client.get(k) or 0) for k in metrics_client.scan_iter('metrics:cache_hits:*'))
+        total_misses = sum(int(metrics_client.get(k) or 0) for k in metrics_client.scan_iter('metrics:cache_misses:*'))
         app_hit_ratio = (total_hits / (total_hits + total_misses)) * 100 if (total_hits + total_misses) > 0 else 0
         
         # Presentación en la consola
@@ -34,6 +29,9 @@ def display_metrics():
         print("-" * 40)
         print(f"Relación de Aciertos (Métricas App): {app_hit_ratio:.2f}%")
         print(f"Aciertos: {total_hits} | Fallos: {total_misses}")
+        print("-" * 40)
+        for purpose, stats in redis_registry.pool_stats().items():
+            print(f"Pool '{purpose}': {stats}")
         print("\n\n")
         
         time.sleep(5)
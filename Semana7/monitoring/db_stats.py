@@ -0,0 +1,379 @@
+# monitoring/db_stats.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+
+from app.database.query_instrumentation import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Archivo SQLite local con la serie temporal (independiente de la BD del dominio)
+DB_STATS_PATH = os.getenv("DB_STATS_PATH", "./db_stats.db")
+DB_STATS_INTERVAL_S = float(os.getenv("DB_STATS_INTERVAL_S", "60"))
+DB_STATS_RETENTION_DAYS = float(os.getenv("DB_STATS_RETENTION_DAYS", "14"))
+# Una consulta regresó si tras el deploy su latencia media es >= factor × la de antes
+DB_STATS_REGRESSION_FACTOR = float(os.getenv("DB_STATS_REGRESSION_FACTOR", "1.5"))
+DB_STATS_ENABLED = os.getenv("DB_STATS_COLLECTOR", "0") == "1"
+APP_VERSION = os.getenv("APP_VERSION", "")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY, ts REAL NOT NULL, fuente TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_deltas (
+    snapshot_id INTEGER NOT NULL, fingerprint TEXT NOT NULL,
+    calls INTEGER NOT NULL, total_ms REAL NOT NULL, filas INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_query_deltas_fp ON query_deltas (fingerprint, snapshot_id);
+CREATE TABLE IF NOT EXISTS table_deltas (
+    snapshot_id INTEGER NOT NULL, tabla TEXT NOT NULL, filas INTEGER,
+    filas_muertas INTEGER, seq_scan INTEGER, idx_scan INTEGER, escrituras INTEGER
+);
+CREATE TABLE IF NOT EXISTS column_stats (
+    snapshot_id INTEGER NOT NULL, tabla TEXT NOT NULL, columna TEXT NOT NULL,
+    n_distinct REAL, correlation REAL
+);
+CREATE TABLE IF NOT EXISTS fingerprints (fingerprint TEXT PRIMARY KEY, sql TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS deploys (id INTEGER PRIMARY KEY, ts REAL NOT NULL, version TEXT NOT NULL);
+"""
+
+# Contadores acumulados de pg_stat_user_tables: se guardan como delta por intervalo
+_PG_TABLE_COUNTERS = ("seq_scan", "idx_scan", "escrituras")
+
+
+class StatsStore:
+    """Serie temporal compacta en SQLite: solo deltas por intervalo y stats que cambiaron."""
+
+    def __init__(self, path: str = DB_STATS_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def guardar(self, ts: float, fuente: str, queries: Dict[str, Dict[str, Any]],
+                tablas: Dict[str, Dict[str, Any]], columnas: Dict[Tuple[str, str], Dict[str, Any]]) -> int:
+        with self._lock:
+            db = self._db()
+            with db:
+                snapshot_id = db.execute("INSERT INTO snapshots (ts, fuente) VALUES (?, ?)", (ts, fuente)).lastrowid
+                db.executemany("INSERT OR IGNORE INTO fingerprints (fingerprint, sql) VALUES (?, ?)",
+                               [(fp, q["sql"]) for fp, q in queries.items()])
+                db.executemany(
+                    "INSERT INTO query_deltas (snapshot_id, fingerprint, calls, total_ms, filas) VALUES (?, ?, ?, ?, ?)",
+                    [(snapshot_id, fp, q["calls"], q["total_ms"], q.get("filas", 0)) for fp, q in queries.items()])
+                db.executemany(
+                    "INSERT INTO table_deltas (snapshot_id, tabla, filas, filas_muertas, seq_scan, idx_scan, escrituras) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(snapshot_id, t, d.get("filas"), d.get("filas_muertas"), d.get("seq_scan"), d.get("idx_scan"),
+                      d.get("escrituras")) for t, d in tablas.items()])
+                db.executemany(
+                    "INSERT INTO column_stats (snapshot_id, tabla, columna, n_distinct, correlation) VALUES (?, ?, ?, ?, ?)",
+                    [(snapshot_id, t, c, d.get("n_distinct"), d.get("correlation")) for (t, c), d in columnas.items()])
+            return snapshot_id
+
+    def registrar_deploy(self, version: str, ts: float) -> int:
+        with self._lock, self._db() as db:
+            return db.execute("INSERT INTO deploys (ts, version) VALUES (?, ?)", (ts, version)).lastrowid
+
+    def ultimo_deploy(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fila = self._db().execute("SELECT id, ts, version FROM deploys ORDER BY ts DESC, id DESC LIMIT 1").fetchone()
+        return {"id": fila[0], "ts": fila[1], "version": fila[2]} if fila else None
+
+    def agregados(self, desde: float, hasta: float) -> Dict[str, Dict[str, Any]]:
+        """Llamadas y tiempo total por fingerprint en (desde, hasta]."""
+        with self._lock:
+            filas = self._db().execute(
+                "SELECT q.fingerprint, f.sql, SUM(q.calls), SUM(q.total_ms) FROM query_deltas q "
+                "JOIN snapshots s ON s.id = q.snapshot_id JOIN fingerprints f ON f.fingerprint = q.fingerprint "
+                "WHERE s.ts > ? AND s.ts <= ? GROUP BY q.fingerprint, f.sql", (desde, hasta)).fetchall()
+        return {fp: {"sql": sql, "calls": calls, "total_ms": total} for fp, sql, calls, total in filas}
+
+    def series(self, desde: float, fingerprint_: Optional[str] = None) -> Dict[str, List[Tuple[float, int, float]]]:
+        """Puntos (ts, calls, total_ms) por fingerprint desde `desde`."""
+        sql = ("SELECT q.fingerprint, s.ts, q.calls, q.total_ms FROM query_deltas q "
+               "JOIN snapshots s ON s.id = q.snapshot_id WHERE s.ts >= ? AND q.calls > 0")
+        params: List[Any] = [desde]
+        if fingerprint_:
+            sql += " AND q.fingerprint = ?"
+            params.append(fingerprint_)
+        with self._lock:
+            filas = self._db().execute(sql + " ORDER BY s.ts", params).fetchall()
+        series: Dict[str, List[Tuple[float, int, float]]] = {}
+        for fp, ts, calls, total in filas:
+            series.setdefault(fp, []).append((ts, calls, total))
+        return series
+
+    def sql_de(self, fingerprints: List[str]) -> Dict[str, str]:
+        if not fingerprints:
+            return {}
+        marcas = ",".join("?" * len(fingerprints))
+        with self._lock:
+            filas = self._db().execute(
+                f"SELECT fingerprint, sql FROM fingerprints WHERE fingerprint IN ({marcas})", fingerprints).fetchall()
+        return dict(filas)
+
+    def tablas(self, snapshot_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            filas = self._db().execute(
+                "SELECT tabla, filas, filas_muertas, seq_scan, idx_scan, escrituras FROM table_deltas "
+                "WHERE snapshot_id = ? ORDER BY tabla", (snapshot_id,)).fetchall()
+        columnas = ("tabla", "filas", "filas_muertas", "seq_scan", "idx_scan", "escrituras")
+        return [dict(zip(columnas, fila)) for fila in filas]
+
+    def ultimo_snapshot(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fila = self._db().execute("SELECT id, ts, fuente FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+            total = self._db().execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        return {"id": fila[0], "ts": fila[1], "fuente": fila[2], "total_snapshots": total} if fila else None
+
+    def purgar(self, antes_de: float) -> int:
+        with self._lock, self._db() as db:
+            viejos = "SELECT id FROM snapshots WHERE ts < ?"
+            for tabla in ("query_deltas", "table_deltas", "column_stats"):
+                db.execute(f"DELETE FROM {tabla} WHERE snapshot_id IN ({viejos})", (antes_de,))
+            borrados = db.execute("DELETE FROM snapshots WHERE ts < ?", (antes_de,)).rowcount
+            db.execute("DELETE FROM fingerprints WHERE fingerprint NOT IN (SELECT DISTINCT fingerprint FROM query_deltas)")
+            return borrados
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _leer_postgres(conn, instrumentation) -> Tuple[Dict, Dict, Dict]:
+    """Lecturas acumuladas de pg_stat_statements (PG13+), pg_stat_user_tables y pg_stats."""
+    queries: Dict[str, Dict[str, Any]] = {}
+    try:
+        filas = conn.execute(text(
+            "SELECT query, calls, total_exec_time, rows FROM pg_stat_statements "
+            "WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())")).all()
+        for query, calls, total_ms, rows in filas:
+            fp = fingerprint(query)
+            q = queries.setdefault(fp, {"sql": fp, "calls": 0, "total_ms": 0.0, "filas": 0})
+            q["calls"] += calls
+            q["total_ms"] += total_ms
+            q["filas"] += rows
+    except Exception as e:
+        # Sin la extensión: se usan los fingerprints medidos por la propia app
+        logger.warning("pg_stat_statements no disponible (%s), usando la instrumentación local",
+                       e.__class__.__name__)
+        conn.rollback()
+        queries = _leer_instrumentacion(instrumentation)
+
+    tablas = {
+        relname: {"filas": vivas, "filas_muertas": muertas, "seq_scan": seq or 0, "idx_scan": idx or 0,
+                  "escrituras": ins + upd + dele}
+        for relname, vivas, muertas, seq, idx, ins, upd, dele in conn.execute(text(
+            "SELECT relname, n_live_tup, n_dead_tup, seq_scan, idx_scan, n_tup_ins, n_tup_upd, n_tup_del "
+            "FROM pg_stat_user_tables")).all()
+    }
+    columnas = {
+        (tabla, columna): {"n_distinct": n_distinct, "correlation": correlation}
+        for tabla, columna, n_distinct, correlation in conn.execute(text(
+            "SELECT tablename, attname, n_distinct, correlation FROM pg_stats WHERE schemaname = 'public'")).all()
+    }
+    return queries, tablas, columnas
+
+
+def _leer_sqlite(conn, instrumentation) -> Tuple[Dict, Dict, Dict]:
+    """Equivalente local: fingerprints de la app, filas por tabla y sqlite_stat1 (tras ANALYZE)."""
+    queries = _leer_instrumentacion(instrumentation)
+    tablas = {}
+    for tabla in inspect(conn).get_table_names():
+        filas = conn.execute(text(f'SELECT COUNT(*) FROM "{tabla}"')).scalar()
+        tablas[tabla] = {"filas": filas}
+    columnas = {}
+    if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first():
+        for tabla, indice, stat in conn.execute(text("SELECT tbl, idx, stat FROM sqlite_stat1")).all():
+            partes = [int(p) for p in (stat or "").split() if p.isdigit()]
+            # 'N a b ...': N filas, a filas promedio por valor de la primera columna del índice
+            if indice and len(partes) >= 2 and partes[1]:
+                columnas[(tabla, indice)] = {"n_distinct": partes[0] / partes[1], "correlation": None}
+    return queries, tablas, columnas
+
+
+def _leer_instrumentacion(instrumentation) -> Dict[str, Dict[str, Any]]:
+    if instrumentation is None:
+        return {}
+    return instrumentation.totales()
+
+
+def _delta(actual: Dict[str, Dict[str, Any]], previo: Dict[str, Dict[str, Any]], campos) -> Dict[str, Dict[str, Any]]:
+    """Diferencia de contadores acumulados; si bajaron (reset de stats/reinicio) se toma el valor actual."""
+    deltas = {}
+    for clave, valores in actual.items():
+        anterior = previo.get(clave, {})
+        delta = dict(valores)
+        reinicio = any((valores.get(c) or 0) < (anterior.get(c) or 0) for c in campos)
+        for campo in campos:
+            if not reinicio and valores.get(campo) is not None:
+                delta[campo] = valores[campo] - (anterior.get(campo) or 0)
+        deltas[clave] = delta
+    return deltas
+
+
+def _pendiente(puntos: List[Tuple[float, float]]) -> float:
+    """Pendiente por mínimos cuadrados (unidad de y por hora)."""
+    n = len(puntos)
+    if n < 2:
+        return 0.0
+    mx = sum(x for x, _ in puntos) / n
+    my = sum(y for _, y in puntos) / n
+    var = sum((x - mx) ** 2 for x, _ in puntos)
+    if var == 0:
+        return 0.0
+    return sum((x - mx) * (y - my) for x, y in puntos) / var * 3600
+
+
+class DbStatsCollector:
+    """
+    Colector periódico de estadísticas de la base de datos.
+
+    Cada `interval_s` lee los contadores acumulados (pg_stat_statements,
+    pg_stat_user_tables y pg_stats en PostgreSQL; la instrumentación local,
+    filas por tabla y sqlite_stat1 en SQLite), guarda los deltas del intervalo
+    en un StatsStore y revisa si alguna consulta empeoró desde el último deploy.
+    """
+
+    def __init__(self, engine, store: StatsStore, instrumentation=None, interval_s: float = DB_STATS_INTERVAL_S,
+                 retention_days: float = DB_STATS_RETENTION_DAYS, regression_factor: float = DB_STATS_REGRESSION_FACTOR,
+                 min_calls: int = 20, min_delta_ms: float = 1.0, window_s: float = 3600):
+        self.engine = engine
+        self.store = store
+        self.instrumentation = instrumentation
+        self.interval_s = interval_s
+        self.retention_days = retention_days
+        self.regression_factor = regression_factor
+        self.min_calls = min_calls
+        self.min_delta_ms = min_delta_ms
+        self.window_s = window_s
+        self._previo: Optional[Tuple[Dict, Dict, Dict]] = None
+        self._alertadas: set = set()  # (deploy_id, fingerprint) ya avisados
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- recolección ---
+    def _leer(self) -> Tuple[Dict, Dict, Dict]:
+        lector = _leer_postgres if self.engine.dialect.name == "postgresql" else _leer_sqlite
+        with self.engine.connect() as conn:
+            return lector(conn, self.instrumentation)
+
+    def collect(self) -> Optional[int]:
+        """Toma un snapshot; el primero solo fija la línea base de los contadores."""
+        queries, tablas, columnas = self._leer()
+        previo, self._previo = self._previo, (queries, tablas, columnas)
+        if previo is None:
+            return None
+        queries_delta = {fp: q for fp, q in _delta(queries, previo[0], ("calls", "total_ms", "filas")).items()
+                         if q["calls"] > 0}
+        tablas_delta = _delta(tablas, previo[1], _PG_TABLE_COUNTERS)
+        # pg_stats no es acumulado: solo se guardan las columnas cuyas estadísticas cambiaron
+        columnas_cambiadas = {clave: v for clave, v in columnas.items() if previo[2].get(clave) != v}
+        ahora = time.time()
+        snapshot_id = self.store.guardar(ahora, self.engine.dialect.name, queries_delta, tablas_delta,
+                                         columnas_cambiadas)
+        self.store.purgar(ahora - self.retention_days * 86400)
+        for alerta in self.regressions():
+            clave = (alerta["deploy"]["id"], alerta["fingerprint"])
+            if clave not in self._alertadas:
+                self._alertadas.add(clave)
+                logger.warning("Regresión tras deploy %s: %.2fms → %.2fms (%sx) -> %s",
+                               alerta["deploy"]["version"], alerta["antes_ms"], alerta["despues_ms"],
+                               alerta["factor"], alerta["sql"][:120])
+        return snapshot_id
+
+    def mark_deploy(self, version: str, ts: Optional[float] = None) -> int:
+        """Marca un deploy: las regresiones se miden antes vs. después de este instante."""
+        return self.store.registrar_deploy(version, ts if ts is not None else time.time())
+
+    # --- análisis ---
+    def regressions(self) -> List[Dict[str, Any]]:
+        """Fingerprints cuya latencia media tras el último deploy supera `regression_factor` × la previa."""
+        deploy = self.store.ultimo_deploy()
+        if deploy is None:
+            return []
+        antes = self.store.agregados(deploy["ts"] - self.window_s, deploy["ts"])
+        despues = self.store.agregados(deploy["ts"], time.time())
+        alertas = []
+        for fp, d in despues.items():
+            a = antes.get(fp)
+            if a is None or a["calls"] < self.min_calls or d["calls"] < self.min_calls:
+                continue
+            media_antes = a["total_ms"] / a["calls"]
+            media_despues = d["total_ms"] / d["calls"]
+            if (media_despues >= media_antes * self.regression_factor
+                    and media_despues - media_antes >= self.min_delta_ms):
+                alertas.append({
+                    "deploy": deploy, "fingerprint": fp, "sql": d["sql"],
+                    "antes_ms": round(media_antes, 3), "despues_ms": round(media_despues, 3),
+                    "factor": round(media_despues / media_antes, 2) if media_antes else None,
+                    "calls_antes": a["calls"], "calls_despues": d["calls"],
+                })
+        alertas.sort(key=lambda a: a["despues_ms"] - a["antes_ms"], reverse=True)
+        return alertas
+
+    def trends(self, hours: float = 24, limit: int = 20, fingerprint_: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Serie de latencia media por fingerprint y su pendiente (ms por hora), las que más empeoran primero."""
+        series = self.store.series(time.time() - hours * 3600, fingerprint_)
+        sqls = self.store.sql_de(list(series))
+        resultado = []
+        for fp, puntos in series.items():
+            medias = [(ts, total / calls) for ts, calls, total in puntos]
+            calls = sum(c for _, c, _ in puntos)
+            resultado.append({
+                "fingerprint": fp, "sql": sqls.get(fp, fp), "calls": calls,
+                "mean_ms": round(sum(t for _, _, t in puntos) / calls, 3),
+                "pendiente_ms_por_hora": round(_pendiente(medias), 4),
+                "puntos": [{"ts": ts, "mean_ms": round(m, 3)} for ts, m in medias],
+            })
+        resultado.sort(key=lambda r: r["pendiente_ms_por_hora"], reverse=True)
+        return resultado[:limit]
+
+    def summary(self) -> Dict[str, Any]:
+        ultimo = self.store.ultimo_snapshot()
+        return {
+            "running": self._thread is not None,
+            "interval_s": self.interval_s,
+            "ultimo_snapshot": ultimo,
+            "tablas": self.store.tablas(ultimo["id"]) if ultimo else [],
+            "ultimo_deploy": self.store.ultimo_deploy(),
+            "regresiones": self.regressions(),
+        }
+
+    # --- ciclo de vida ---
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.collect()
+            except Exception:
+                logger.exception("Error tomando snapshot de estadísticas de la BD")
+
+    def start(self, version: str = APP_VERSION):
+        if self._thread is not None:
+            return
+        ultimo = self.store.ultimo_deploy()
+        if version and (ultimo is None or ultimo["version"] != version):
+            self.mark_deploy(version)
+        self._stop.clear()
+        self.collect()
+        self._thread = threading.Thread(target=self._run, name="db-stats-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
@@ -0,0 +1,207 @@
+# monitoring/event_loop.py
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (en ms) de los buckets del histograma de lag
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class BlockingCallError(RuntimeError):
+    """Se lanza en modo estricto cuando algo bloqueó el event loop."""
+
+
+# Bloqueos pendientes del request en curso (modo estricto); None fuera de un request
+_pendientes: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("loop_monitor_pendientes", default=None)
+
+
+class EventLoopMonitor:
+    """
+    Mide continuamente el lag del event loop y detecta llamadas bloqueantes.
+
+    - Una tarea asyncio duerme `interval` segundos y registra cuánto tarda de
+      más en despertar (lag) en un histograma.
+    - Un hilo watchdog revisa el último latido de esa tarea; si el loop lleva
+      más de `threshold` segundos sin latir, captura el stack del hilo del
+      loop, que es justamente el código que lo está bloqueando.
+    - En modo estricto cada bloqueo se atribuye a la tarea que ocupaba el
+      loop, y de ella al request (`request_scope`) que la creó.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1,
+                 strict: bool = False, max_events: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.strict = strict
+        self.bucket_counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.lag_sum_ms = 0.0
+        self.lag_max_ms = 0.0
+        self.blocking_events: deque = deque(maxlen=max_events)
+        self._tareas: "weakref.WeakKeyDictionary[asyncio.Task, List[Dict[str, Any]]]" = weakref.WeakKeyDictionary()
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._factory_previa = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- ciclo de vida ---
+    def start(self):
+        """Debe llamarse desde el event loop (ej. en el evento startup)."""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        if self.strict:
+            # Las tareas nuevas heredan el request del contexto en que se crean
+            self._factory_previa = loop.get_task_factory()
+            loop.set_task_factory(self._crear_tarea)
+        self._task = loop.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+        if self._loop is not None and self._loop.get_task_factory() == self._crear_tarea:
+            self._loop.set_task_factory(self._factory_previa)
+        self._loop = None
+
+    # --- medición ---
+    async def _run(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.record_lag((now - start - self.interval) * 1000)
+
+    def record_lag(self, lag_ms: float):
+        lag_ms = max(lag_ms, 0.0)
+        with self._lock:
+            self.samples += 1
+            self.lag_sum_ms += lag_ms
+            self.lag_max_ms = max(self.lag_max_ms, lag_ms)
+            for i, limit in enumerate(LAG_BUCKETS_MS):
+                if lag_ms <= limit:
+                    self.bucket_counts[i] += 1
+                    break
+            else:
+                self.bucket_counts[-1] += 1
+
+    def _watch(self):
+        reported_beat = None
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            beat = self._heartbeat
+            blocked_for = time.monotonic() - beat
+            if blocked_for < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            # Mientras el loop está bloqueado, su tarea actual es la que lo bloquea
+            tarea = asyncio.current_task(self._loop) if self._loop is not None else None
+            event = {
+                "timestamp": time.time(),
+                "blocked_ms": round(blocked_for * 1000, 1),
+                "stack": stack,
+            }
+            with self._lock:
+                self.blocking_events.append(event)
+                pendientes = self._tareas.get(tarea) if tarea is not None else None
+                if pendientes is not None:
+                    pendientes.append(event)
+            logger.warning("Event loop bloqueado %sms en:\n%s", event["blocked_ms"], stack)
+
+    # --- modo estricto (desarrollo / tests) ---
+    def _crear_tarea(self, loop, coro, **kwargs):
+        previa = self._factory_previa
+        tarea = previa(loop, coro, **kwargs) if previa is not None else asyncio.Task(coro, loop=loop, **kwargs)
+        contexto = kwargs.get("context")
+        pendientes = contexto.get(_pendientes) if contexto is not None else _pendientes.get()
+        if pendientes is not None:
+            with self._lock:
+                self._tareas[tarea] = pendientes
+        return tarea
+
+    @contextmanager
+    def request_scope(self):
+        """Agrupa los bloqueos de la tarea actual y de las que cree durante el request."""
+        pendientes: List[Dict[str, Any]] = []
+        token = _pendientes.set(pendientes)
+        tarea = asyncio.current_task()
+        with self._lock:
+            anterior = self._tareas.get(tarea) if tarea is not None else None
+            if tarea is not None:
+                self._tareas[tarea] = pendientes
+        try:
+            yield pendientes
+        finally:
+            with self._lock:
+                if tarea is not None:
+                    if anterior is None:
+                        self._tareas.pop(tarea, None)
+                    else:
+                        self._tareas[tarea] = anterior
+            _pendientes.reset(token)
+
+    def check(self):
+        """En modo estricto, falla si el request en curso bloqueó el loop desde la última revisión."""
+        pendientes = _pendientes.get()
+        if pendientes is None:
+            return
+        with self._lock:
+            pending = list(pendientes)
+            pendientes.clear()
+        if pending:
+            peor = max(pending, key=lambda e: e["blocked_ms"])
+            raise BlockingCallError(
+                f"Event loop bloqueado {peor['blocked_ms']}ms por una llamada síncrona:\n{peor['stack']}"
+            )
+
+    # --- métricas ---
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {f"le_{limit}ms": count for limit, count in zip(LAG_BUCKETS_MS, self.bucket_counts)}
+            buckets["le_inf"] = self.bucket_counts[-1]
+            return {
+                "samples": self.samples,
+                "lag_avg_ms": round(self.lag_sum_ms / self.samples, 3) if self.samples else 0,
+                "lag_max_ms": round(self.lag_max_ms, 3),
+                "lag_histogram": buckets,
+                "threshold_ms": self.threshold * 1000,
+                "blocking_events": list(self.blocking_events),
+            }
+
+
+loop_monitor = EventLoopMonitor(
+    threshold=float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100")) / 1000,
+    strict=os.getenv("LOOP_MONITOR_STRICT", "0") == "1",
+)
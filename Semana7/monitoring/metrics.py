@@ -1,5 +1,5 @@
 # app/monitoring/metrics.py
-from app.cache.cache_decorators import cache_manager
+from app.cache.redis_registry import redis_registry
 import time
 
 class CacheMetrics:
@@ -7,23 +7,28 @@ class CacheMetrics:
     def track_cache_hit():
         """Registra un hit de cache."""
         metric_key = f"metrics:cache_hits:{int(time.time() // 300)}"
-        cache_manager.redis_client.incr(metric_key)
-        cache_manager.redis_client.expire(metric_key, 3600)
+        pipe = redis_registry.client('metrics').pipeline()
+        pipe.incr(metric_key)
+        pipe.expire(metric_key, 3600)
+        pipe.execute()
 
     @staticmethod
     def track_cache_miss():
         """Registra un miss de cache."""
         metric_key = f"metrics:cache_misses:{int(time.time() // 300)}"
-        cache_manager.redis_client.incr(metric_key)
-        cache_manager.redis_client.expire(metric_key, 3600)
+        pipe = redis_registry.client('metrics').pipeline()
+        pipe.incr(metric_key)
+        pipe.expire(metric_key, 3600)
+        pipe.execute()
 
     @staticmethod
     def get_cache_stats():
         """Obtiene estadísticas de Redis."""
-        info = cache_manager.redis_client.info()
+        info = redis_registry.client('cache').info()
         return {
             'connected_clients': info.get('connected_clients', 0),
             'used_memory': info.get('used_memory_human', '0B'),
             'keyspace_hits': info.get('keyspace_hits', 0),
             'keyspace_misses': info.get('keyspace_misses', 0),
+            'pools': redis_registry.pool_stats(),
         }
\ No newline at end of file
@@ -0,0 +1,207 @@
+# monitoring/profiling.py
+import glob
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+from app.database.profiling import capture_stack, is_idle
+
+# Categorías para saber qué domina la CPU en producción (se busca desde la hoja)
+CATEGORIES = (
+    ("bcrypt", ("bcrypt", "passlib")),
+    ("pydantic", ("pydantic",)),
+    ("json", ("json", "orjson", "ujson")),
+    ("sqlalchemy", ("sqlalchemy",)),
+    ("db_driver", ("sqlite3", "psycopg", "asyncpg", "pymysql")),
+    ("redis", ("redis",)),
+    ("framework", ("starlette", "fastapi", "anyio", "uvicorn")),
+)
+OVERFLOW_STACK = "[otros]"
+
+
+def _categoria(stack) -> str:
+    for _, filename, _ in reversed(stack):
+        ruta = filename.replace("\\", "/").lower()
+        for categoria, paquetes in CATEGORIES:
+            if any(f"/{p}/" in ruta or ruta.endswith(f"/{p}.py") for p in paquetes):
+                return categoria
+    return "app"
+
+
+def _folded(stack) -> str:
+    return ";".join(f"{os.path.splitext(os.path.basename(f))[0]}:{name}" for name, f, _ in stack)
+
+
+class ProfileWindow:
+    """Stacks plegados ('a;b;c') de una ventana de tiempo, con tope de memoria."""
+
+    __slots__ = ("start", "end", "stacks", "categories", "samples", "max_stacks")
+
+    def __init__(self, start: float, max_stacks: int):
+        self.start = start
+        self.end: Optional[float] = None
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.samples = 0
+        self.max_stacks = max_stacks
+
+    def add(self, stack):
+        key = _folded(stack)
+        if key not in self.stacks and len(self.stacks) >= self.max_stacks:
+            key = OVERFLOW_STACK  # stacks nuevos una vez lleno el cupo
+        self.stacks[key] += 1
+        self.categories[_categoria(stack)] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ContinuousProfiler:
+    """
+    Profiler de muestreo continuo para los workers de producción.
+
+    - Un hilo daemon toma el stack de todos los hilos cada `interval_ms`
+      (sin señales, así funciona con cualquier servidor y en Windows).
+    - Agrega stacks plegados por ventana de `window_seconds`; conserva las
+      últimas `max_windows` en memoria y rota archivos .folded en disco.
+    - Mide su propio costo y alarga el intervalo si supera `max_overhead`
+      (fracción del tiempo de pared, ~1% por defecto).
+    """
+
+    def __init__(self, interval_ms: float = 10.0, window_seconds: float = 60.0,
+                 max_windows: int = 60, max_stacks: int = 2000, max_overhead: float = 0.01,
+                 directory: str = "", max_files: int = 48):
+        self.base_interval = interval_ms / 1000
+        self.interval = self.base_interval
+        self.window_seconds = window_seconds
+        self.max_stacks = max_stacks
+        self.max_overhead = max_overhead
+        self.directory = directory
+        self.max_files = max_files
+        self.windows: deque = deque(maxlen=max_windows)
+        self.current = ProfileWindow(time.time(), max_stacks)
+        self.sampling_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # --- ciclo de vida ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        self.current = ProfileWindow(time.time(), self.max_stacks)
+        self._thread = threading.Thread(target=self._run, name="continuous-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.rotate()
+
+    # --- muestreo ---
+    def _run(self):
+        propio = threading.get_ident()
+        ajuste = time.monotonic()
+        while not self._stop.wait(self.interval):
+            inicio = time.perf_counter()
+            self.sample_once(exclude=propio)
+            self.sampling_seconds += time.perf_counter() - inicio
+            if time.time() - self.current.start >= self.window_seconds:
+                self.rotate()
+            if time.monotonic() - ajuste >= 1.0:
+                self._ajustar_intervalo()
+                ajuste = time.monotonic()
+
+    def sample_once(self, exclude: Optional[int] = None):
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, frame in frames.items():
+                if ident == exclude:
+                    continue
+                stack = capture_stack(frame)
+                if not is_idle(stack):
+                    self.current.add(stack)
+
+    def overhead(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started_at
+        return self.sampling_seconds / elapsed if elapsed > 0 else 0.0
+
+    def _ajustar_intervalo(self):
+        costo = self.overhead()
+        if costo > self.max_overhead:
+            self.interval = min(self.interval * 1.5, 1.0)
+        elif costo < self.max_overhead / 2 and self.interval > self.base_interval:
+            self.interval = max(self.interval / 1.5, self.base_interval)
+
+    # --- ventanas y rotación ---
+    def rotate(self):
+        with self._lock:
+            cerrada, self.current = self.current, ProfileWindow(time.time(), self.max_stacks)
+            cerrada.end = time.time()
+            if cerrada.samples == 0:
+                return
+            self.windows.append(cerrada)
+        if self.directory:
+            self._escribir(cerrada)
+
+    def _escribir(self, window: ProfileWindow):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            nombre = time.strftime("profile-%Y%m%d-%H%M%S", time.localtime(window.start))
+            with open(os.path.join(self.directory, f"{nombre}-{os.getpid()}.folded"), "w", encoding="utf-8") as f:
+                f.write(window.folded())
+            archivos = sorted(glob.glob(os.path.join(self.directory, "profile-*.folded")))
+            for viejo in archivos[:-self.max_files]:
+                os.remove(viejo)
+        except OSError as e:
+            print(f"❌ No se pudo rotar el perfil continuo: {e}")
+
+    # --- lectura ---
+    def _ventanas(self, last: Optional[int]) -> List[ProfileWindow]:
+        with self._lock:
+            ventanas = list(self.windows) + [self.current]
+        return ventanas if not last else ventanas[-last:]
+
+    def folded(self, last: Optional[int] = None) -> str:
+        total: Counter = Counter()
+        for window in self._ventanas(last):
+            total.update(window.stacks)
+        return "".join(f"{stack} {count}\n" for stack, count in total.most_common())
+
+    def summary(self, last: Optional[int] = None, top: int = 15) -> Dict[str, Any]:
+        ventanas = self._ventanas(last)
+        stacks: Counter = Counter()
+        categorias: Counter = Counter()
+        for window in ventanas:
+            stacks.update(window.stacks)
+            categorias.update(window.categories)
+        total = sum(categorias.values())
+        return {
+            "running": self._thread is not None,
+            "interval_ms": round(self.interval * 1000, 2),
+            "overhead_pct": round(self.overhead() * 100, 3),
+            "windows": len(ventanas),
+            "from": ventanas[0].start if ventanas else None,
+            "samples": total,
+            "categories": {c: round(n / total * 100, 2) for c, n in categorias.most_common()} if total else {},
+            "top_stacks": [{"stack": s, "samples": n} for s, n in stacks.most_common(top)],
+        }
+
+
+continuous_profiler = ContinuousProfiler(
+    interval_ms=float(os.getenv("CONTINUOUS_PROFILER_INTERVAL_MS", "10")),
+    window_seconds=float(os.getenv("CONTINUOUS_PROFILER_WINDOW_S", "60")),
+    directory=os.getenv("CONTINUOUS_PROFILER_DIR", ""),
+)
+CONTINUOUS_PROFILER_ENABLED = os.getenv("CONTINUOUS_PROFILER", "0") == "1"
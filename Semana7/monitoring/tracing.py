@@ -0,0 +1,290 @@
+# monitoring/tracing.py
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tracing desactivado por defecto: sin TRACING=1 no se muestrea ni se escribe nada
+TRACING_ENABLED = os.getenv("TRACING", "0") == "1"
+
+# Span activo del request actual (None si el request no fue muestreado)
+_span_actual: ContextVar[Optional["Span"]] = ContextVar("span_actual", default=None)
+
+
+class Span:
+    """Un tramo de tiempo dentro de un request (middleware, dependencia, SQL, cache)."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind",
+                 "start", "end", "attributes", "status")
+
+    def __init__(self, trace_id: str, name: str, kind: str = "internal",
+                 parent_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.end = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end or time.time_ns()
+        return (end - self.start) / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Formato de línea JSON, inspirado en los campos de un span OTLP."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start,
+            "endTimeUnixNano": self.end,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class BatchSpanExporter:
+    """
+    Acumula spans terminados y los escribe por lotes, en un hilo aparte,
+    a un archivo JSON lines o a un colector local compatible con OTLP/HTTP.
+    """
+
+    def __init__(self, path: Optional[str] = None, endpoint: Optional[str] = None,
+                 batch_size: int = 256, flush_interval: float = 2.0,
+                 max_queue: int = 10000):
+        self.path = path
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def export(self, span: Span):
+        with self._lock:
+            if len(self._buffer) >= self.max_queue:
+                # Nunca bloqueamos el request por culpa del exportador
+                self.dropped += 1
+                return
+            self._buffer.append(span.to_dict())
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            if self.endpoint:
+                self._send(batch)
+            if self.path:
+                self._write(batch)
+        except Exception as e:
+            logger.warning("Error exportando spans: %s", e)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in batch:
+                f.write(json.dumps(span, default=str) + "\n")
+
+    def _send(self, batch: List[Dict[str, Any]]):
+        body = json.dumps({"spans": batch}, default=str).encode()
+        req = urllib.request.Request(
+            self.endpoint, data=body, headers={"Content-Type": "application/json"}
+        )
+        urllib.request.urlopen(req, timeout=2).close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+class Tracer:
+    """
+    Tracing ligero por request con muestreo de cabeza (head sampling):
+    la decisión se toma al inicio del request y los hijos la heredan.
+    """
+
+    def __init__(self, sample_rate: float = 0.1, exporter: Optional[BatchSpanExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    @contextmanager
+    def start_trace(self, name: str, force: bool = False, **attributes):
+        """Abre el span raíz del request; si no se muestrea, no registra nada."""
+        if self.exporter is None or not (force or self.should_sample()):
+            yield None
+            return
+        span = Span(uuid.uuid4().hex, name, kind="server")
+        span.attributes.update(attributes)
+        token = _span_actual.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            _span_actual.reset(token)
+            span.finish()
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        """Abre un span hijo del span actual (no-op si el request no está muestreado)."""
+        parent = _span_actual.get()
+        if parent is None or self.exporter is None:
+            yield None
+            return
+        span = Span(parent.trace_id, name, kind=kind, parent_id=parent.span_id)
+        span.attributes.update(attributes)
+        token = _span_actual.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            _span_actual.reset(token)
+            span.finish()
+            self.exporter.export(span)
+
+    def trace_dependency(self, func):
+        """Decorador para medir dependencias de FastAPI (sync o async)."""
+        import inspect
+
+        if inspect.isgeneratorfunction(func):
+            # Dependencias con yield (ej. get_db): solo medimos la parte previa al yield
+            @wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                gen = func(*args, **kwargs)
+                with self.span(f"dependency {func.__name__}", kind="dependency"):
+                    value = next(gen)
+                try:
+                    yield value
+                except BaseException as exc:
+                    try:
+                        gen.throw(exc)
+                    except StopIteration:
+                        return
+                    raise
+                else:
+                    next(gen, None)
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self.span(f"dependency {func.__name__}", kind="dependency"):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.span(f"dependency {func.__name__}", kind="dependency"):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def instrument_engine(self, engine):
+        """Registra listeners de SQLAlchemy para crear un span por sentencia SQL."""
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            parent = _span_actual.get()
+            if parent is None:
+                return
+            span = Span(parent.trace_id, "db.statement", kind="client", parent_id=parent.span_id)
+            span.set_attribute("db.statement", statement[:500])
+            span.set_attribute("db.system", engine.dialect.name)
+            conn.info.setdefault("trace_spans", []).append(span)
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            spans = conn.info.get("trace_spans")
+            if spans:
+                span = spans.pop()
+                span.finish()
+                if self.exporter is not None:
+                    self.exporter.export(span)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(exception_context):
+            # La sentencia falló: no habrá after_cursor_execute; sin esto el span
+            # quedaría en la conexión del pool y las siguientes sacarían el equivocado
+            conn = exception_context.connection
+            spans = conn.info.get("trace_spans") if conn is not None else None
+            if spans:
+                span = spans.pop()
+                span.status = "error"
+                span.set_attribute("error.type", type(exception_context.original_exception).__name__)
+                span.finish()
+                if self.exporter is not None:
+                    self.exporter.export(span)
+
+
+def current_span() -> Optional[Span]:
+    return _span_actual.get()
+
+
+def _build_tracer() -> Tracer:
+    if not TRACING_ENABLED:
+        # Sin exportador, start_trace/span son no-ops y los listeners SQL no crean spans
+        return Tracer(sample_rate=0.0)
+    path = os.getenv("TRACE_EXPORT_PATH", "logs/traces.jsonl")
+    endpoint = os.getenv("TRACE_OTLP_ENDPOINT")  # ej: http://localhost:4318/v1/traces
+    exporter = BatchSpanExporter(path=path or None, endpoint=endpoint or None)
+    return Tracer(sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.1")), exporter=exporter)
+
+
+tracer = _build_tracer()
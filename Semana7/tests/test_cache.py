@@ -1,6 +1,6 @@
 # tests/test_cache.py
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 from app.cache.redis_config import GenericCacheConfig
 from app.cache.cache_decorators import cache_result
 
@@ -51,4 +51,83 @@ def test_cache_invalidation(mock_redis_client):
     cache_manager.invalidate_cache(pattern)
     
     mock_redis_client.keys.assert_called_with(pattern)
-    mock_redis_client.delete.assert_called_with("test:data:1", "test:data:2")
\ No newline at end of file
+    mock_redis_client.delete.assert_called_with("test:data:1", "test:data:2")
+
+def test_registry_comparte_pools_por_proposito():
+    """Los clientes de un mismo propósito reutilizan el mismo pool y su base lógica."""
+    from app.cache.redis_registry import RedisRegistry
+    from app.config import Settings
+
+    registry = RedisRegistry(Settings())
+    cache_a = registry.client('cache')
+    cache_b = registry.client('cache')
+    limiter = registry.client('rate_limit')
+
+    assert cache_a.connection_pool is cache_b.connection_pool
+    assert limiter.connection_pool is not cache_a.connection_pool
+    kwargs = limiter.connection_pool.connection_kwargs
+    assert kwargs['db'] == 1
+    assert isinstance(kwargs['port'], int)
+    assert kwargs['socket_timeout'] == registry.settings.redis_socket_timeout
+    assert registry.pool_stats()['cache']['sync']['created'] == 0
+
+    with pytest.raises(ValueError):
+        registry.client('desconocido')
+
+
+def test_pool_async_de_otro_loop_se_desconecta_al_reemplazarlo():
+    import asyncio
+    from app.cache.redis_registry import RedisRegistry
+    from app.config import Settings
+
+    registry = RedisRegistry(Settings())
+    viejo = asyncio.run(registry.async_pool('rate_limit'))
+    with patch.object(viejo, 'disconnect', new=AsyncMock()) as disconnect:
+        nuevo = asyncio.run(registry.async_pool('rate_limit'))
+    assert nuevo is not viejo
+    disconnect.assert_awaited_once()
+    assert registry.pool_stats()['rate_limit']['async']['created'] == 0
+
+
+def test_rate_limiter_usa_cliente_asincrono():
+    """El rate limiter responde 429 al superar el límite sin usar Redis síncrono."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.middleware.rate_limiter import RateLimitingMiddleware
+
+    contador = {"n": 0}
+
+    class FakePipeline:
+        def __init__(self):
+            self.ops = []
+
+        def __getattr__(self, name):
+            def op(*args, **kwargs):
+                self.ops.append(name)
+            return op
+
+        async def execute(self):
+            if "zadd" in self.ops:
+                contador["n"] += 1
+                return [1, True]
+            return [0, contador["n"]]
+
+    fake_client = MagicMock()
+    fake_client.pipeline.side_effect = lambda **kwargs: FakePipeline()
+
+    app = FastAPI()
+    app.add_middleware(RateLimitingMiddleware, requests_limit=2, window_size=60)
+
+    @app.get("/")
+    async def root():
+        return {"ok": True}
+
+    with patch('app.middleware.rate_limiter.redis_registry.async_client', new=AsyncMock(return_value=fake_client)), \
+            patch('redis.Redis') as sync_redis:
+        client = TestClient(app)
+        assert client.get("/").status_code == 200
+        assert client.get("/").status_code == 200
+        response = client.get("/")
+        assert response.status_code == 429
+        assert "Demasiadas peticiones" in response.text
+        sync_redis.assert_not_called()
@@ -0,0 +1,429 @@
+# tests/test_database_optimization.py
+from sqlalchemy import create_engine, text
+from app.database.index_advisor import IndexAdvisor, WorkloadCollector, normalize_sql
+
+
+def _engine_salon():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE salon_cita (id INTEGER PRIMARY KEY, cliente_id INTEGER, estilista_id INTEGER, "
+            "servicio_id INTEGER, fecha_cita TEXT, hora_inicio TEXT, hora_fin TEXT, estado TEXT)"
+        ))
+        conn.execute(text(
+            "INSERT INTO salon_cita (cliente_id, estilista_id, servicio_id, fecha_cita, hora_inicio, hora_fin, estado) "
+            "VALUES (:c, :e, 1, '2025-10-20', :h, :h, 'confirmada')"
+        ), [{"c": i, "e": i % 5, "h": f"{8 + i % 10:02d}:00"} for i in range(200)])
+    return engine
+
+
+def test_normalize_sql_agrupa_literales():
+    assert normalize_sql("SELECT * FROM t WHERE id = 5 AND x = 'a'") == \
+        normalize_sql("SELECT *  FROM t\nWHERE id = 7 AND x = 'b'")
+
+
+def test_advisor_propone_indice_para_full_scan_y_filesort():
+    engine = _engine_salon()
+    collector = WorkloadCollector()
+    collector.attach(engine)
+    advisor = IndexAdvisor(engine, collector)
+
+    agenda = text(
+        "SELECT c.id, c.hora_inicio FROM salon_cita c "
+        "WHERE c.estilista_id = :estilista_id AND c.fecha_cita = :fecha ORDER BY c.hora_inicio"
+    )
+    with engine.connect() as conn:
+        for estilista in range(5):
+            conn.execute(agenda, {"estilista_id": estilista, "fecha": "2025-10-20"})
+
+    candidates = advisor.recommend()
+    assert len(collector.statements) == 1
+    assert candidates[0].table == "salon_cita"
+    assert candidates[0].columns == ("estilista_id", "fecha_cita", "hora_inicio")
+    assert set(candidates[0].reasons) == {"full scan", "filesort"}
+
+    migration = advisor.emit_migration(candidates)
+    assert "CREATE INDEX IF NOT EXISTS idx_salon_cita_estilista_id_fecha_cita_hora_inicio" in migration
+
+    # Una vez creado el índice, el advisor ya no lo propone
+    with engine.begin() as conn:
+        conn.execute(text(candidates[0].create_sql("sqlite")))
+    assert advisor.recommend() == []
+
+
+def test_collector_descarta_el_inicio_de_sentencias_fallidas_y_es_seguro_entre_hilos():
+    import threading
+    import pytest
+    from sqlalchemy.exc import OperationalError
+
+    engine = _engine_salon()
+    collector = WorkloadCollector()
+    collector.attach(engine)
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_existe"))
+        # Sin handle_error quedaría un inicio huérfano y esta sentencia mediría desde el fallo
+        assert conn.info["advisor_start"] == []
+        conn.execute(text("SELECT id FROM salon_cita WHERE id = 1"))
+        assert conn.info["advisor_start"] == []
+
+    def registrar(n):
+        for i in range(500):
+            collector.record(f"SELECT * FROM t{n} WHERE id = {i}", duration_ms=1.0)
+
+    hilos = [threading.Thread(target=registrar, args=(n,)) for n in range(4)]
+    for h in hilos:
+        h.start()
+    with collector.pausado():
+        collector.record("SELECT * FROM ignorada")
+    for h in hilos:
+        h.join()
+    llamadas = {st.sql.split()[3]: st.calls for st in collector.snapshot()}
+    assert all(llamadas[f"t{n}"] == 500 for n in range(4))
+    assert "ignorada" not in llamadas and not collector.paused
+
+
+def test_index_builder_es_idempotente_y_paralelo_por_tabla(tmp_path):
+    from app.database.index_builder import IndexBuildRunner
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'salon.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE salon_cita (id INTEGER PRIMARY KEY, fecha_cita TEXT, estado TEXT, cliente_id INTEGER)"))
+        conn.execute(text("CREATE TABLE salon_horario (id INTEGER PRIMARY KEY, estilista_id INTEGER, dia_semana INTEGER)"))
+
+    indexes = [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_cita_fecha_estado ON salon_cita(fecha_cita, estado);",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_cita_cliente ON salon_cita(cliente_id, fecha_cita DESC);",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_horario_estilista ON salon_horario(estilista_id, dia_semana);",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tabla_inexistente ON no_existe(x);",
+    ]
+    progreso = []
+    runner = IndexBuildRunner(engine, max_parallel=2, on_progress=lambda d, t, r: progreso.append((d, t)))
+
+    primera = {r.name: r.status for r in runner.run(indexes)}
+    assert primera == {
+        "idx_salon_cita_fecha_estado": "created",
+        "idx_salon_cita_cliente": "created",
+        "idx_salon_horario_estilista": "created",
+        "idx_tabla_inexistente": "failed",
+    }
+    assert sorted(progreso) == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+    segunda = {r.name: r.status for r in runner.run(indexes[:3])}
+    assert set(segunda.values()) == {"exists"}
+
+
+def test_query_registry_tipa_parametros_y_devuelve_registros():
+    import datetime
+    import pytest
+    from sqlalchemy.orm import Session
+    from app.database import Base
+    from app.database.query_registry import QueryDAO
+    from app.models.salon import SalonCita, SalonHorario
+    from monitoring.benchmark_queries import FECHA, agenda_orm, seed
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, citas=300)
+        dao = QueryDAO(session)
+        # Fecha en ISO: se convierte al tipo declarado
+        agenda = dao.all("citas_por_estilista", estilista_id=2, fecha=FECHA.isoformat())
+        assert [tuple(r) for r in agenda] == agenda_orm(session, 2)
+        assert isinstance(agenda[0].hora_inicio, datetime.time)
+        assert agenda[0]._fields[:2] == ("id", "fecha_cita")
+
+        with pytest.raises(TypeError):
+            dao.all("citas_por_estilista", estilista_id="dos", fecha=FECHA)
+        with pytest.raises(TypeError):
+            dao.all("historial_cliente", cliente_id=1)
+        with pytest.raises(TypeError):
+            dao.all("citas_por_estilista", estilista_id=True, fecha=FECHA)
+
+        # Solapamiento portable (sin OVERLAPS): también corre en SQLite
+        session.add_all([SalonHorario(estilista_id=e, dia_semana=FECHA.weekday(), hora_inicio=datetime.time(8),
+                                      hora_fin=datetime.time(20)) for e in (1, 2, 3)])
+        session.commit()
+        ini, fin = datetime.time(10), datetime.time(11)
+        ocupados = {c.estilista_id for c in session.query(SalonCita).filter_by(fecha_cita=FECHA)
+                    if c.estado in ("confirmada", "pendiente") and c.hora_inicio < fin and c.hora_fin > ini}
+        libres = dao.all("estilistas_disponibles", dia_semana=FECHA.weekday(), fecha=FECHA,
+                         hora_inicio="10:00", hora_fin="11:00")
+        assert [r.id for r in libres] == sorted({1, 2, 3} - ocupados)
+
+
+def test_benchmark_registry_vs_orm():
+    from monitoring.benchmark_queries import run_benchmark
+
+    resultados = run_benchmark(iterations=20, citas=200)
+    assert set(resultados) == {"orm_ad_hoc", "query_registry", "speedup"}
+    assert resultados["query_registry"]["avg_ms"] > 0
+
+
+def test_disponibilidad_en_memoria_se_actualiza_con_los_commits():
+    import datetime
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+    from app.models.salon import SalonCita, SalonCliente, SalonEstilista, SalonHorario, SalonServicio
+    from app.services.availability_service import AvailabilityService
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    lunes, t = datetime.date(2025, 10, 20), datetime.time
+    with factory() as session:
+        session.add_all([SalonEstilista(id=1, nombre="Ana"), SalonEstilista(id=2, nombre="Beto"),
+                         SalonCliente(id=1, nombre="Laura"), SalonServicio(id=1, nombre="Corte")])
+        session.add_all([SalonHorario(estilista_id=e, dia_semana=0, hora_inicio=t(9), hora_fin=t(18))
+                         for e in (1, 2)])
+        session.add(SalonCita(id=1, cliente_id=1, estilista_id=1, servicio_id=1, fecha_cita=lunes,
+                              hora_inicio=t(10), hora_fin=t(11), estado="confirmada"))
+        session.commit()
+
+    service = AvailabilityService(factory)
+    service.attach()
+    libres = lambda ini, fin: [r["nombre"] for r in service.estilistas_disponibles(lunes, t(*ini), t(*fin))]
+
+    assert libres((10, 30), (11, 0)) == ["Beto"]
+    assert libres((11, 0), (12, 0)) == ["Ana", "Beto"]
+    assert libres((18, 0), (19, 0)) == []  # fuera de horario
+    assert service.huecos_libres(lunes, 60)[1] == [(t(9), t(10)), (t(11), t(18))]
+
+    with factory() as session:
+        nueva = SalonCita(id=2, cliente_id=1, estilista_id=2, servicio_id=1, fecha_cita=lunes,
+                          hora_inicio=t(10, 45), hora_fin=t(11, 30), estado="pendiente")
+        session.add(nueva)
+        session.commit()
+        assert libres((10, 30), (11, 0)) == []
+
+        session.get(SalonCita, 1).estado = "cancelada"
+        session.commit()
+        assert libres((10, 30), (11, 0)) == ["Ana"]
+
+        session.get(SalonCita, 2).hora_inicio = t(15)
+        session.get(SalonCita, 2).hora_fin = t(16)
+        session.rollback()  # no se aplica
+        assert not service.esta_libre(2, lunes, t(11), t(11, 15))
+
+        session.delete(session.get(SalonCita, 2))
+        session.commit()
+    assert service.esta_libre(2, lunes, t(11), t(11, 15))
+    assert service.stats()["citas_en_memoria"] == 0
+
+
+def test_disponibilidad_en_memoria_coincide_con_sql_y_descarta_dias():
+    import datetime
+    from sqlalchemy import event
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+    from app.database.query_registry import QueryDAO
+    from app.models.salon import SalonCita, SalonCliente, SalonEstilista, SalonHorario, SalonServicio
+    from app.services.availability_service import AvailabilityService
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    hoy, t = datetime.date.today(), datetime.time
+    lunes = hoy + datetime.timedelta(days=7 - hoy.weekday())
+    with factory() as session:
+        session.add_all([SalonEstilista(id=1, nombre="Ana"), SalonEstilista(id=2, nombre="Beto"),
+                         SalonCliente(id=1, nombre="Laura"), SalonServicio(id=1, nombre="Corte"),
+                         SalonHorario(estilista_id=1, dia_semana=0, hora_inicio=t(9), hora_fin=t(13)),
+                         SalonHorario(estilista_id=2, dia_semana=0, hora_inicio=t(12), hora_fin=t(18)),
+                         SalonCita(id=1, cliente_id=1, estilista_id=1, servicio_id=1, fecha_cita=lunes,
+                                   hora_inicio=t(10), hora_fin=t(11), estado="confirmada")])
+        session.commit()
+
+    service = AvailabilityService(factory, max_dias=2)
+    # Mismo criterio en memoria y en SQL: el hueco cabe en el horario y no se solapa
+    with factory() as session:
+        dao = QueryDAO(session)
+        for ini, fin in [(9, 10), (10, 11), (12, 13), (12, 14), (8, 9), (17, 18)]:
+            sql = [r.nombre for r in dao.all("estilistas_disponibles", dia_semana=0, fecha=lunes,
+                                                hora_inicio=t(ini), hora_fin=t(fin))]
+            memoria = [r["nombre"] for r in service.estilistas_disponibles(lunes, t(ini), t(fin))]
+            assert memoria == sql, (ini, fin)
+
+    # Un commit que llega mientras el día se carga (fuera del lock) se reaplica al terminar
+    otro_lunes = lunes + datetime.timedelta(days=7)
+    with factory() as session:
+        session.add(SalonCita(id=2, cliente_id=1, estilista_id=1, servicio_id=1, fecha_cita=otro_lunes,
+                              hora_inicio=t(10), hora_fin=t(11), estado="confirmada"))
+        session.commit()
+
+    pendiente = [(2, 1, otro_lunes, t(10), t(11), "cancelada")]
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _cancelar_durante_la_carga(conn, cursor, statement, parameters, context, executemany):
+        if "FROM salon_cita" in statement and pendiente:
+            service.aplicar_cita(*pendiente.pop())
+
+    assert service.esta_libre(1, otro_lunes, t(10), t(11))
+    assert not pendiente
+
+    # Como máximo max_dias días en memoria, y los días pasados se descartan
+    service.esta_libre(1, lunes + datetime.timedelta(days=14), t(10), t(11))
+    assert service.stats()["dias_cargados"] == 2
+    service.esta_libre(1, hoy - datetime.timedelta(days=1), t(10), t(11))
+    service.esta_libre(1, lunes, t(10), t(11))
+    assert service.stats()["dias_cargados"] == 2
+    assert hoy - datetime.timedelta(days=1) not in service._dias_cargados
+    assert not service.esta_libre(1, lunes, t(10), t(11))
+
+
+def _demanda_diaria_se_mantiene(monkeypatch=None):
+    import datetime
+    from sqlalchemy.orm import Session, sessionmaker
+    from app.database import Base
+    from app.database.query_registry import QueryDAO
+    from app.models.salon import SalonCita, SalonDemandaDiaria
+    from app.services import demand_service
+    from app.services.demand_service import backfill_demanda
+    from monitoring.benchmark_queries import FECHA, seed
+
+    if monkeypatch is not None:
+        # Dialecto sin INSERT ... ON CONFLICT: UPDATE y luego INSERT
+        monkeypatch.setattr(demand_service, "_upsert", lambda dialect: None)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    demand_service.attach(factory)
+    demand_service.attach(factory)  # idempotente: no duplica los deltas
+    rango = {"fecha_inicio": FECHA, "fecha_fin": FECHA + datetime.timedelta(days=30)}
+    with factory() as session:
+        seed(session, citas=600)
+        esperado = session.execute(text(
+            "SELECT s.nombre, COUNT(*) AS total FROM salon_cita c JOIN salon_servicio s ON c.servicio_id = s.id "
+            "WHERE c.estado = 'confirmada' GROUP BY s.nombre ORDER BY total DESC, s.nombre"
+        )).all()
+        dao = QueryDAO(session)
+        reporte = lambda: sorted(((r.nombre, r.total) for r in dao.all("servicios_mas_demandados", **rango)),
+                                 key=lambda r: (-r[1], r[0]))
+        assert reporte() == [tuple(r) for r in esperado]
+
+        # pendiente -> confirmada, confirmada -> cancelada, cambio de servicio y borrado
+        pendiente = session.query(SalonCita).filter_by(estado="pendiente").first()
+        confirmadas = session.query(SalonCita).filter_by(estado="confirmada").limit(3).all()
+        pendiente.estado = "confirmada"
+        confirmadas[0].estado = "cancelada"
+        confirmadas[1].servicio_id = 1 + confirmadas[1].servicio_id % 10
+        session.delete(confirmadas[2])
+        session.commit()
+
+        incremental = {(d.fecha, d.servicio_id): d.total for d in session.query(SalonDemandaDiaria)}
+        backfill_demanda(session)
+        reconstruido = {(d.fecha, d.servicio_id): d.total for d in session.query(SalonDemandaDiaria)}
+        assert {k: v for k, v in incremental.items() if v} == reconstruido
+
+        # Un rollback no deja deltas aplicados
+        session.query(SalonCita).filter_by(estado="pendiente").first().estado = "confirmada"
+        session.flush()
+        session.rollback()
+        assert {(d.fecha, d.servicio_id): d.total for d in session.query(SalonDemandaDiaria)} == reconstruido
+
+    # Las sesiones que no vienen de `factory` no tocan el agregado
+    with Session(engine) as otra:
+        otra.query(SalonCita).filter_by(estado="pendiente").first().estado = "confirmada"
+        otra.commit()
+        assert {(d.fecha, d.servicio_id): d.total for d in otra.query(SalonDemandaDiaria)} == reconstruido
+
+
+
+def test_asegurar_demanda_rellena_solo_la_primera_vez():
+    from app.database import Base
+    from app.models.salon import SalonDemandaDiaria
+    from app.services.demand_service import asegurar_demanda
+    from monitoring.benchmark_queries import seed
+    from sqlalchemy.orm import Session
+
+    engine = create_engine("sqlite://")
+    assert asegurar_demanda(Session(engine)) == 0  # sin salon_cita no hay nada que rellenar
+    Base.metadata.create_all(engine)
+    SalonDemandaDiaria.__table__.drop(engine)
+    with Session(engine) as session:
+        seed(session, citas=200)
+        assert asegurar_demanda(session) > 0
+        filas = {(d.fecha, d.servicio_id): d.total for d in session.query(SalonDemandaDiaria)}
+        session.query(SalonDemandaDiaria).limit(1).one().total += 1000
+        session.commit()
+        # Con datos no se reconstruye (el ajuste manual sobrevive)
+        assert asegurar_demanda(session) == 0
+        assert sum(d.total for d in session.query(SalonDemandaDiaria)) == sum(filas.values()) + 1000
+
+def test_demanda_diaria_se_mantiene_con_los_cambios_de_estado():
+    _demanda_diaria_se_mantiene()
+
+
+def test_demanda_diaria_sin_upsert_nativo(monkeypatch):
+    _demanda_diaria_se_mantiene(monkeypatch)
+
+
+def test_paginacion_keyset_recorre_historial_sin_repetir():
+    import pytest
+    from sqlalchemy.orm import Session
+    from app.database import Base
+    from app.database.query_registry import CursorInvalido, QueryDAO
+    from app.models.salon import SalonCita
+    from monitoring.benchmark_queries import seed
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, citas=2000)
+        dao = QueryDAO(session)
+        esperado = [c.id for c in session.query(SalonCita).filter_by(cliente_id=7)
+                    .order_by(SalonCita.fecha_cita.desc(), SalonCita.hora_inicio.desc(), SalonCita.id.desc())]
+
+        vistos, cursor = [], None
+        while True:
+            filas, cursor = dao.page("historial_cliente", cursor, 3, cliente_id=7)
+            vistos += [f.id for f in filas]
+            if cursor is None:
+                break
+        assert vistos == esperado
+
+        with pytest.raises(CursorInvalido):
+            dao.page("historial_cliente", "basura", 3, cliente_id=7)
+        # El cursor se valida con los tipos de la consulta keyset (fecha, hora, id)
+        from comun.pagination import encode_cursor
+        for valores in (["no-es-fecha", "10:00:00", 1], ["2024-01-01", "10:00:00", "1"], [None, None, None]):
+            with pytest.raises(CursorInvalido):
+                dao.page("historial_cliente", encode_cursor(valores), 3, cliente_id=7)
+        # Solo las consultas del registro se marcan para prepararse en el servidor
+        assert dao.registry.get("historial_cliente").statement.get_execution_options()["preparar"] is True
+
+
+def test_instrumentacion_agrupa_fingerprints_y_detecta_n_plus_one():
+    import pytest
+    from sqlalchemy.orm import Session
+    from app.database import Base
+    from app.database.query_instrumentation import NPlusOneError, QueryInstrumentation, fingerprint
+    from app.models.salon import SalonCita
+    from monitoring.benchmark_queries import seed
+
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?)") == fingerprint("SELECT * FROM t WHERE id IN (?)")
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, citas=50)
+
+    instrumentation = QueryInstrumentation(threshold=5)
+    instrumentation.attach(engine)
+    with Session(engine) as session:
+        with instrumentation.request_scope("GET /agenda") as req:
+            citas = session.query(SalonCita).limit(10).all()
+            nombres = [c.cliente.nombre for c in citas]  # relación lazy: una consulta por cita
+    assert len(nombres) == 10
+    assert req.statements == 11
+    snapshot = instrumentation.snapshot()
+    assert snapshot["n_plus_one_events"][0]["repeticiones"] == 10
+    assert snapshot["top"][0]["p95_ms"] >= snapshot["top"][0]["p50_ms"]
+
+    instrumentation.strict = True
+    with Session(engine) as session, pytest.raises(NPlusOneError):
+        with instrumentation.request_scope("GET /agenda"):
+            for cita in session.query(SalonCita).limit(6):
+                cita.servicio.nombre
@@ -0,0 +1,526 @@
+# tests/test_optimization.py
+import json
+import time
+import threading
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from monitoring.tracing import BatchSpanExporter, Tracer
+from app.middleware.middleware_monitoring import TracingMiddleware, BlockingCallGuardMiddleware
+from monitoring.event_loop import BlockingCallError, EventLoopMonitor
+
+
+def _leer_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spans_anidados_se_exportan_en_jsonl(tmp_path):
+    """Los spans hijos comparten trace_id y apuntan al span padre."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=1.0, exporter=BatchSpanExporter(path=str(path)))
+
+    with tracer.start_trace("GET /salon/citas") as root:
+        with tracer.span("cache.get"):
+            pass
+    tracer.exporter.flush()
+
+    spans = _leer_spans(path)
+    assert len(spans) == 2
+    hijo = next(s for s in spans if s["name"] == "cache.get")
+    assert hijo["traceId"] == root.trace_id
+    assert hijo["parentSpanId"] == root.span_id
+
+
+def test_request_no_muestreado_no_registra_spans(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=0.0, exporter=BatchSpanExporter(path=str(path)))
+
+    with tracer.start_trace("GET /") as root:
+        with tracer.span("cache.get") as hijo:
+            assert root is None and hijo is None
+    tracer.exporter.flush()
+
+    assert not path.exists()
+
+
+def test_tracing_de_dependencias_y_sql(tmp_path):
+    """Un request forzado con X-Trace (y el token) genera spans de dependencia y de SQL."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=0.0, exporter=BatchSpanExporter(path=str(path)))
+    engine = create_engine("sqlite://")
+    tracer.instrument_engine(engine)
+
+    @tracer.trace_dependency
+    def get_conn():
+        with engine.connect() as conn:
+            yield conn
+
+    from app.database.profiling import RequestProfiler
+
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, tracer=tracer, profiler=RequestProfiler(token="secreto"))
+
+    @app.get("/ping")
+    def ping(conn=Depends(get_conn)):
+        return {"valor": conn.execute(text("SELECT 1")).scalar()}
+
+    client = TestClient(app)
+    # Sin el token de perfilado el header no fuerza el muestreo
+    for valor in ("1", "otro"):
+        assert "X-Trace-Id" not in client.get("/ping", headers={"X-Trace": valor}).headers
+    response = client.get("/ping", headers={"X-Trace": "secreto"})
+    assert response.json() == {"valor": 1}
+    tracer.exporter.flush()
+
+    spans = _leer_spans(path)
+    nombres = {s["name"] for s in spans}
+    assert {"GET /ping", "dependency get_conn", "db.statement"} <= nombres
+    assert len({s["traceId"] for s in spans}) == 1
+    assert response.headers["X-Trace-Id"] == spans[0]["traceId"]
+
+
+def test_tracing_desactivado_por_defecto(monkeypatch, tmp_path):
+    """Sin TRACING=1 el tracer global no tiene exportador: no muestrea ni escribe spans."""
+    from monitoring import tracing
+
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    monkeypatch.setenv("TRACE_EXPORT_PATH", str(tmp_path / "traces.jsonl"))
+    tracer = tracing._build_tracer()
+    assert tracer.exporter is None
+    with tracer.start_trace("GET /", force=True) as root:
+        assert root is None
+    assert not (tmp_path / "traces.jsonl").exists()
+
+
+def test_sentencia_fallida_cierra_su_span_con_error(tmp_path):
+    """Un error de SQL no deja el span pegado a la conexión del pool."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=1.0, exporter=BatchSpanExporter(path=str(path)))
+    engine = create_engine("sqlite://")
+    tracer.instrument_engine(engine)
+
+    with tracer.start_trace("GET /falla"), engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute(text("SELECT * FROM no_existe"))
+        assert not conn.info.get("trace_spans")
+        conn.execute(text("SELECT 1"))
+    tracer.exporter.flush()
+
+    sql = [s for s in _leer_spans(path) if s["name"] == "db.statement"]
+    assert [s["status"] for s in sql] == ["error", "ok"]
+
+
+def test_histograma_de_lag():
+    monitor = EventLoopMonitor()
+    for lag in (0.5, 3, 30, 8000):
+        monitor.record_lag(lag)
+
+    snapshot = monitor.snapshot()
+    assert snapshot["samples"] == 4
+    assert snapshot["lag_histogram"]["le_1ms"] == 1
+    assert snapshot["lag_histogram"]["le_5ms"] == 1
+    assert snapshot["lag_histogram"]["le_50ms"] == 1
+    assert snapshot["lag_histogram"]["le_inf"] == 1
+    assert snapshot["lag_max_ms"] == 8000
+
+
+def test_modo_estricto_falla_con_llamadas_bloqueantes():
+    """Un time.sleep dentro de un endpoint async debe hacer fallar el test."""
+    monitor = EventLoopMonitor(interval=0.01, threshold=0.05, strict=True)
+    app = FastAPI()
+    app.add_middleware(BlockingCallGuardMiddleware, monitor=monitor)
+
+    @app.on_event("startup")
+    async def startup():
+        monitor.start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await monitor.stop()
+
+    @app.get("/bloqueante")
+    async def bloqueante():
+        time.sleep(0.3)
+        return {"ok": True}
+
+    @app.get("/correcto")
+    async def correcto():
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        assert client.get("/correcto").status_code == 200
+        with pytest.raises(BlockingCallError, match="bloqueante"):
+            client.get("/bloqueante")
+
+    assert monitor.snapshot()["blocking_events"]
+
+
+def test_modo_estricto_atribuye_el_bloqueo_a_su_request():
+    """Un bloqueo ajeno no hace fallar a un request concurrente; el que bloquea sí falla."""
+    import asyncio
+    import httpx
+
+    monitor = EventLoopMonitor(interval=0.01, threshold=0.05, strict=True)
+    app = FastAPI()
+    app.add_middleware(BlockingCallGuardMiddleware, monitor=monitor)
+
+    @app.get("/lenta")
+    async def lenta():
+        await asyncio.sleep(0.5)
+        return {"ok": True}
+
+    @app.get("/bloqueante")
+    async def bloqueante():
+        time.sleep(0.3)
+        return {"ok": True}
+
+    async def main():
+        monitor.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.get("/docs")  # calienta imports y caches fuera de la medición
+                en_curso = asyncio.create_task(client.get("/lenta"))
+                await asyncio.sleep(0.05)
+                time.sleep(0.3)  # bloqueo fuera de cualquier request
+                assert (await en_curso).status_code == 200
+                with pytest.raises(BlockingCallError, match="bloqueante"):
+                    await client.get("/bloqueante")
+        finally:
+            await monitor.stop()
+
+    asyncio.run(main())
+    eventos = monitor.snapshot()["blocking_events"]
+    assert any("in bloqueante" in e["stack"] for e in eventos) and any("in main" in e["stack"] for e in eventos)
+
+
+def _app_con_deadline(**kwargs):
+    from app.middleware.deadline import DeadlineMiddleware
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware, **kwargs)
+    return app
+
+
+def test_deadline_excedido_responde_504():
+    import asyncio
+    app = _app_con_deadline(default_timeout=0.1, route_deadlines={})
+
+    @app.get("/lento")
+    async def lento():
+        await asyncio.sleep(1)
+        return {"ok": True}
+
+    response = TestClient(app).get("/lento")
+    assert response.status_code == 504
+
+
+def test_header_acota_el_presupuesto_visible_en_dependencias():
+    from app.middleware.deadline import get_deadline
+    app = _app_con_deadline(default_timeout=5, route_deadlines={"/api": 2})
+
+    @app.get("/api/budget")
+    async def budget(deadline=Depends(get_deadline)):
+        return {"restante": deadline.remaining()}
+
+    client = TestClient(app)
+    assert 1.5 < client.get("/api/budget").json()["restante"] <= 2
+    restante = client.get("/api/budget", headers={"X-Request-Timeout": "0.5"}).json()["restante"]
+    assert 0 < restante <= 0.5
+
+
+def test_header_de_timeout_invalido_se_ignora():
+    from app.middleware.deadline import get_deadline
+    app = _app_con_deadline(default_timeout=5, route_deadlines={"/api": 2})
+
+    @app.get("/api/budget")
+    async def budget(deadline=Depends(get_deadline)):
+        return {"restante": deadline.remaining()}
+
+    client = TestClient(app)
+    for valor in ("nan", "inf", "-1", "0", "abc", "1e9"):
+        restante = client.get("/api/budget", headers={"X-Request-Timeout": valor}).json()["restante"]
+        assert 1.5 < restante <= 2, valor
+
+
+def test_body_llega_a_la_app_en_streaming():
+    import anyio
+    from starlette.requests import Request
+    app = _app_con_deadline(default_timeout=5, route_deadlines={})
+    leidos = []
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        # Cuántos mensajes había leído el middleware al recibir cada chunk
+        recibidos = [len(leidos) async for _ in request.stream()]
+        return {"recibidos": recibidos}
+
+    async def main():
+        enviados = []
+        chunks = [{"type": "http.request", "body": b"x" * 10, "more_body": i < 4} for i in range(5)]
+
+        async def receive():
+            if chunks:
+                leidos.append(1)
+                return chunks.pop(0)
+            await anyio.sleep(10)
+
+        async def send(message):
+            enviados.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/upload", "raw_path": b"/upload",
+                 "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+                 "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+        with anyio.fail_after(2):
+            await app(scope, receive, send)
+        return enviados
+
+    enviados = anyio.run(main)
+    cuerpo = json.loads(b"".join(m.get("body", b"") for m in enviados if m["type"] == "http.response.body"))
+    # El primer chunk llega a la app antes de que se haya leído todo el body
+    assert cuerpo["recibidos"][0] < 5
+
+
+def test_rollback_olvida_el_statement_timeout_cacheado():
+    from app.database import apply_deadline_timeouts
+    engine = create_engine("sqlite://")
+    apply_deadline_timeouts(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.info["statement_timeout_ms"] = 500
+        conn.rollback()
+        assert "statement_timeout_ms" not in conn.info
+        conn.info["statement_timeout_ms"] = 500
+    with engine.connect() as conn:
+        assert "statement_timeout_ms" not in conn.info
+
+
+def test_desconexion_del_cliente_cancela_el_trabajo():
+    import anyio
+    from app.middleware.deadline import current_deadline
+    estado = {}
+    app = _app_con_deadline(default_timeout=5, route_deadlines={})
+
+    @app.get("/reporte")
+    async def reporte():
+        estado["deadline"] = current_deadline()
+        await anyio.sleep(2)
+        estado["terminado"] = True
+        return {"ok": True}
+
+    async def main():
+        enviados = []
+        mensajes = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if mensajes:
+                return mensajes.pop(0)
+            await anyio.sleep(0.1)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            enviados.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/reporte", "raw_path": b"/reporte",
+                 "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+                 "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+        with anyio.fail_after(1):
+            await app(scope, receive, send)
+        return enviados
+
+    enviados = anyio.run(main)
+    assert "terminado" not in estado
+    assert estado["deadline"].remaining() == 0
+    assert enviados == []
+
+
+def test_sqlite_aborta_consultas_al_agotar_el_deadline():
+    from app.database import apply_deadline_timeouts
+    from app.middleware.deadline import Deadline, DeadlineExceeded, _deadline_actual
+    from sqlalchemy.exc import OperationalError
+
+    engine = create_engine("sqlite://")
+    apply_deadline_timeouts(engine)
+    consulta_pesada = text(
+        "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 50000000) "
+        "SELECT count(*) FROM n"
+    )
+
+    token = _deadline_actual.set(Deadline(0.05))
+    try:
+        inicio = time.perf_counter()
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError, match="interrupted"):
+                conn.execute(consulta_pesada)
+            assert time.perf_counter() - inicio < 2
+            with pytest.raises(DeadlineExceeded):
+                conn.execute(text("SELECT 1"))
+    finally:
+        _deadline_actual.reset(token)
+
+
+def test_perfil_bajo_demanda_con_token_y_sql(tmp_path):
+    """Solo se perfila con el token correcto; el perfil incluye stacks y el SQL del request."""
+    from app.database.profiling import RequestProfiler
+    from app.middleware.middleware_monitoring import ProfilingMiddleware
+
+    engine = create_engine("sqlite://")
+    profiler = RequestProfiler(token="secreto", sample_rate=0.0, interval_ms=1, directory=str(tmp_path))
+    profiler.attach(engine)
+
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+    @app.get("/lento")
+    def lento():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        fin = time.perf_counter() + 0.05
+        while time.perf_counter() < fin:
+            sum(range(1000))
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert "X-Profile-Id" not in client.get("/lento").headers
+    assert "X-Profile-Id" not in client.get("/lento", headers={"X-Profile": "otro"}).headers
+    assert "X-Profile-Id" not in client.get("/lento", params={"__profile": "señal"}).headers
+
+    # Un hilo ajeno al request ocupado en paralelo no entra en el perfil
+    parar = threading.Event()
+
+    def otra_tarea():
+        while not parar.is_set():
+            sum(range(1000))
+
+    ajeno = threading.Thread(target=otra_tarea, daemon=True)
+    ajeno.start()
+    try:
+        profile_id = client.get("/lento", params={"__profile": "secreto"}).headers["X-Profile-Id"]
+    finally:
+        parar.set()
+        ajeno.join()
+    perfil = profiler.get(profile_id)
+    speedscope = perfil.speedscope()
+    assert speedscope["profiles"][0]["samples"]
+    assert speedscope["sql"][0]["sql"] == "SELECT 1"
+    assert "lento" in perfil.collapsed()
+    assert "otra_tarea" not in perfil.collapsed()
+    assert (tmp_path / f"{profile_id}.speedscope.json").exists()
+
+
+def test_endpoints_de_perfiles_piden_el_token(monkeypatch):
+    from app.database.profiling import request_profiler
+    from app.routers.monitoring_routers import router
+
+    monkeypatch.setattr(request_profiler, "token", "secreto")
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    assert client.get("/monitoring/profiles").status_code == 403
+    assert client.get("/monitoring/profiles", headers={"X-Profile": "otro"}).status_code == 403
+    assert client.get("/monitoring/profiles/abc", params={"__profile": "señal"}).status_code == 403
+    assert client.get("/monitoring/profiles", headers={"X-Profile": "secreto"}).status_code == 200
+    assert client.get("/monitoring/profiles/abc", params={"__profile": "secreto"}).status_code == 404
+    monkeypatch.setattr(request_profiler, "token", "")
+    assert client.get("/monitoring/profiles", headers={"X-Profile": ""}).status_code == 403
+
+
+def test_endpoints_de_diagnostico_piden_el_token(monkeypatch):
+    from app.database.profiling import request_profiler
+    from app.routers.monitoring_routers import router
+
+    monkeypatch.setattr(request_profiler, "token", "secreto")
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    for ruta in ("/monitoring/profiler", "/monitoring/profiler/folded", "/monitoring/sql",
+                 "/monitoring/index-advisor", "/monitoring/db-stats", "/monitoring/db-stats/trends"):
+        assert client.get(ruta).status_code == 403, ruta
+    assert client.get("/monitoring/profiler/folded", headers={"X-Profile": "secreto"}).status_code == 200
+    assert client.get("/monitoring/sql", headers={"X-Profile": "secreto"}).status_code == 200
+
+
+def test_marcar_deploy_pide_el_token(monkeypatch):
+    from app.database import db_stats_collector
+    from app.database.profiling import request_profiler
+    from app.routers.monitoring_routers import router
+
+    monkeypatch.setattr(request_profiler, "token", "secreto")
+    monkeypatch.setattr(db_stats_collector, "mark_deploy", lambda version: 7)
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    assert client.post("/monitoring/db-stats/deploys", params={"version": "v2"}).status_code == 403
+    respuesta = client.post("/monitoring/db-stats/deploys", params={"version": "v2"},
+                            headers={"X-Profile": "secreto"})
+    assert respuesta.json() == {"id": 7, "version": "v2"}
+
+
+def test_profiler_continuo_agrega_por_ventana_y_rota(tmp_path):
+    """El profiler continuo agrupa por categoría, limita stacks por ventana y rota a disco."""
+    import json as json_mod
+    import threading
+    from monitoring.profiling import OVERFLOW_STACK, ContinuousProfiler
+
+    profiler = ContinuousProfiler(interval_ms=1, window_seconds=60, max_stacks=50,
+                                  directory=str(tmp_path), max_files=2)
+    detener = threading.Event()
+
+    def trabajo_json():
+        while not detener.is_set():
+            json_mod.dumps({"x": list(range(200))})
+
+    hilo = threading.Thread(target=trabajo_json)
+    hilo.start()
+    try:
+        for _ in range(3):
+            for _ in range(30):
+                profiler.sample_once()
+            profiler.rotate()
+    finally:
+        detener.set()
+        hilo.join()
+
+    resumen = profiler.summary()
+    assert resumen["samples"] > 0
+    assert "json" in resumen["categories"]
+    assert all(len(w.stacks) <= 50 + 1 for w in profiler.windows)
+    assert "trabajo_json" in profiler.folded() or OVERFLOW_STACK in profiler.folded()
+    assert len(list(tmp_path.glob("profile-*.folded"))) <= 2
+
+
+def test_colector_db_stats_guarda_deltas_y_detecta_regresion(tmp_path, caplog):
+    """Los snapshots guardan deltas por intervalo y una consulta más lenta tras el deploy genera alerta."""
+    from app.database.query_instrumentation import QueryInstrumentation
+    from monitoring.db_stats import DbStatsCollector, StatsStore
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE salon_cita (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO salon_cita (id) VALUES (1), (2)"))
+    instrumentation = QueryInstrumentation()
+    collector = DbStatsCollector(engine, StatsStore(str(tmp_path / "stats.db")), instrumentation, min_calls=5)
+    sql = "SELECT * FROM salon_cita WHERE id = 1"
+
+    assert collector.collect() is None  # línea base
+    for _ in range(10):
+        instrumentation.record(sql, 1.0)
+    collector.collect()
+    time.sleep(0.01)
+    collector.mark_deploy("v2")
+    time.sleep(0.01)
+    for _ in range(10):
+        instrumentation.record(sql, 4.0)
+    with caplog.at_level("WARNING", logger="monitoring.db_stats"):
+        collector.collect()
+    assert "Regresión tras deploy v2" in caplog.text
+
+    alerta = collector.regressions()[0]
+    assert alerta["deploy"]["version"] == "v2"
+    assert (alerta["antes_ms"], alerta["despues_ms"], alerta["calls_despues"]) == (1.0, 4.0, 10)
+
+    tendencia = collector.trends(hours=1)[0]
+    assert [p["mean_ms"] for p in tendencia["puntos"]] == [1.0, 4.0]
+    assert tendencia["pendiente_ms_por_hora"] > 0
+    assert {"tabla": "salon_cita", "filas": 2}.items() <= collector.summary()["tablas"][0].items()
@@ -0,0 +1,184 @@
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+
+import anyio
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+# Filas por lote: una transacción y un executemany por lote
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+# Errores por fila que se devuelven como máximo (el resto solo se cuenta)
+BULK_MAX_ERRORES = int(os.getenv("BULK_MAX_ERRORES", "1000"))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class BulkInvalido(ValueError):
+    """El cuerpo no es un array JSON ni NDJSON."""
+
+
+async def leer_filas(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Filas del cuerpo numeradas desde 1. Con Content-Type NDJSON se procesa en
+    streaming (una línea por fila, sin cargar el archivo entero); si no, se
+    espera un array JSON. Una línea que no es JSON válido se entrega como
+    excepción para reportarla como error de esa fila.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        numero, resto = 0, b""
+        async for bloque in request.stream():
+            resto += bloque
+            *lineas, resto = resto.split(b"\n")
+            for linea in lineas:
+                if linea.strip():
+                    numero += 1
+                    yield numero, _parsear(linea)
+        if resto.strip():
+            yield numero + 1, _parsear(resto)
+        return
+
+    try:
+        filas = json.loads(await request.body())
+    except ValueError:
+        raise BulkInvalido("El cuerpo debe ser un array JSON o NDJSON") from None
+    if not isinstance(filas, list):
+        raise BulkInvalido("El cuerpo debe ser un array JSON o NDJSON")
+    for numero, fila in enumerate(filas, start=1):
+        yield numero, fila
+
+
+def _parsear(linea: bytes) -> Any:
+    try:
+        return json.loads(linea)
+    except ValueError as e:
+        return e
+
+
+def _mensaje(error: Exception) -> Any:
+    if isinstance(error, ValidationError):
+        return [{"campo": ".".join(str(p) for p in e["loc"]), "error": e["msg"]} for e in error.errors()]
+    if isinstance(error, DBAPIError):
+        return str(error.orig)
+    return str(error)
+
+
+class ResultadoBulk:
+    def __init__(self):
+        self.total = 0
+        self.insertados = 0
+        self.n_errores = 0
+        self.errores: List[Dict[str, Any]] = []
+
+    def error(self, fila: int, error: Any):
+        self.n_errores += 1
+        if len(self.errores) < BULK_MAX_ERRORES:
+            self.errores.append({"fila": fila, "error": error})
+
+    def sumar(self, lote: "ResultadoBulk"):
+        self.insertados += lote.insertados
+        self.n_errores += lote.n_errores
+        self.errores.extend(lote.errores[:max(BULK_MAX_ERRORES - len(self.errores), 0)])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"total": self.total, "insertados": self.insertados,
+                "con_error": self.n_errores, "errores": sorted(self.errores, key=lambda e: e["fila"])}
+
+
+def insertar_lote(db: Session, modelo, lote: List[Tuple[int, Dict[str, Any]]], resultado: ResultadoBulk):
+    """
+    Inserta un lote validado con un solo executemany y un commit. Si la BD
+    rechaza el lote (unique, FK...) se deshace solo su savepoint y se reintenta
+    fila a fila para insertar las válidas y reportar exactamente las que fallan.
+    """
+    if not lote:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(modelo), [valores for _, valores in lote])
+        resultado.insertados += len(lote)
+    except IntegrityError:
+        for numero, valores in lote:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(modelo), [valores])
+                resultado.insertados += 1
+            except IntegrityError as e:
+                resultado.error(numero, _mensaje(e))
+    db.commit()
+
+
+async def importar(request: Request, db: Session, schema: Type[BaseModel], modelo,
+                   validar: Optional[Callable[[BaseModel], Optional[str]]] = None,
+                   chunk_size: Optional[int] = None, ejecutar=run_in_threadpool) -> Dict[str, Any]:
+    """
+    Importación masiva: valida cada fila con `schema` (y la regla de negocio
+    opcional `validar`, que devuelve un mensaje de error o None) y las inserta
+    por lotes de `chunk_size`. Cada lote se escribe con `ejecutar` (threadpool
+    o un bulkhead) en segundo plano mientras se sigue leyendo y validando el
+    cuerpo: hay a lo sumo una escritura en curso (la sesión no se usa desde dos
+    hilos a la vez) y un lote en preparación, así la memoria queda acotada.
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    resultado = ResultadoBulk()
+    lote: List[Tuple[int, Dict[str, Any]]] = []
+    en_curso: Optional[anyio.Event] = None
+    fallos: List[Exception] = []
+    error_lectura: Optional[Exception] = None
+
+    async with anyio.create_task_group() as tg:
+        async def escribir(filas: List[Tuple[int, Dict[str, Any]]]):
+            nonlocal en_curso
+            if en_curso is not None:
+                await en_curso.wait()
+            if fallos:
+                raise fallos[0]
+            terminada = en_curso = anyio.Event()
+
+            async def _escribir_lote():
+                # Cada lote cuenta en su propio resultado; se suma desde el event loop
+                parcial = ResultadoBulk()
+                try:
+                    await ejecutar(insertar_lote, db, modelo, filas, parcial)
+                    resultado.sumar(parcial)
+                except Exception as e:
+                    fallos.append(e)
+                finally:
+                    terminada.set()
+
+            tg.start_soon(_escribir_lote)
+
+        # Los errores se guardan y se relanzan fuera del task group (sin ExceptionGroup)
+        try:
+            async for numero, fila in leer_filas(request):
+                resultado.total += 1
+                if isinstance(fila, Exception):
+                    resultado.error(numero, f"JSON inválido: {fila}")
+                    continue
+                try:
+                    item = schema.model_validate(fila)
+                except ValidationError as e:
+                    resultado.error(numero, _mensaje(e))
+                    continue
+                mensaje = validar(item) if validar else None
+                if mensaje:
+                    resultado.error(numero, mensaje)
+                    continue
+                lote.append((numero, item.model_dump()))
+                if len(lote) >= chunk_size:
+                    await escribir(lote)
+                    lote = []
+            if lote:
+                await escribir(lote)
+        except Exception as e:
+            error_lectura = e
+    if error_lectura is not None:
+        raise error_lectura
+    if fallos:
+        raise fallos[0]
+    return resultado.to_dict()
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+import anyio
+from anyio import to_thread
+from fastapi import Depends
+from fastapi.routing import APIRoute
+
+# Capacidad por bulkhead, ej: BULKHEAD_LIMITS="reportes=4,auth=8,lecturas=20"
+DEFAULT_CAPACITY = int(os.getenv("BULKHEAD_DEFAULT", "10"))
+
+
+def _leer_limites() -> Dict[str, int]:
+    limites = {}
+    for item in os.getenv("BULKHEAD_LIMITS", "").split(","):
+        if "=" in item:
+            nombre, capacidad = item.split("=", 1)
+            limites[nombre.strip()] = int(capacidad)
+    return limites
+
+
+class Bulkhead:
+    """
+    Capacidad propia para un grupo de endpoints. Cada request del grupo ocupa
+    un token durante todo su ciclo: dependencias (get_db, get_current_user...),
+    endpoint y validación de la respuesta. Los que sobran esperan en la cola
+    del bulkhead sin tomar ningún hilo.
+
+    FastAPI ejecuta las dependencias y endpoints `def` en el limitador global
+    de AnyIO (40 hilos), así que un grupo saturado ocupa como mucho
+    `capacidad` de esos hilos: para que no pueda dejar sin hilos al resto, la
+    suma de capacidades debe quedar por debajo del limitador global.
+    `run` ejecuta una función en hilos limitados solo por este bulkhead
+    (ej. las escrituras de /bulk, que no pasan por un request).
+    """
+
+    def __init__(self, nombre: str, capacidad: int):
+        self.nombre = nombre
+        self.limiter = anyio.CapacityLimiter(capacidad)
+        self.total_llamadas = 0
+        self.max_en_cola = 0
+        self.espera_total = 0.0
+        self._pendientes = 0
+        # Los contadores se tocan desde el event loop y desde los hilos del pool
+        self._lock = threading.Lock()
+
+    def _encolar(self):
+        stats = self.limiter.statistics()
+        with self._lock:
+            # Llamadas que todavía no tienen token, menos los tokens libres = cola real
+            self._pendientes += 1
+            en_cola = self._pendientes - (stats.total_tokens - stats.borrowed_tokens)
+            self.max_en_cola = max(self.max_en_cola, int(en_cola))
+            self.total_llamadas += 1
+        return time.perf_counter()
+
+    def _token_adquirido(self, encolado: float):
+        with self._lock:
+            self._pendientes -= 1
+            self.espera_total += time.perf_counter() - encolado
+
+    @asynccontextmanager
+    async def ocupar(self):
+        """Retiene un token mientras dura el bloque (espera en la cola si no hay)."""
+        encolado = self._encolar()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            with self._lock:
+                self._pendientes -= 1
+            raise
+        self._token_adquirido(encolado)
+        try:
+            yield
+        finally:
+            self.limiter.release()
+
+    async def run(self, func, *args, **kwargs):
+        encolado = self._encolar()
+
+        def tarea():
+            # Se ejecuta ya dentro del hilo, es decir, con el token adquirido
+            self._token_adquirido(encolado)
+            return func(*args, **kwargs)
+
+        return await to_thread.run_sync(tarea, limiter=self.limiter)
+
+    def metricas(self) -> dict:
+        stats = self.limiter.statistics()
+        with self._lock:
+            total, espera = self.total_llamadas, self.espera_total
+        return {
+            "capacidad": int(stats.total_tokens),
+            "en_uso": stats.borrowed_tokens,
+            "en_cola": stats.tasks_waiting,
+            "max_en_cola": self.max_en_cola,
+            "total_llamadas": total,
+            "espera_promedio_ms": round(espera / total * 1000, 3) if total else 0,
+        }
+
+
+_bulkheads: Dict[str, Bulkhead] = {}
+_limites = _leer_limites()
+
+
+def get_bulkhead(nombre: str) -> Bulkhead:
+    if nombre not in _bulkheads:
+        _bulkheads[nombre] = Bulkhead(nombre, _limites.get(nombre, DEFAULT_CAPACITY))
+    return _bulkheads[nombre]
+
+
+def en_bulkhead(nombre: str):
+    """
+    Dependencia de ruta: `@app.get(..., dependencies=[en_bulkhead("lecturas")])`.
+    Las dependencias de la ruta se resuelven antes que las del endpoint, así
+    que el token cubre todas ellas, el endpoint y la validación de la respuesta.
+    """
+    async def ocupar_bulkhead():
+        async with get_bulkhead(nombre).ocupar():
+            yield
+    return Depends(ocupar_bulkhead)
+
+
+def bulkhead_route(nombre: str):
+    """Clase de ruta para asignar un bulkhead a todos los endpoints de un APIRouter."""
+    class BulkheadRoute(APIRoute):
+        def __init__(self, path, endpoint, *, dependencies=None, **kwargs):
+            super().__init__(path, endpoint, dependencies=[en_bulkhead(nombre), *(dependencies or [])], **kwargs)
+    return BulkheadRoute
+
+
+def metricas_bulkheads() -> Dict[str, dict]:
+    return {nombre: b.metricas() for nombre, b in _bulkheads.items()}
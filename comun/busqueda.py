@@ -0,0 +1,267 @@
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# Configuración de texto de PostgreSQL (ej. 'spanish' para stemming; 'simple' solo normaliza)
+BUSQUEDA_PG_CONFIG = os.getenv("BUSQUEDA_PG_CONFIG", "simple")
+_TOKENS = re.compile(r"\w+", re.UNICODE)
+_PESOS_PG = "ABCD"
+# Los índices de trigramas solo filtran subcadenas de al menos 3 caracteres
+MIN_SUBCADENA = 3
+
+
+def tokens(texto: str) -> List[str]:
+    """Palabras de la consulta, sin operadores ni comillas (no se puede inyectar sintaxis FTS)."""
+    return _TOKENS.findall((texto or "").lower())
+
+
+class Dependencia:
+    """Tabla relacionada cuyo cambio debe reindexar filas (ej. autores.nombre -> libros)."""
+
+    def __init__(self, tabla: str, fk: str, columnas: Sequence[str]):
+        self.tabla = tabla
+        self.fk = fk
+        self.columnas = list(columnas)
+
+
+class FTS5Backend:
+    """
+    SQLite: tablas virtuales FTS5 sincronizadas por triggers, con ranking BM25.
+    Una tokeniza por palabra (con índice de prefijos) y otra por trigramas,
+    que resuelve subcadenas dentro de una palabra sin recorrer la tabla.
+    """
+
+    def __init__(self, indice: "IndiceBusqueda"):
+        self.indice = indice
+        self.tabla_fts = f"{indice.tabla}_fts"
+        self.tabla_tri = f"{indice.tabla}_fts_tri"
+
+    def _valores(self, fila: str) -> str:
+        return ", ".join(expr.format(fila=fila) for expr in self.indice.columnas.values())
+
+    def crear(self, conn):
+        i, fts, tri = self.indice, self.tabla_fts, self.tabla_tri
+        existentes = {fila[0] for fila in conn.exec_driver_sql(
+            f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('{fts}', '{tri}')")}
+        cols = ", ".join(i.columnas)
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+        conn.exec_driver_sql(f"CREATE VIRTUAL TABLE IF NOT EXISTS {tri} USING fts5({cols}, tokenize = 'trigram')")
+        insertar = " ".join(f"INSERT INTO {t} (rowid, {cols}) VALUES (new.id, {self._valores('new')});"
+                            for t in (fts, tri))
+        borrar = " ".join(f"DELETE FROM {t} WHERE rowid = old.id;" for t in (fts, tri))
+        # Se recrean siempre: los de una versión anterior no mantenían la tabla de trigramas
+        triggers = {
+            f"{fts}_ai": f"AFTER INSERT ON {i.tabla} BEGIN {insertar} END",
+            f"{fts}_ad": f"AFTER DELETE ON {i.tabla} BEGIN {borrar} END",
+            f"{fts}_au": f"AFTER UPDATE ON {i.tabla} BEGIN {borrar} {insertar} END",
+        }
+        for dep in i.dependencias:
+            cuerpo = " ".join(
+                f"DELETE FROM {t} WHERE rowid IN (SELECT id FROM {i.tabla} WHERE {dep.fk} = new.id); "
+                f"INSERT INTO {t} (rowid, {cols}) SELECT {i.tabla}.id, {self._valores(i.tabla)} "
+                f"FROM {i.tabla} WHERE {i.tabla}.{dep.fk} = new.id;" for t in (fts, tri))
+            triggers[f"{fts}_{dep.tabla}_au"] = (f"AFTER UPDATE OF {', '.join(dep.columnas)} ON {dep.tabla} "
+                                                 f"BEGIN {cuerpo} END")
+        for nombre, definicion in triggers.items():
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {nombre}")
+            conn.exec_driver_sql(f"CREATE TRIGGER {nombre} {definicion}")
+        if existentes != {fts, tri}:
+            self.reconstruir(conn)
+
+    def reconstruir(self, conn):
+        i = self.indice
+        for tabla in (self.tabla_fts, self.tabla_tri):
+            conn.exec_driver_sql(f"DELETE FROM {tabla}")
+            conn.exec_driver_sql(
+                f"INSERT INTO {tabla} (rowid, {', '.join(i.columnas)}) SELECT {i.tabla}.id, "
+                f"{self._valores(i.tabla)} FROM {i.tabla}")
+
+    def consulta(self, palabras: List[str], columna: Optional[str]) -> str:
+        # Frases entre comillas; la última con * para autocompletar por prefijo
+        frases = [f'"{p}"' for p in palabras[:-1]] + [f'"{palabras[-1]}"*']
+        expresion = " ".join(frases)
+        return f"{columna} : ({expresion})" if columna else expresion
+
+    def buscar(self, db: Session, consulta: str, limit: int, offset: int) -> Tuple[List[Tuple[int, float]], int]:
+        return self._match(db, self.tabla_fts, consulta, limit, offset)
+
+    def buscar_subcadena(self, db: Session, texto: str, columna: Optional[str],
+                         limit: int, offset: int) -> Tuple[List[Tuple[int, float]], int]:
+        # Una sola frase: el tokenizer trigram la encuentra en cualquier posición
+        consulta = f'"{texto}"'
+        return self._match(db, self.tabla_tri, f"{columna} : {consulta}" if columna else consulta, limit, offset)
+
+    def _match(self, db: Session, tabla: str, consulta: str, limit: int, offset: int):
+        pesos = ", ".join(str(float(p)) for p in self.indice.pesos)
+        filas = db.execute(text(
+            f"SELECT rowid, bm25({tabla}, {pesos}) AS rank FROM {tabla} "
+            f"WHERE {tabla} MATCH :q ORDER BY rank LIMIT :limit OFFSET :offset"),
+            {"q": consulta, "limit": limit, "offset": offset}).all()
+        total = db.execute(text(f"SELECT count(*) FROM {tabla} WHERE {tabla} MATCH :q"), {"q": consulta}).scalar()
+        # bm25 es menor cuanto más relevante: se devuelve positivo
+        return [(rowid, round(-rank, 6)) for rowid, rank in filas], total
+
+
+class TsvectorBackend:
+    """
+    PostgreSQL: tabla lateral con tsvector ponderado (una letra de peso por
+    columna) e índice GIN. Guarda además el texto de cada columna con un
+    índice GIN de pg_trgm, que resuelve las subcadenas (ILIKE '%...%').
+    """
+
+    def __init__(self, indice: "IndiceBusqueda", config: str = BUSQUEDA_PG_CONFIG):
+        self.indice = indice
+        self.config = config
+        self.tabla_doc = f"{indice.tabla}_busqueda"
+
+    def _textos(self, fila: str) -> str:
+        return ", ".join(f"coalesce(({expr})::text, '')" for expr in self.indice.columnas.values())
+
+    def _documento(self, fila: str) -> str:
+        return " || ".join(
+            f"setweight(to_tsvector('{self.config}', coalesce(({expr})::text, '')), '{_PESOS_PG[n]}')"
+            for n, expr in enumerate(self.indice.columnas.values()))
+
+    def crear(self, conn):
+        i, doc = self.indice, self.tabla_doc
+        cols = ", ".join(i.columnas)
+        actualizar = ", ".join(["documento = EXCLUDED.documento"] + [f"{c} = EXCLUDED.{c}" for c in i.columnas])
+        existe = conn.exec_driver_sql(f"SELECT to_regclass('{doc}')").scalar()
+        conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {doc} (id INTEGER PRIMARY KEY, documento tsvector NOT NULL)")
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS idx_{doc}_gin ON {doc} USING GIN (documento)")
+        # Columnas de texto para las subcadenas (las tablas de una versión anterior no las tienen)
+        faltantes = [c for c in i.columnas if not conn.exec_driver_sql(
+            f"SELECT 1 FROM information_schema.columns WHERE table_name = '{doc}' AND column_name = '{c}'").first()]
+        for columna in faltantes:
+            conn.exec_driver_sql(f"ALTER TABLE {doc} ADD COLUMN {columna} text NOT NULL DEFAULT ''")
+            conn.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS idx_{doc}_{columna}_trgm ON {doc} USING GIN ({columna} gin_trgm_ops)")
+        conn.exec_driver_sql(f"""
+            CREATE OR REPLACE FUNCTION {doc}_sync() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM {doc} WHERE id = OLD.id;
+                    RETURN OLD;
+                END IF;
+                INSERT INTO {doc} (id, documento, {cols}) VALUES (NEW.id, {self._documento('NEW')}, {self._textos('NEW')})
+                ON CONFLICT (id) DO UPDATE SET {actualizar};
+                RETURN NEW;
+            END $$ LANGUAGE plpgsql""")
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {doc}_sync ON {i.tabla}")
+        conn.exec_driver_sql(f"CREATE TRIGGER {doc}_sync AFTER INSERT OR UPDATE OR DELETE ON {i.tabla} "
+                             f"FOR EACH ROW EXECUTE FUNCTION {doc}_sync()")
+        for dep in i.dependencias:
+            funcion = f"{doc}_{dep.tabla}_sync"
+            conn.exec_driver_sql(f"""
+                CREATE OR REPLACE FUNCTION {funcion}() RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO {doc} (id, documento, {cols})
+                    SELECT {i.tabla}.id, {self._documento(i.tabla)}, {self._textos(i.tabla)}
+                    FROM {i.tabla} WHERE {i.tabla}.{dep.fk} = NEW.id
+                    ON CONFLICT (id) DO UPDATE SET {actualizar};
+                    RETURN NEW;
+                END $$ LANGUAGE plpgsql""")
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {funcion} ON {dep.tabla}")
+            conn.exec_driver_sql(f"CREATE TRIGGER {funcion} AFTER UPDATE OF {', '.join(dep.columnas)} "
+                                 f"ON {dep.tabla} FOR EACH ROW EXECUTE FUNCTION {funcion}()")
+        if existe is None or faltantes:
+            self.reconstruir(conn)
+
+    def reconstruir(self, conn):
+        i, doc = self.indice, self.tabla_doc
+        conn.exec_driver_sql(f"TRUNCATE {doc}")
+        conn.exec_driver_sql(f"INSERT INTO {doc} (id, documento, {', '.join(i.columnas)}) "
+                             f"SELECT {i.tabla}.id, {self._documento(i.tabla)}, {self._textos(i.tabla)} "
+                             f"FROM {i.tabla}")
+
+    def consulta(self, palabras: List[str], columna: Optional[str]) -> str:
+        # 'palabra:A' limita a la columna (por su peso); ':*' es búsqueda por prefijo
+        peso = _PESOS_PG[list(self.indice.columnas).index(columna)] if columna else ""
+        partes = [f"{p}:{peso}" if peso else p for p in palabras[:-1]]
+        partes.append(f"{palabras[-1]}:*{peso}")
+        return " & ".join(partes)
+
+    def buscar(self, db: Session, consulta: str, limit: int, offset: int) -> Tuple[List[Tuple[int, float]], int]:
+        filtro = f"FROM {self.tabla_doc}, to_tsquery('{self.config}', :q) AS q WHERE documento @@ q"
+        filas = db.execute(text(
+            f"SELECT id, ts_rank_cd(documento, q) AS rank {filtro} ORDER BY rank DESC, id LIMIT :limit OFFSET :offset"),
+            {"q": consulta, "limit": limit, "offset": offset}).all()
+        total = db.execute(text(f"SELECT count(*) {filtro}"), {"q": consulta}).scalar()
+        return [(id_, round(float(rank), 6)) for id_, rank in filas], total
+
+    def buscar_subcadena(self, db: Session, texto: str, columna: Optional[str],
+                         limit: int, offset: int) -> Tuple[List[Tuple[int, float]], int]:
+        columnas = [columna] if columna else list(self.indice.columnas)
+        # ILIKE '%...%' usa los índices de trigramas; se escapan los comodines
+        patron = "%" + texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        filtro = f"FROM {self.tabla_doc} WHERE " + " OR ".join(f"{c} ILIKE :patron" for c in columnas)
+        similitud = f"greatest({', '.join(f'similarity({c}, :q)' for c in columnas)}, 0)"
+        filas = db.execute(text(
+            f"SELECT id, {similitud} AS rank {filtro} ORDER BY rank DESC, id LIMIT :limit OFFSET :offset"),
+            {"q": texto, "patron": patron, "limit": limit, "offset": offset}).all()
+        total = db.execute(text(f"SELECT count(*) {filtro}"), {"patron": patron}).scalar()
+        return [(id_, round(float(rank), 6)) for id_, rank in filas], total
+
+
+_BACKENDS = {"sqlite": FTS5Backend, "postgresql": TsvectorBackend}
+
+
+class IndiceBusqueda:
+    """
+    Índice de texto completo de una tabla con la misma interfaz en SQLite
+    (FTS5) y PostgreSQL (tsvector + GIN). Se crea junto con las tablas
+    (evento after_create de la metadata) y lo mantienen triggers en la base de
+    datos, así también cubre inserts masivos y escrituras fuera del ORM.
+
+    `columnas`: nombre -> expresión SQL con `{fila}` como alias de la fila
+    (ej. "{fila}.titulo" o "(SELECT nombre FROM autores WHERE id = {fila}.autor_id)").
+    `pesos`: peso BM25 por columna en SQLite (en PostgreSQL el orden define A, B, C, D).
+    Los nombres de columna se usan como identificadores SQL en las tablas del índice.
+    """
+
+    def __init__(self, tabla: str, columnas: Dict[str, str], pesos: Sequence[float] = (),
+                 dependencias: Sequence[Dependencia] = ()):
+        self.tabla = tabla
+        self.columnas = columnas
+        self.pesos = list(pesos) or [1.0] * len(columnas)
+        self.dependencias = list(dependencias)
+
+    def registrar(self, metadata):
+        event.listen(metadata, "after_create", self._crear)
+
+    def _crear(self, target, connection, **kw):
+        backend = self.backend(connection.dialect.name)
+        if backend is not None:
+            backend.crear(connection)
+
+    def backend(self, dialecto: str):
+        clase = _BACKENDS.get(dialecto)
+        return clase(self) if clase else None
+
+    def buscar(self, db: Session, modelo, texto: str, columna: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Optional[Tuple[list, int]]:
+        """
+        Objetos de `modelo` que coinciden, ordenados por relevancia, y el total
+        de coincidencias. Coincide por palabra completa y la última se busca
+        como prefijo (autocompletar); si no hay ninguna, busca la consulta como
+        subcadena ("top" en "Laptop") en el índice de trigramas, a partir de
+        MIN_SUBCADENA caracteres. Devuelve None si el dialecto no tiene backend.
+        """
+        backend = self.backend(db.get_bind().dialect.name)
+        if backend is None:
+            return None
+        palabras = tokens(texto)
+        if not palabras:
+            return [], 0
+        ranking, total = backend.buscar(db, backend.consulta(palabras, columna), limit, offset)
+        subcadena = " ".join(palabras)
+        if not total and len(subcadena) >= MIN_SUBCADENA:
+            ranking, total = backend.buscar_subcadena(db, subcadena, columna, limit, offset)
+        por_id = {obj.id: obj for obj in db.query(modelo).filter(modelo.id.in_([r[0] for r in ranking]))}
+        return [por_id[id_] for id_, _ in ranking if id_ in por_id], total
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import os
+from typing import Iterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Connection
+
+# Filas por lote leídas del cursor del servidor y escritas en la respuesta
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _filas(bind, stmt, chunk_size: int) -> Iterator[list]:
+    """
+    Lotes de filas con un cursor del lado del servidor (stream_results):
+    psycopg usa un cursor con nombre, pymysql SSCursor y SQLite ya lee
+    incrementalmente. Son filas Core, no objetos ORM: no crece el identity map.
+    Con un Engine la conexión es propia del generador, así no depende de que
+    la sesión del request siga abierta mientras se envía la respuesta.
+    """
+    if isinstance(bind, Connection):
+        yield from bind.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt).partitions()
+        return
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+        for lote in result.partitions():
+            yield lote
+
+
+def _ndjson(columnas, lotes) -> Iterator[str]:
+    for lote in lotes:
+        yield "".join(json.dumps(dict(zip(columnas, fila)), default=str, ensure_ascii=False) + "\n"
+                      for fila in lote)
+
+
+def _celda(valor):
+    # Columnas JSON (listas/dicts) van como JSON dentro de la celda
+    return json.dumps(valor, ensure_ascii=False) if isinstance(valor, (list, dict)) else valor
+
+
+def _csv(columnas, lotes) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    for lote in lotes:
+        writer.writerows([_celda(v) for v in fila] for fila in lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def exportar(bind, stmt, nombre: str, formato: str = "ndjson",
+             chunk_size: int = EXPORT_CHUNK_SIZE) -> StreamingResponse:
+    """
+    Exportación completa en streaming (NDJSON o CSV): se codifica lote a lote
+    mientras se lee el cursor, así la memoria no depende del tamaño de la tabla.
+    `stmt` debe seleccionar columnas (select(Modelo.id, ...)), no entidades.
+    """
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato} (ndjson o csv)")
+    columnas = [c.key for c in stmt.selected_columns]
+    lotes = _filas(bind, stmt, chunk_size)
+    cuerpo = _ndjson(columnas, lotes) if formato == "ndjson" else _csv(columnas, lotes)
+    extension = "ndjson" if formato == "ndjson" else "csv"
+    return StreamingResponse(cuerpo, media_type=FORMATOS[formato], headers={
+        "Content-Disposition": f'attachment; filename="{nombre}.{extension}"'})
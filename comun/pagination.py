@@ -0,0 +1,83 @@
+import base64
+import datetime
+import decimal
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se pudo decodificar o no corresponde al orden."""
+
+
+def encode_cursor(valores: Sequence[Any]) -> str:
+    """Cursor opaco: JSON con los valores de la clave de orden, en base64 url-safe."""
+    raw = json.dumps(list(valores), default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _tipo(columna) -> type:
+    try:
+        return columna.type.python_type
+    except NotImplementedError:
+        return object
+
+
+def _convertir(valor: Any, tipo: type) -> Any:
+    """Valor del cursor al tipo de su columna; fechas y decimales viajan como texto."""
+    if isinstance(valor, (list, dict)) or valor is None or (isinstance(valor, bool) and tipo is not bool):
+        raise CursorInvalido("Cursor inválido")
+    try:
+        if tipo in (datetime.date, datetime.datetime, datetime.time) and isinstance(valor, str):
+            return tipo.fromisoformat(valor)
+        if tipo is decimal.Decimal and isinstance(valor, (str, int, float)):
+            return decimal.Decimal(str(valor))
+    except (ValueError, decimal.InvalidOperation):
+        raise CursorInvalido("Cursor inválido") from None
+    if tipo is float and isinstance(valor, int):
+        return float(valor)
+    if tipo is not object and not isinstance(valor, tipo):
+        raise CursorInvalido("Cursor inválido")
+    return valor
+
+
+def decode_cursor(cursor: str, columnas: Sequence) -> List[Any]:
+    """Valores del cursor, uno por columna y del tipo de esa columna; si no, CursorInvalido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorInvalido("Cursor inválido") from None
+    if not isinstance(valores, list) or len(valores) != len(columnas):
+        raise CursorInvalido("Cursor inválido")
+    return [_convertir(valor, _tipo(columna)) for valor, columna in zip(valores, columnas)]
+
+
+def paginar_keyset(query: Query, columnas: Sequence, cursor: Optional[str],
+                   limit: int, desc: bool = False) -> Tuple[list, Optional[str]]:
+    """
+    Paginación por clave (keyset): en vez de OFFSET filtra por la última clave
+    vista, así una página profunda usa el índice igual que la primera y no se
+    saltan ni repiten filas si se insertan registros entre páginas.
+
+    `columnas` debe ser una clave única e indexada (ej. (id,) o (fecha, id)).
+    `cursor` vacío o None devuelve la primera página; `limit` debe ser >= 1.
+    """
+    if limit < 1:
+        raise ValueError("limit debe ser >= 1")
+    if cursor:
+        valores = decode_cursor(cursor, columnas)
+        clave = tuple_(*columnas) if len(columnas) > 1 else columnas[0]
+        ultimo = tuple_(*valores) if len(columnas) > 1 else valores[0]
+        query = query.filter(clave < ultimo if desc else clave > ultimo)
+    orden = [c.desc() if desc else c.asc() for c in columnas]
+    # Pedimos una fila de más para saber si hay página siguiente
+    filas = query.order_by(*orden).limit(limit + 1).all()
+    next_cursor = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        next_cursor = encode_cursor([getattr(ultima, c.key) for c in columnas])
+    return filas, next_cursor
@@ -0,0 +1,318 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Configuración del pool del engine principal
+POOL_SIZE = int(os.getenv("POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("POOL_TIMEOUT", "30"))
+# Segundos tras los que una conexión se recicla (evita conexiones cortadas por el servidor)
+POOL_RECYCLE = int(os.getenv("POOL_RECYCLE", "1800"))
+
+# Controlador opcional que ajusta el pool según la espera observada
+POOL_AUTOSCALE = os.getenv("POOL_AUTOSCALE", "0") == "1"
+POOL_MIN_SIZE = int(os.getenv("POOL_MIN_SIZE", str(POOL_SIZE)))
+POOL_MAX_SIZE = int(os.getenv("POOL_MAX_SIZE", str(POOL_SIZE * 4)))
+POOL_MAX_OVERFLOW_LIMIT = int(os.getenv("POOL_MAX_OVERFLOW_LIMIT", str(POOL_MAX_OVERFLOW * 2)))
+POOL_TARGET_WAIT_MS = float(os.getenv("POOL_TARGET_WAIT_MS", "20"))
+POOL_AUTOSCALE_INTERVAL_S = float(os.getenv("POOL_AUTOSCALE_INTERVAL_S", "10"))
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+class _MedirEspera:
+    """Mide cuánto espera cada checkout por una conexión libre (mixin de QueuePool)."""
+
+    telemetria: Optional["PoolTelemetry"] = None
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except exc.TimeoutError:
+            if self.telemetria is not None:
+                self.telemetria.registrar_timeout((time.perf_counter() - inicio) * 1000)
+            raise
+        if self.telemetria is not None:
+            self.telemetria.registrar_espera((time.perf_counter() - inicio) * 1000)
+        return conexion
+
+    def recreate(self):
+        # engine.dispose() e invalidaciones masivas crean un pool nuevo: conservar la telemetría
+        nuevo = super().recreate()
+        nuevo.telemetria = self.telemetria
+        return nuevo
+
+
+class QueuePoolInstrumentado(_MedirEspera, QueuePool):
+    """QueuePool que mide cuánto espera cada checkout por una conexión libre."""
+
+
+class AsyncQueuePoolInstrumentado(_MedirEspera, AsyncAdaptedQueuePool):
+    """Lo mismo para el pool de create_async_engine."""
+
+
+# QueuePool no expone cómo cambiar su tamaño: redimensionar_pool usa estos
+# atributos internos (probados con SQLAlchemy 2.0 y 2.1; la versión está fijada en el
+# requirements.txt de cada app y semana4/test_pool_metrics falla si una actualización los quita)
+INTERNOS_QUEUEPOOL = ("_overflow_lock", "_overflow", "_max_overflow", "_pool")
+
+
+def soporta_redimensionar(pool) -> bool:
+    return (isinstance(pool, QueuePool) and all(hasattr(pool, attr) for attr in INTERNOS_QUEUEPOOL)
+            and hasattr(pool._pool, "maxsize"))
+
+
+def redimensionar_pool(pool: QueuePool, pool_size: int, max_overflow: int):
+    """
+    Cambia pool_size/max_overflow de un QueuePool en caliente.
+    `_overflow` cuenta conexiones abiertas menos pool_size, así que se corrige
+    con la diferencia; al achicar, las conexiones sobrantes se cierran al devolverse.
+    """
+    if not soporta_redimensionar(pool):
+        raise RuntimeError(f"{type(pool).__name__} no expone los atributos internos {INTERNOS_QUEUEPOOL}")
+    with pool._overflow_lock:
+        delta = pool_size - pool._pool.maxsize
+        pool._overflow -= delta
+        pool._pool.maxsize = pool_size
+        pool._max_overflow = max_overflow
+
+
+class PoolTelemetry:
+    """
+    Métricas del pool de un engine: espera por checkout, conexiones en uso y
+    overflow, edad de las conexiones, tiempo retenidas e invalidaciones.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self.engine = None
+        self.esperas: deque = deque(maxlen=max_samples)  # ms, ventana para percentiles
+        self._ventana: List[float] = []  # esperas desde la última lectura del controlador
+        self.checkouts = 0
+        self.timeouts = 0
+        self._timeouts_ventana = 0
+        self.invalidaciones = 0
+        self.invalidaciones_suaves = 0
+        self.conexiones_creadas = 0
+        self.conexiones_cerradas = 0
+        self.retenida_max_ms = 0.0
+        self.pico_en_uso = 0
+        self._pico_ventana = 0
+        self._vivas: Dict[int, float] = {}  # id(registro) -> creada (monotonic)
+        self._lock = threading.Lock()
+
+    # --- registro ---
+    def registrar_espera(self, ms: float):
+        with self._lock:
+            self.esperas.append(ms)
+            self._ventana.append(ms)
+
+    def registrar_timeout(self, ms: float):
+        with self._lock:
+            self.timeouts += 1
+            self._timeouts_ventana += 1
+            self.esperas.append(ms)
+            self._ventana.append(ms)
+
+    def attach(self, engine):
+        """Escucha los eventos del pool del engine y, si es instrumentado, sus esperas."""
+        self.engine = engine
+        if isinstance(engine.pool, _MedirEspera):
+            engine.pool.telemetria = self
+
+        @event.listens_for(engine, "connect")
+        def _connect(dbapi_connection, record):
+            with self._lock:
+                self.conexiones_creadas += 1
+                self._vivas[id(record)] = time.monotonic()
+
+        @event.listens_for(engine, "close")
+        def _close(dbapi_connection, record):
+            with self._lock:
+                self.conexiones_cerradas += 1
+                self._vivas.pop(id(record), None)
+
+        @event.listens_for(engine, "checkout")
+        def _checkout(dbapi_connection, record, proxy):
+            record.info["checkout_en"] = time.perf_counter()
+            en_uso = self._en_uso()
+            with self._lock:
+                self.checkouts += 1
+                self.pico_en_uso = max(self.pico_en_uso, en_uso)
+                self._pico_ventana = max(self._pico_ventana, en_uso)
+
+        @event.listens_for(engine, "checkin")
+        def _checkin(dbapi_connection, record):
+            inicio = record.info.pop("checkout_en", None) if record is not None else None
+            if inicio is not None:
+                retenida = (time.perf_counter() - inicio) * 1000
+                self.retenida_max_ms = max(self.retenida_max_ms, retenida)
+
+        @event.listens_for(engine, "invalidate")
+        def _invalidate(dbapi_connection, record, exception):
+            with self._lock:
+                self.invalidaciones += 1
+
+        @event.listens_for(engine, "soft_invalidate")
+        def _soft_invalidate(dbapi_connection, record, exception):
+            with self._lock:
+                self.invalidaciones_suaves += 1
+
+    # --- lectura ---
+    def _en_uso(self) -> int:
+        pool = self.engine.pool if self.engine is not None else None
+        return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+    def ventana(self) -> Dict[str, Any]:
+        """Esperas, timeouts y pico de uso desde la última llamada (lo consume el controlador)."""
+        with self._lock:
+            esperas, self._ventana = self._ventana, []
+            timeouts, self._timeouts_ventana = self._timeouts_ventana, 0
+            pico, self._pico_ventana = self._pico_ventana, self._en_uso()
+        ordenadas = sorted(esperas)
+        return {"checkouts": len(esperas), "timeouts": timeouts, "pico_en_uso": pico,
+                "p95_ms": _percentil(ordenadas, 0.95)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self.engine.pool if self.engine is not None else None
+        ahora = time.monotonic()
+        with self._lock:
+            ordenadas = sorted(self.esperas)
+            edades = [ahora - creada for creada in self._vivas.values()]
+        datos: Dict[str, Any] = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            # max_overflow no tiene accesor público; None si el atributo interno cambia
+            max_overflow = getattr(pool, "_max_overflow", None)
+            datos.update({
+                "pool_size": pool.size(),
+                "max_overflow": max_overflow,
+                "timeout_s": pool.timeout(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "capacidad_total": pool.size() + max(max_overflow, 0) if max_overflow is not None else None,
+            })
+        datos.update({
+            "checkouts": self.checkouts,
+            "pico_en_uso": self.pico_en_uso,
+            "espera_ms": {
+                "p50": round(_percentil(ordenadas, 0.50), 3),
+                "p95": round(_percentil(ordenadas, 0.95), 3),
+                "p99": round(_percentil(ordenadas, 0.99), 3),
+                "max": round(ordenadas[-1], 3) if ordenadas else 0.0,
+            },
+            "timeouts": self.timeouts,
+            "retenida_max_ms": round(self.retenida_max_ms, 3),
+            "conexiones": {
+                "abiertas": len(edades),
+                "creadas": self.conexiones_creadas,
+                "cerradas": self.conexiones_cerradas,
+                "edad_promedio_s": round(sum(edades) / len(edades), 1) if edades else 0.0,
+                "edad_max_s": round(max(edades), 1) if edades else 0.0,
+            },
+            "invalidaciones": self.invalidaciones,
+            "invalidaciones_suaves": self.invalidaciones_suaves,
+        })
+        return datos
+
+
+class PoolAutoscaler:
+    """
+    Controlador opcional del tamaño del pool: cada `interval_s` mira la espera
+    p95 por conexión y los timeouts de la ventana.
+    - Si se esperó más de `target_wait_ms` (o hubo timeouts) crece pool_size
+      hasta `max_size` y, ya en el tope, max_overflow hasta `max_overflow_limit`.
+    - Si no hubo espera y el pico de uso quedó bajo la mitad del pool, se achica
+      hacia `min_size` y el overflow vuelve a su valor inicial.
+    Los límites superiores deben respetar las conexiones que acepta la base de datos.
+    """
+
+    def __init__(self, telemetria: PoolTelemetry, min_size: int = POOL_MIN_SIZE,
+                 max_size: int = POOL_MAX_SIZE, max_overflow_limit: int = POOL_MAX_OVERFLOW_LIMIT,
+                 target_wait_ms: float = POOL_TARGET_WAIT_MS, interval_s: float = POOL_AUTOSCALE_INTERVAL_S,
+                 step: int = 2):
+        self.telemetria = telemetria
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow_limit = max_overflow_limit
+        self.target_wait_ms = target_wait_ms
+        self.interval_s = interval_s
+        self.step = step
+        self.overflow_base: Optional[int] = None
+        self.decisiones: deque = deque(maxlen=50)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def tick(self) -> Optional[Dict[str, Any]]:
+        """Evalúa la última ventana y redimensiona si hace falta; devuelve la decisión."""
+        pool = self.telemetria.engine.pool
+        if not soporta_redimensionar(pool):
+            return None
+        if self.overflow_base is None:
+            self.overflow_base = pool._max_overflow
+        ventana = self.telemetria.ventana()
+        size, overflow = pool.size(), pool._max_overflow
+        nuevo_size, nuevo_overflow = size, overflow
+
+        if ventana["timeouts"] or ventana["p95_ms"] > self.target_wait_ms:
+            if size < self.max_size:
+                nuevo_size = min(size + self.step, self.max_size)
+            elif overflow < self.max_overflow_limit:
+                nuevo_overflow = min(overflow + self.step, self.max_overflow_limit)
+        elif ventana["p95_ms"] < self.target_wait_ms / 4 and ventana["pico_en_uso"] < size / 2:
+            if overflow > self.overflow_base:
+                nuevo_overflow = max(overflow - self.step, self.overflow_base)
+            elif size > self.min_size:
+                nuevo_size = max(size - self.step, self.min_size)
+
+        if (nuevo_size, nuevo_overflow) == (size, overflow):
+            return None
+        redimensionar_pool(pool, nuevo_size, nuevo_overflow)
+        decision = {"timestamp": time.time(), "pool_size": [size, nuevo_size],
+                    "max_overflow": [overflow, nuevo_overflow], "p95_ms": round(ventana["p95_ms"], 3),
+                    "timeouts": ventana["timeouts"], "pico_en_uso": ventana["pico_en_uso"]}
+        self.decisiones.append(decision)
+        logger.info("Pool redimensionado: size %s→%s, overflow %s→%s (p95 espera %.1fms, timeouts %s)",
+                    size, nuevo_size, overflow, nuevo_overflow, ventana["p95_ms"], ventana["timeouts"])
+        return decision
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Error en el autoscaler del pool")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if not soporta_redimensionar(self.telemetria.engine.pool):
+            logger.warning("Autoscaler del pool deshabilitado: %s no se puede redimensionar",
+                           type(self.telemetria.engine.pool).__name__)
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pool-autoscaler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def estado(self) -> Dict[str, Any]:
+        return {"activo": self._thread is not None, "min_size": self.min_size, "max_size": self.max_size,
+                "max_overflow_limit": self.max_overflow_limit, "target_wait_ms": self.target_wait_ms,
+                "decisiones": list(self.decisiones)}
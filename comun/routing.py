@@ -0,0 +1,97 @@
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import Delete, Insert, Update, create_engine, event
+from sqlalchemy.orm import Session
+
+# Segundos que un cliente lee del primario después de escribir
+PIN_PRIMARY_SECONDS = float(os.getenv("PIN_PRIMARY_SECONDS", "5"))
+PIN_COOKIE = "primary_until"
+
+
+def crear_replicas(urls: str, **engine_kwargs) -> list:
+    """Engines de réplica a partir de REPLICA_URLS ('url1,url2'); lista vacía si no hay."""
+    return [create_engine(url.strip(), **engine_kwargs) for url in urls.split(",") if url.strip()]
+
+
+class EstadoCliente:
+    """Estado del request actual: si debe leer del primario y si escribió algo."""
+
+    __slots__ = ("pin_primario", "escribio")
+
+    def __init__(self, pin_primario: bool = False):
+        self.pin_primario = pin_primario
+        self.escribio = False
+
+
+_cliente_actual: ContextVar[Optional[EstadoCliente]] = ContextVar("cliente_actual", default=None)
+
+
+class RoutingSession(Session):
+    """
+    Sesión que elige engine por sentencia:
+    - escrituras, flush y todo lo que venga después de una escritura en la
+      misma sesión van al primario (read-your-writes dentro de la sesión,
+      incluido el refresh() que sigue al commit);
+    - si el cliente escribió hace menos de PIN_PRIMARY_SECONDS (cookie), sus
+      lecturas también van al primario, para no leer una réplica atrasada;
+    - el resto de lecturas se reparte entre las réplicas.
+    """
+
+    def __init__(self, primary=None, replicas: Optional[List] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replicas = replicas or []
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.primary is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if not self.replicas or self._flushing or self.info.get("escribio"):
+            return self.primary
+        if isinstance(clause, (Insert, Update, Delete)):
+            return self.primary
+        cliente = _cliente_actual.get()
+        if cliente is not None and cliente.pin_primario:
+            return self.primary
+        return random.choice(self.replicas)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _marcar_escritura(session, flush_context):
+    session.info["escribio"] = True
+    cliente = _cliente_actual.get()
+    if cliente is not None:
+        cliente.escribio = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _marcar_escritura_masiva(orm_execute_state):
+    # session.execute(update(...)) / delete(...) / insert(...) sin pasar por flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _marcar_escritura(orm_execute_state.session, None)
+
+
+def registrar_pin_primario(app, segundos: float = PIN_PRIMARY_SECONDS):
+    """
+    Middleware HTTP: lee la cookie de pin al entrar y, si el request escribió,
+    la renueva por `segundos`. Al viajar en una cookie funciona con varios workers.
+    """
+    @app.middleware("http")
+    async def pin_primario(request, call_next):
+        try:
+            hasta = float(request.cookies.get(PIN_COOKIE, "0"))
+        except ValueError:
+            hasta = 0.0
+        cliente = EstadoCliente(pin_primario=hasta > time.time())
+        token = _cliente_actual.set(cliente)
+        try:
+            response = await call_next(request)
+        finally:
+            _cliente_actual.reset(token)
+        if cliente.escribio:
+            response.set_cookie(PIN_COOKIE, f"{time.time() + segundos:.3f}",
+                                max_age=int(segundos) + 1, httponly=True, samesite="lax")
+        return response
@@ -0,0 +1,160 @@
+import re
+import sys
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos y solo letras/dígitos separados por espacios."""
+    sin_acentos = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return _NO_ALFANUMERICO.sub(" ", sin_acentos.lower()).strip()
+
+
+def trigramas(texto: str) -> Set[str]:
+    """Trigramas de cada palabra con relleno, como pg_trgm: 'pc' -> '  p', ' pc', 'pc '."""
+    resultado = set()
+    for palabra in normalizar(texto).split():
+        relleno = f"  {palabra} "
+        # intern: el índice y los documentos comparten el mismo objeto por trigrama
+        resultado.update(sys.intern(relleno[i:i + 3]) for i in range(len(relleno) - 2))
+    return resultado
+
+
+def _trigramas_internos(palabra: str) -> Set[str]:
+    """Trigramas sin relleno: los que tiene cualquier texto que contenga `palabra` dentro de una palabra."""
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas en memoria para búsqueda tolerante a errores
+    de tipeo ("laptpo" encuentra "Laptop"). Cada trigrama apunta a los ids que
+    lo contienen: una búsqueda solo visita los productos que comparten algún
+    trigrama con la consulta, nunca recorre el catálogo completo.
+
+    `campos`: campo del producto -> peso (el nombre pesa más que la descripción).
+    Primero van los productos que contienen la consulta como subcadena ("apt"
+    o "ou" en "Laptop Gamer"), igual que la búsqueda por `in` que reemplaza;
+    después los aproximados, cuyo puntaje es la mejor fracción (por su peso) de
+    trigramas de la consulta presentes en un campo y que deben alcanzar `umbral`.
+    Las consultas sin palabras de 3+ letras no tienen trigramas que filtren y
+    recorren los textos normalizados.
+    """
+
+    def __init__(self, campos: Dict[str, float], umbral: float = 0.5):
+        self.campos = campos
+        self.umbral = umbral
+        # campo -> trigrama -> ids; y por id sus trigramas (tuplas, lo mínimo para poder quitarlo)
+        self._postings: Dict[str, Dict[str, Set[int]]] = {campo: defaultdict(set) for campo in campos}
+        self._docs: Dict[int, Tuple[Tuple[str, ...], ...]] = {}
+        # Texto normalizado por campo, para confirmar coincidencias por subcadena
+        self._textos: Dict[int, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, producto_id: int, producto: dict):
+        """Indexa (o reindexa, si ya existía) un producto."""
+        textos = tuple(normalizar(str(producto.get(campo) or "")) for campo in self.campos)
+        por_campo = tuple(tuple(trigramas(texto)) for texto in textos)
+        with self._lock:
+            self._quitar(producto_id)
+            self._docs[producto_id] = por_campo
+            self._textos[producto_id] = textos
+            for campo, tris in zip(self.campos, por_campo):
+                postings = self._postings[campo]
+                for trigrama in tris:
+                    postings[trigrama].add(producto_id)
+
+    actualizar = agregar
+
+    def eliminar(self, producto_id: int):
+        with self._lock:
+            self._quitar(producto_id)
+
+    def _quitar(self, producto_id: int):
+        anterior = self._docs.pop(producto_id, None)
+        self._textos.pop(producto_id, None)
+        if anterior is None:
+            return
+        for campo, tris in zip(self.campos, anterior):
+            postings = self._postings[campo]
+            for trigrama in tris:
+                ids = postings[trigrama]
+                ids.discard(producto_id)
+                if not ids:
+                    del postings[trigrama]
+
+    def reconstruir(self, productos: Iterable[dict]):
+        with self._lock:
+            for postings in self._postings.values():
+                postings.clear()
+            self._docs.clear()
+            self._textos.clear()
+        for producto in productos:
+            self.agregar(producto["id"], producto)
+
+    def buscar(self, consulta: str, limite: Optional[int] = None,
+               umbral: Optional[float] = None) -> List[Tuple[int, float]]:
+        """(id, puntaje): primero las coincidencias por subcadena, luego las aproximadas."""
+        texto = normalizar(consulta)
+        consulta_tri = trigramas(texto)
+        if not consulta_tri:
+            return []
+        umbral = self.umbral if umbral is None else umbral
+        mejores: Dict[int, float] = defaultdict(float)
+        with self._lock:
+            exactos = self._subcadena(texto)
+            for campo, peso in self.campos.items():
+                postings = self._postings[campo]
+                comunes: Dict[int, int] = defaultdict(int)
+                for trigrama in consulta_tri:
+                    for producto_id in postings.get(trigrama, ()):
+                        comunes[producto_id] += 1
+                for producto_id, n in comunes.items():
+                    puntaje = peso * n / len(consulta_tri)
+                    if puntaje > mejores[producto_id]:
+                        mejores[producto_id] = puntaje
+        primeros = sorted(exactos.items(), key=lambda r: (-r[1], r[0]))
+        aproximados = sorted(((producto_id, p) for producto_id, p in mejores.items()
+                              if p >= umbral and producto_id not in exactos), key=lambda r: (-r[1], r[0]))
+        resultados = [(producto_id, round(p, 4)) for producto_id, p in primeros + aproximados]
+        return resultados[:limite] if limite else resultados
+
+    def _subcadena(self, texto: str) -> Dict[int, float]:
+        """Ids (con el peso de su mejor campo) cuyo texto contiene la consulta; se llama con el lock tomado."""
+        # Candidatos: los que tienen todos los trigramas internos de las palabras de 3+ letras
+        filtro = set().union(*(_trigramas_internos(palabra) for palabra in texto.split()))
+        if filtro:
+            candidatos: Set[int] = set()
+            for postings in self._postings.values():
+                por_campo = [postings.get(t, ()) for t in filtro]
+                if all(por_campo):
+                    candidatos |= set.intersection(*map(set, por_campo))
+        else:
+            candidatos = set(self._textos)
+        encontrados: Dict[int, float] = {}
+        for producto_id in candidatos:
+            pesos = [peso for peso, campo in zip(self.campos.values(), self._textos[producto_id]) if texto in campo]
+            if pesos:
+                encontrados[producto_id] = max(pesos)
+        return encontrados
+
+    def memoria(self) -> dict:
+        """Tamaño del índice: entradas y bytes aproximados (sys.getsizeof de dicts, sets y claves)."""
+        with self._lock:
+            bytes_postings = sum(
+                sys.getsizeof(postings) + sum(sys.getsizeof(t) + sys.getsizeof(ids) for t, ids in postings.items())
+                for postings in self._postings.values())
+            bytes_docs = sys.getsizeof(self._docs) + sum(
+                sys.getsizeof(doc) + sum(sys.getsizeof(tris) for tris in doc) for doc in self._docs.values())
+            bytes_docs += sys.getsizeof(self._textos) + sum(
+                sys.getsizeof(textos) + sum(sys.getsizeof(t) for t in textos) for textos in self._textos.values())
+            return {
+                "productos": len(self._docs),
+                "trigramas": sum(len(postings) for postings in self._postings.values()),
+                "entradas": sum(len(ids) for postings in self._postings.values() for ids in postings.values()),
+                "bytes_aprox": bytes_postings + bytes_docs,
+            }
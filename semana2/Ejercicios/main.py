@@ -1,7 +1,16 @@
+import sys
+from pathlib import Path
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
 
+# El índice de trigramas está en comun/ (raíz del repositorio), compartido con las apps de semana3
+_RAIZ_REPO = str(Path(__file__).resolve().parents[2])
+if _RAIZ_REPO not in sys.path:
+    sys.path.append(_RAIZ_REPO)
+
+from comun.trigramas import IndiceTrigramas
+
 app = FastAPI(title="My Enhanced API - Week 2")
 
 # Modelos de datos
@@ -24,6 +33,8 @@ class ProductListResponse(BaseModel):
 
 # Almacenamiento temporal
 products = []
+# Índice de trigramas para búsqueda tolerante a errores (se actualiza al crear)
+search_index = IndiceTrigramas(campos={"name": 1.0})
 
 # Endpoints básicos
 @app.get("/")
@@ -42,6 +53,7 @@ def create_product(product: Product) -> ProductResponse:
     product_dict = product.dict()
     product_dict["id"] = len(products) + 1
     products.append(product_dict)
+    search_index.agregar(product_dict["id"], product_dict)
 
     return ProductResponse(**product_dict, message="Product created")
 
@@ -52,6 +64,10 @@ def get_product(product_id: int) -> dict:
             return {"product": product}
     raise HTTPException(status_code=404, detail="Product not found")
 
+@app.get("/search/stats")
+def search_index_stats() -> dict:
+    return search_index.memoria()
+
 @app.get("/search")
 def search_products(
     name: Optional[str] = None,
@@ -60,7 +76,8 @@ def search_products(
     results = products.copy()
 
     if name:
-        results = [p for p in results if name.lower() in p["name"].lower()]
+        # Ordenados por similitud; los ids son posiciones en la lista (id = índice + 1)
+        results = [products[product_id - 1] for product_id, _ in search_index.buscar(name)]
     if max_price:
         results = [p for p in results if p["price"] <= max_price]
 
@@ -3,6 +3,7 @@ from routers import users
 from typing import List, Dict
 from pydantic import BaseModel,root_validator
 from typing import Optional
+from services.trigramas import IndiceTrigramas
 from models.users import UserInDB, UserBase, UserUpdate,ProductListResponse,Product,ProductResponse,UserRegistration,Order,UserPreferences,User,ProductFilters
 from datetime import datetime
 import logging
@@ -25,6 +26,9 @@ def read_root():
     return {"message": "¡Bienvenido a la API de Gestión de Tareas Personales!"}
 
 products = []
+# Índice de trigramas por id para búsqueda tolerante a errores (se mantiene al crear/editar/borrar)
+products_by_id: Dict[int, dict] = {}
+search_index = IndiceTrigramas(campos={"name": 1.0})
 
 # Endpoint para ver todos los productos
 @app.get("/products")
@@ -132,7 +136,8 @@ def search_products(
     results = products.copy()
 
     if name:
-        results = [p for p in results if name.lower() in p["name"].lower()]
+        # Ordenados por similitud, sin recorrer todos los productos
+        results = [products_by_id[product_id] for product_id, _ in search_index.buscar(name)]
     if max_price:
         results = [p for p in results if p["price"] <= max_price]
     if available is not None:
@@ -148,6 +153,7 @@ def update_product(product_id: int, updated_product: Product) -> dict:
             product["name"] = updated_product.name
             product["price"] = updated_product.price
             product["available"] = updated_product.available
+            search_index.actualizar(product_id, product)
             return {"message": "Product updated", "product": product}
     return {"error": "Product not found"}
 
@@ -215,6 +221,8 @@ def create_product(product: dict):
     }
 
     products.append(new_product)
+    products_by_id[new_id] = new_product
+    search_index.agregar(new_id, new_product)
     logger.info(f"Producto creado exitosamente: ID {new_id}, Nombre: {new_product['name']}")
 
     return create_success_response(
@@ -229,6 +237,8 @@ def delete_product(product_id: int):
     for i, product in enumerate(products):
         if product["id"] == product_id:
             deleted_product = products.pop(i)
+            products_by_id.pop(product_id, None)
+            search_index.eliminar(product_id)
             return {"success": True, "message": f"Producto '{deleted_product['name']}' eliminado"}
 
     # Error: No encontrado
@@ -237,6 +247,13 @@ def delete_product(product_id: int):
         detail=f"No se puede eliminar: producto con ID {product_id} no existe"
     )
 
+@app.get("/search/stats")
+def search_index_stats():
+    return create_success_response(
+        message="Tamaño del índice de búsqueda",
+        data={"index": search_index.memoria()}
+    )
+
 @app.get("/products/search")
 def search_products(filters: ProductFilters = Depends()):
     # Simular base de datos
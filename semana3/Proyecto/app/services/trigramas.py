@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# El índice vive en comun/ (raíz del repositorio), compartido con las demás apps del curso
+_RAIZ_REPO = str(Path(__file__).resolve().parents[4])
+if _RAIZ_REPO not in sys.path:
+    sys.path.append(_RAIZ_REPO)
+
+from comun.trigramas import IndiceTrigramas, normalizar, trigramas  # noqa: E402,F401
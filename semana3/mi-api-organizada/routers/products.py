@@ -7,7 +7,8 @@ from models.product import (
 )
 from services.product_service import (
     get_all_products, get_product_by_id, create_product,
-    update_product, delete_product, filter_products
+    update_product, delete_product, filter_products,
+    get_search_index_stats
 )
 app = FastAPI(
     title="API de Inventario - Semana 3",
@@ -47,23 +48,15 @@ async def get_products(
     search: Optional[str] = Query(None, min_length=1, description="Buscar en nombre y descripción")
 ):
     try:
-        # Obtener productos filtrados
+        # Obtener productos filtrados (con búsqueda, ordenados por similitud)
         products = filter_products(
             category=category.value if category else None,
             in_stock=in_stock,
             min_price=min_price,
-            max_price=max_price
+            max_price=max_price,
+            search=search
         )
 
-        # Búsqueda por texto
-        if search:
-            search_lower = search.lower()
-            products = [
-                p for p in products
-                if search_lower in p["name"].lower() or
-                   (p["description"] and search_lower in p["description"].lower())
-            ]
-
         # Calcular paginación
         total = len(products)
         start_index = (page - 1) * page_size
@@ -83,6 +76,14 @@ async def get_products(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.get(
+    "/products/search/stats",
+    summary="Tamaño del índice de búsqueda",
+    description="Productos, trigramas y memoria aproximada del índice de búsqueda"
+)
+async def search_index_stats():
+    return get_search_index_stats()
+
 @app.get(
     "/products/{product_id}",
     response_model=ProductResponse,
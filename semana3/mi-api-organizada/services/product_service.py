@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Dict, List, Optional
 from models.Product_models import ProductResponse, CategoryEnum
+from services.trigramas import IndiceTrigramas
 # Simulamos una base de datos en memoria
 products_db: Dict[int, dict] = {
     1: {
@@ -38,6 +39,10 @@ products_db: Dict[int, dict] = {
     }
 }
 
+# Índice de trigramas sobre nombre y descripción (búsqueda tolerante a errores de tipeo)
+search_index = IndiceTrigramas(campos={"name": 1.0, "description": 0.8})
+search_index.reconstruir(products_db.values())
+
 # Counter para IDs autoincrementales
 next_id = 4
 
@@ -62,6 +67,7 @@ def create_product(product_data: dict) -> dict:
         "updated_at": None
     }
     products_db[product_id] = new_product
+    search_index.agregar(product_id, new_product)
     return new_product
 
 def update_product(product_id: int, product_data: dict) -> Optional[dict]:
@@ -72,22 +78,32 @@ def update_product(product_id: int, product_data: dict) -> Optional[dict]:
             "updated_at": datetime.now()
         }
         products_db[product_id] = updated_product
+        search_index.actualizar(product_id, updated_product)
         return updated_product
     return None
 
 def delete_product(product_id: int) -> bool:
     if product_id in products_db:
         del products_db[product_id]
+        search_index.eliminar(product_id)
         return True
     return False
 
+def search_products(query: str) -> List[dict]:
+    """Productos similares a `query` en nombre o descripción, del más al menos relevante."""
+    return [products_db[product_id] for product_id, _ in search_index.buscar(query)]
+
+def get_search_index_stats() -> dict:
+    return search_index.memoria()
+
 def filter_products(
     category: Optional[str] = None,
     in_stock: Optional[bool] = None,
     min_price: Optional[float] = None,
-    max_price: Optional[float] = None
+    max_price: Optional[float] = None,
+    search: Optional[str] = None
 ) -> List[dict]:
-    products = get_all_products()
+    products = search_products(search) if search else get_all_products()
 
     if category:
         products = [p for p in products if p["category"] == category]
@@ -0,0 +1,106 @@
+from typing import List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud_async, schemas
+from .database import get_async_db
+from comun.pagination import CursorInvalido
+
+# Mismos endpoints que main.py, pero `async def` sobre AsyncSession (DB_MODE=async)
+router = APIRouter()
+
+# -------------------------------
+# CRUD Categorías
+# -------------------------------
+@router.post("/categorias/", response_model=schemas.Categoria)
+async def crear_categoria_async(categoria: schemas.CategoriaCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.crear_categoria(db=db, categoria=categoria)
+
+@router.get("/categorias/", response_model=List[schemas.Categoria])
+async def listar_categorias_async(db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.obtener_categorias(db)
+
+@router.get("/categorias/{categoria_id}", response_model=schemas.CategoriaConProductos)
+async def obtener_categoria_async(categoria_id: int, db: AsyncSession = Depends(get_async_db)):
+    categoria = await crud_async.obtener_categoria_con_productos(db, categoria_id=categoria_id)
+    if categoria is None:
+        raise HTTPException(status_code=404, detail="Categoría no encontrada")
+    return categoria
+
+@router.get("/categorias/{categoria_id}/productos/")
+async def productos_por_categoria_async(categoria_id: int, db: AsyncSession = Depends(get_async_db)):
+    productos = await crud_async.obtener_productos_por_categoria(db, categoria_id=categoria_id)
+    return {
+        "categoria_id": categoria_id,
+        "productos": productos,
+        "total": len(productos)
+    }
+
+# -------------------------------
+# CRUD Productos
+# -------------------------------
+@router.post("/productos/", response_model=schemas.Producto)
+async def crear_producto_async(producto: schemas.ProductoCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await crud_async.crear_producto(db=db, producto=producto)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/productos/", response_model=Union[List[schemas.ProductoConCategoria], schemas.PaginaProductos])
+async def listar_productos_con_categoria_async(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (vacío = primera página)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if cursor is None:
+        return await crud_async.obtener_productos_con_categoria(db, skip=skip, limit=limit)
+    try:
+        items, next_cursor = await crud_async.obtener_productos_con_categoria_keyset(db, cursor=cursor, limit=limit)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/productos/buscar/")
+async def buscar_productos_async(
+    q: str = Query(..., min_length=1, description="Palabras o inicios de palabra en nombre, descripción o "
+                                                  "categoría; si no hay resultados se busca como subcadena "
+                                                  "(3+ caracteres)"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    productos, total = await crud_async.buscar_productos(db, busqueda=q, limit=limit, offset=offset)
+    return {
+        "busqueda": q,
+        "productos": productos,
+        "total": total
+    }
+
+@router.get("/productos/{producto_id}", response_model=schemas.Producto)
+async def obtener_producto_async(producto_id: int, db: AsyncSession = Depends(get_async_db)):
+    producto = await crud_async.obtener_producto(db, producto_id=producto_id)
+    if producto is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return producto
+
+@router.patch("/productos/{producto_id}", response_model=schemas.Producto)
+async def actualizar_producto_async(
+    producto_id: int,
+    producto: schemas.ProductoUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_producto = await crud_async.actualizar_producto(db, producto_id=producto_id, producto=producto)
+    if db_producto is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return db_producto
+
+@router.delete("/productos/{producto_id}")
+async def eliminar_producto_async(producto_id: int, db: AsyncSession = Depends(get_async_db)):
+    producto = await crud_async.eliminar_producto(db, producto_id=producto_id)
+    if producto is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return {"mensaje": f"Producto {producto_id} eliminado correctamente"}
@@ -1,9 +1,10 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from .main import app
 from .database import Base, get_db
+from .estadisticas import estadisticas_cache
 
 # 🔹 Base de datos en memoria (solo para pruebas)
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -11,7 +12,19 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+
+# pysqlite no emite BEGIN ni respeta SAVEPOINT dentro de la transacción externa
+# del fixture: receta de SQLAlchemy para que begin_nested() (bulk) haga rollback real
+@event.listens_for(engine, "connect")
+def _sin_transaccion_implicita(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def _begin_explicito(conn):
+    conn.exec_driver_sql("BEGIN")
+
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+estadisticas_cache.attach(TestingSessionLocal)
 
 # Crear todas las tablas en cada sesión de pruebas
 Base.metadata.create_all(bind=engine)
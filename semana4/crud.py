@@ -1,7 +1,9 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from fastapi import HTTPException
+from typing import Optional
 from . import models, schemas
+from comun.pagination import paginar_keyset
 
 # -------------------------------
 # Funciones CRUD para Categorías
@@ -48,6 +50,12 @@ def obtener_productos_con_categoria(db: Session, skip: int = 0, limit: int = 10)
     )
 
 
+def obtener_productos_con_categoria_keyset(db: Session, cursor: str = None, limit: int = 10):
+    """Productos con categoría paginados por id (cursor en lugar de offset)"""
+    query = db.query(models.Producto).options(joinedload(models.Producto.categoria))
+    return paginar_keyset(query, [models.Producto.id], cursor, limit)
+
+
 def obtener_productos_por_categoria(db: Session, categoria_id: int):
     """Obtener productos de una categoría específica"""
     return db.query(models.Producto).filter(
@@ -55,10 +63,18 @@ def obtener_productos_por_categoria(db: Session, categoria_id: int):
     ).all()
 
 
+def validar_producto_nuevo(producto: schemas.ProductoCreate):
+    """Regla de negocio de un producto nuevo; devuelve el mensaje de error o None"""
+    if producto.precio < 0:
+        return "El precio no puede ser negativo"
+    return None
+
+
 def crear_producto(db: Session, producto: schemas.ProductoCreate):
     """Crear un nuevo producto con validación de negocio"""
-    if producto.precio < 0:
-        raise HTTPException(status_code=400, detail="El precio no puede ser negativo")
+    error = validar_producto_nuevo(producto)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
     db_producto = models.Producto(**producto.dict())
     db.add(db_producto)
@@ -77,14 +93,38 @@ def obtener_productos(db: Session, skip: int = 0, limit: int = 10):
     return db.query(models.Producto).offset(skip).limit(limit).all()
 
 
-def buscar_productos(db: Session, busqueda: str):
-    """Buscar productos por nombre o descripción"""
-    return db.query(models.Producto).filter(
+def buscar_productos(db: Session, busqueda: str, limit: int = 20, offset: int = 0):
+    """
+    Buscar productos por nombre, descripción o nombre de su categoría (el índice
+    también la incluye), ordenados por relevancia. Coincide por palabra (la
+    última cuenta como prefijo) y, si no hay resultados, por subcadena dentro
+    de una palabra ("top" en "Laptop") con el índice de trigramas.
+    En motores sin índice de texto se busca con LIKE en nombre y descripción.
+    Devuelve (página, total de coincidencias).
+    """
+    encontrados = models.indice_productos.buscar(db, models.Producto, busqueda, limit=limit, offset=offset)
+    if encontrados is not None:
+        return encontrados
+    consulta = db.query(models.Producto).filter(
         or_(
             models.Producto.nombre.contains(busqueda),
             models.Producto.descripcion.contains(busqueda),
         )
-    ).all()
+    )
+    return consulta.order_by(models.Producto.id).offset(offset).limit(limit).all(), consulta.count()
+
+
+def consulta_export_productos(busqueda: Optional[str] = None):
+    """SELECT de columnas para exportar productos (con filtro de búsqueda opcional)"""
+    p, c = models.Producto, models.Categoria
+    stmt = (
+        select(p.id, p.nombre, p.precio, p.descripcion, p.categoria_id, c.nombre.label("categoria"))
+        .outerjoin(c, p.categoria_id == c.id)
+        .order_by(p.id)
+    )
+    if busqueda:
+        stmt = stmt.where(or_(p.nombre.contains(busqueda), p.descripcion.contains(busqueda)))
+    return stmt
 
 
 def actualizar_producto(db: Session, producto_id: int, producto: schemas.ProductoUpdate):
@@ -0,0 +1,119 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import crud, models, schemas
+from comun.pagination import decode_cursor, encode_cursor
+
+# Versiones async de crud.py. Con AsyncSession no hay lazy loading:
+# las relaciones que devuelve la API se cargan con selectinload.
+
+# -------------------------------
+# Funciones CRUD para Categorías
+# -------------------------------
+async def crear_categoria(db: AsyncSession, categoria: schemas.CategoriaCreate):
+    """Crear una nueva categoría"""
+    db_categoria = models.Categoria(**categoria.model_dump())
+    db.add(db_categoria)
+    await db.commit()
+    await db.refresh(db_categoria)
+    return db_categoria
+
+
+async def obtener_categorias(db: AsyncSession):
+    """Obtener todas las categorías"""
+    return (await db.scalars(select(models.Categoria))).all()
+
+
+async def obtener_categoria_con_productos(db: AsyncSession, categoria_id: int):
+    """Obtener categoría con sus productos"""
+    return await db.scalar(
+        select(models.Categoria)
+        .options(selectinload(models.Categoria.productos))
+        .where(models.Categoria.id == categoria_id)
+    )
+
+# -------------------------------
+# Funciones CRUD para Productos
+# -------------------------------
+async def obtener_productos_con_categoria(db: AsyncSession, skip: int = 0, limit: int = 10):
+    """Obtener productos con información de categoría"""
+    return (await db.scalars(
+        select(models.Producto)
+        .options(selectinload(models.Producto.categoria))
+        .offset(skip)
+        .limit(limit)
+    )).all()
+
+
+async def obtener_productos_con_categoria_keyset(db: AsyncSession, cursor: Optional[str] = None, limit: int = 10):
+    """Productos con categoría paginados por id (cursor en lugar de offset)"""
+    stmt = select(models.Producto).options(selectinload(models.Producto.categoria))
+    if cursor:
+        stmt = stmt.where(models.Producto.id > decode_cursor(cursor, [models.Producto.id])[0])
+    filas = (await db.scalars(stmt.order_by(models.Producto.id).limit(limit + 1))).all()
+    if len(filas) > limit:
+        filas = filas[:limit]
+        return filas, encode_cursor([filas[-1].id])
+    return filas, None
+
+
+async def obtener_productos_por_categoria(db: AsyncSession, categoria_id: int):
+    """Obtener productos de una categoría específica"""
+    return (await db.scalars(
+        select(models.Producto).where(models.Producto.categoria_id == categoria_id)
+    )).all()
+
+
+async def crear_producto(db: AsyncSession, producto: schemas.ProductoCreate):
+    """Crear un nuevo producto con validación de negocio"""
+    if producto.precio < 0:
+        raise HTTPException(status_code=400, detail="El precio no puede ser negativo")
+
+    db_producto = models.Producto(**producto.model_dump())
+    db.add(db_producto)
+    await db.commit()
+    await db.refresh(db_producto)
+    return db_producto
+
+
+async def obtener_producto(db: AsyncSession, producto_id: int):
+    """Obtener producto por ID"""
+    return await db.get(models.Producto, producto_id)
+
+
+async def buscar_productos(db: AsyncSession, busqueda: str, limit: int = 20, offset: int = 0):
+    """Buscar productos por relevancia (índice de texto completo): (página, total)"""
+    # La consulta FTS es SQL textual; se reutiliza la versión sync sobre la misma conexión
+    return await db.run_sync(crud.buscar_productos, busqueda, limit, offset)
+
+
+async def actualizar_producto(db: AsyncSession, producto_id: int, producto: schemas.ProductoUpdate):
+    """Actualizar producto existente"""
+    db_producto = await db.get(models.Producto, producto_id)
+    if db_producto:
+        update_data = producto.model_dump(exclude_unset=True)
+        if "precio" in update_data and update_data["precio"] < 0:
+            raise HTTPException(status_code=400, detail="El precio no puede ser negativo")
+        for field, value in update_data.items():
+            setattr(db_producto, field, value)
+        await db.commit()
+        await db.refresh(db_producto)
+    return db_producto
+
+
+async def eliminar_producto(db: AsyncSession, producto_id: int):
+    """Eliminar producto"""
+    db_producto = await db.get(models.Producto, producto_id)
+    if db_producto:
+        await db.delete(db_producto)
+        await db.commit()
+    return db_producto
+
+
+async def contar_productos(db: AsyncSession):
+    """Contar total de productos"""
+    return await db.scalar(select(func.count()).select_from(models.Producto))
@@ -1,9 +1,14 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 import os
 from dotenv import load_dotenv
 from . import models
+from .query_instrumentation import QueryInstrumentation
+from comun.pool_metrics import (POOL_AUTOSCALE, POOL_MAX_OVERFLOW, POOL_RECYCLE, POOL_SIZE, POOL_TIMEOUT,
+                                AsyncQueuePoolInstrumentado, PoolAutoscaler, PoolTelemetry, QueuePoolInstrumentado)
+from comun.routing import RoutingSession, crear_replicas
 
 
 # Cargar variables de entorno
@@ -12,14 +17,38 @@ load_dotenv()
 # URL de la base de datos
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fastapi_app.db")
 
-# Crear engine
+# Crear engine: pool instrumentado, pre_ping para descartar conexiones caídas y recycle
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Solo necesario para SQLite
+    connect_args={"check_same_thread": False},  # Solo necesario para SQLite
+    poolclass=QueuePoolInstrumentado,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=True,
 )
 
-# Crear sesión
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Telemetría del pool (espera por conexión, uso, edad, invalidaciones) y autoscaler opcional
+pool_telemetry = PoolTelemetry()
+pool_telemetry.attach(engine)
+pool_autoscaler = PoolAutoscaler(pool_telemetry)
+if POOL_AUTOSCALE:
+    pool_autoscaler.start()
+
+# Fingerprints SQL, sentencias por request y detección de N+1
+query_instrumentation = QueryInstrumentation(strict=os.getenv("N_PLUS_ONE_STRICT", "0") == "1")
+query_instrumentation.attach(engine)
+
+# Réplicas de lectura opcionales, ej: REPLICA_URLS="sqlite:///./replica1.db,sqlite:///./replica2.db"
+replicas = crear_replicas(os.getenv("REPLICA_URLS", ""), connect_args={"check_same_thread": False}
+                          if DATABASE_URL.startswith("sqlite") else {})
+for replica in replicas:
+    query_instrumentation.attach(replica)
+
+# Crear sesión: lecturas a las réplicas, escrituras al primario
+SessionLocal = sessionmaker(class_=RoutingSession, primary=engine, replicas=replicas,
+                            autocommit=False, autoflush=False)
 
 # Base para los modelos
 Base = declarative_base()
@@ -32,11 +61,59 @@ def get_db():
     finally:
         db.close()
 
-# En database.py - Para debugging SQL
-import logging
 
-logging.basicConfig()
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
+# -------------------------------
+# Ruta async (DB_MODE=async): AsyncSession sin ocupar hilos del threadpool
+# -------------------------------
+DB_MODE = os.getenv("DB_MODE", "sync")
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "mysql": "mysql+aiomysql"}
+
+
+def async_url(url: str) -> str:
+    """Misma base de datos con el driver async (aiosqlite, asyncpg o aiomysql)."""
+    esquema, resto = url.split("://", 1)
+    dialecto = esquema.split("+", 1)[0]
+    return f"{_ASYNC_DRIVERS.get(dialecto, esquema)}://{resto}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+# La concurrencia la limita el pool (capacidad de la BD), no el threadpool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+_async_engine = None
+_AsyncSessionLocal = None
 
-# Engine con echo para ver SQL queries
-engine = create_engine(DATABASE_URL, echo=True)
\ No newline at end of file
+
+class SesionInternaAsync(Session):
+    """Session síncrona que envuelve cada AsyncSession de la app (ahí se registran sus eventos)."""
+
+
+# Telemetría propia del pool async (se adjunta al crear el engine)
+async_pool_telemetry = PoolTelemetry()
+
+
+def get_async_engine():
+    """Engine async creado bajo demanda (el driver solo se importa si se usa)."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            poolclass=AsyncQueuePoolInstrumentado,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        # Los eventos de pool y de sentencias se registran sobre el engine síncrono interno
+        async_pool_telemetry.attach(_async_engine.sync_engine)
+        query_instrumentation.attach(_async_engine.sync_engine)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, class_=AsyncSession, expire_on_commit=False,
+                                                sync_session_class=SesionInternaAsync)
+    return _async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 import models, schemas
 from fastapi import HTTPException
 from typing import List
@@ -7,6 +7,8 @@ from sqlalchemy.exc import IntegrityError
 from passlib.context import CryptContext
 from sqlalchemy.sql import func
 from datetime import datetime
+from comun.pagination import paginar_keyset
+from prestamos import crear_prestamo
 
 # Configuración para hash de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -41,6 +43,11 @@ def get_users(db: Session, skip: int = 0, limit: int = 10):
     return db.query(models.User).offset(skip).limit(limit).all()
 
 
+# Listar usuarios por cursor (keyset sobre id)
+def get_users_keyset(db: Session, cursor: str = None, limit: int = 10):
+    return paginar_keyset(db.query(models.User), [models.User.id], cursor, limit)
+
+
 # Actualizar usuario
 def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -73,6 +80,18 @@ def create_libro(db: Session, libro: schemas.LibroCreate):
 def get_libros(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Libro).offset(skip).limit(limit).all()
 
+def consulta_export_libros():
+    """SELECT de columnas para exportar el catálogo de libros con su autor"""
+    l, a = models.Libro, models.Autor
+    return (
+        select(l.id, l.titulo, l.precio, l.paginas, l.is_available, l.autor_id, a.nombre.label("autor"))
+        .outerjoin(a, l.autor_id == a.id)
+        .order_by(l.id)
+    )
+
+def get_libros_keyset(db: Session, cursor: str = None, limit: int = 100):
+    return paginar_keyset(db.query(models.Libro), [models.Libro.id], cursor, limit)
+
 def get_libro(db: Session, libro_id: int):
     return db.query(models.Libro).filter(models.Libro.id == libro_id).first()
 
@@ -96,16 +115,28 @@ def delete_libro(db: Session, libro_id: int):
     return True
 
 # ------- BÚSQUEDAS --------
-def buscar_libros_por_titulo(db: Session, busqueda: str):
-    return db.query(models.Libro).filter(models.Libro.titulo.contains(busqueda)).all()
-
-def buscar_libros_por_autor(db: Session, nombre_autor: str):
-    return (
-        db.query(models.Libro)
-        .join(models.Autor)
-        .filter(models.Autor.nombre.contains(nombre_autor))
-        .all()
+def buscar_libros(db: Session, texto: str, columna: str = None, limit: int = 20, offset: int = 0):
+    """
+    Libros por relevancia en título y autor (o solo en `columna`) con el índice
+    de texto completo, que coincide por palabra (la última cuenta como prefijo)
+    y, si no hay resultados, por subcadena dentro de una palabra con el índice
+    de trigramas. En motores sin índice de texto se busca con LIKE.
+    Devuelve (página, total de coincidencias).
+    """
+    encontrados = models.indice_libros.buscar(db, models.Libro, texto, columna=columna, limit=limit, offset=offset)
+    if encontrados is not None:
+        return encontrados
+    filtros = {"titulo": models.Libro.titulo.contains(texto), "autor": models.Autor.nombre.contains(texto)}
+    consulta = db.query(models.Libro).outerjoin(models.Autor).filter(
+        filtros[columna] if columna else or_(*filtros.values())
     )
+    return consulta.order_by(models.Libro.id).offset(offset).limit(limit).all(), consulta.count()
+
+def buscar_libros_por_titulo(db: Session, busqueda: str, limit: int = 20, offset: int = 0):
+    return buscar_libros(db, busqueda, columna="titulo", limit=limit, offset=offset)
+
+def buscar_libros_por_autor(db: Session, nombre_autor: str, limit: int = 20, offset: int = 0):
+    return buscar_libros(db, nombre_autor, columna="autor", limit=limit, offset=offset)
 
 def obtener_libros_por_precio(db: Session, precio_min: float, precio_max: float):
     return (
@@ -132,30 +163,8 @@ def create_user(db: Session, user: schemas.UserCreate):
 
 
 def create_loan(db: Session, loan: schemas.LoanCreate):
-    # Verificar si el usuario tiene 3 préstamos activos
-    active_loans = db.query(models.Loan).filter(
-        models.Loan.user_id == loan.user_id,
-        models.Loan.is_returned == False
-    ).count()
-
-    if active_loans >= 3:
-        return None  # Máximo alcanzado
-
-    # Verificar si el libro ya está prestado
-    book_loan = db.query(models.Loan).filter(
-        models.Loan.book_id == loan.book_id,
-        models.Loan.is_returned == False
-    ).first()
-
-    if book_loan:
-        return False  # Libro no disponible
-
-    # Crear préstamo
-    db_loan = models.Loan(**loan.dict())
-    db.add(db_loan)
-    db.commit()
-    db.refresh(db_loan)
-    return db_loan
+    """Crea el préstamo de forma atómica; lanza PrestamoRechazado con la regla que falló."""
+    return crear_prestamo(db, loan.user_id, loan.book_id)
 
 
 # Devolver libro
@@ -180,4 +189,9 @@ def delete_loan(db: Session, loan_id: int):
 
 # Listar préstamos
 def get_loans(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.Loan).offset(skip).limit(limit).all()
\ No newline at end of file
+    return db.query(models.Loan).offset(skip).limit(limit).all()
+
+
+# Listar préstamos por cursor (keyset sobre id)
+def get_loans_keyset(db: Session, cursor: str = None, limit: int = 10):
+    return paginar_keyset(db.query(models.Loan), [models.Loan.id], cursor, limit)
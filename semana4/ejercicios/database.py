@@ -1,7 +1,16 @@
+import sys
+from pathlib import Path
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+# Los módulos compartidos entre las apps del curso (comun/) están en la raíz del repositorio;
+# este módulo es el primero que importan models, crud y main
+_RAIZ_REPO = str(Path(__file__).resolve().parents[2])
+if _RAIZ_REPO not in sys.path:
+    sys.path.append(_RAIZ_REPO)
+
 SQLALCHEMY_DATABASE_URL = "sqlite:///./libros.db"
 
 engine = create_engine(
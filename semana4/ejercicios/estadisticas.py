@@ -0,0 +1,149 @@
+from sqlalchemy import case, event, func, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+# Estadísticas de la librería mantenidas de forma incremental: cada alta, cambio
+# o baja de Libro/Autor actualiza la fila única de estadisticas_libreria dentro
+# de la misma transacción (si el flush se deshace, el ajuste también). Leer las
+# estadísticas es una consulta por clave primaria.
+
+E = models.EstadisticasLibreria
+FILA_ID = 1
+
+
+def _ajustar(connection, **valores):
+    # UPDATE atómico en SQL (total = total + 1...): correcto con escritores concurrentes
+    connection.execute(update(E).where(E.id == FILA_ID).values(**valores))
+
+
+def _sumar_libro(connection, precio):
+    valores = {"total_libros": E.total_libros + 1}
+    if precio is not None:
+        valores.update(
+            suma_precios=E.suma_precios + precio,
+            precio_min=case((E.precio_min.is_(None) | (E.precio_min > precio), precio), else_=E.precio_min),
+            precio_max=case((E.precio_max.is_(None) | (E.precio_max < precio), precio), else_=E.precio_max),
+        )
+    _ajustar(connection, **valores)
+
+
+def _restar_libro(connection, precio):
+    valores = {"total_libros": E.total_libros - 1}
+    if precio is not None:
+        # Si era el extremo no sabemos el siguiente: se recalcula al leer
+        valores.update(
+            suma_precios=E.suma_precios - precio,
+            min_pendiente=case((E.precio_min == precio, True), else_=E.min_pendiente),
+            max_pendiente=case((E.precio_max == precio, True), else_=E.max_pendiente),
+        )
+    _ajustar(connection, **valores)
+
+
+@event.listens_for(models.Libro, "after_insert")
+def _libro_insertado(mapper, connection, target):
+    _sumar_libro(connection, target.precio)
+
+
+@event.listens_for(models.Libro, "after_delete")
+def _libro_eliminado(mapper, connection, target):
+    _restar_libro(connection, target.precio)
+
+
+@event.listens_for(models.Libro, "after_update")
+def _libro_actualizado(mapper, connection, target):
+    historial = inspect(target).attrs.precio.history
+    if not historial.has_changes():
+        return
+    anterior = historial.deleted[0] if historial.deleted else None
+    _restar_libro(connection, anterior)
+    _sumar_libro(connection, target.precio)
+
+
+@event.listens_for(models.Autor, "after_insert")
+def _autor_insertado(mapper, connection, target):
+    _ajustar(connection, total_autores=E.total_autores + 1)
+
+
+@event.listens_for(models.Autor, "after_delete")
+def _autor_eliminado(mapper, connection, target):
+    _ajustar(connection, total_autores=E.total_autores - 1)
+
+
+def _escritura_masiva(orm_execute_state):
+    """
+    insert()/update()/delete() ejecutados con session.execute no pasan por los
+    eventos del mapper: las altas masivas (/libros/bulk) se suman por parámetros
+    y los update/delete masivos fuerzan un recálculo completo en la próxima lectura.
+    """
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in (models.Libro, models.Autor):
+        return
+    connection = orm_execute_state.session.connection()
+    filas = orm_execute_state.parameters
+    if orm_execute_state.is_insert and isinstance(filas, list):
+        for fila in filas:
+            if mapper.class_ is models.Libro:
+                _sumar_libro(connection, fila.get("precio"))
+            else:
+                _ajustar(connection, total_autores=E.total_autores + 1)
+    else:
+        connection.execute(E.__table__.delete().where(E.id == FILA_ID))
+
+
+def attach(session_factory):
+    """Registra el evento de escrituras masivas en las sesiones de `session_factory` (el SessionLocal de la app)."""
+    if not event.contains(session_factory, "do_orm_execute", _escritura_masiva):
+        event.listen(session_factory, "do_orm_execute", _escritura_masiva)
+
+
+def recalcular(db: Session) -> "models.EstadisticasLibreria":
+    """
+    Recalcula toda la fila desde las tablas (primera lectura o tras cambios masivos).
+    Si otra lectura concurrente insertó la fila primero, el INSERT choca con la
+    clave primaria: se deshace y se reintenta, esta vez como UPDATE.
+    """
+    for intento in range(2):
+        total, suma, minimo, maximo = db.execute(
+            select(func.count(models.Libro.id), func.coalesce(func.sum(models.Libro.precio), 0.0),
+                   func.min(models.Libro.precio), func.max(models.Libro.precio))
+        ).one()
+        autores = db.scalar(select(func.count(models.Autor.id)))
+        fila = db.get(E, FILA_ID) or E(id=FILA_ID)
+        fila.total_libros, fila.suma_precios = total, suma
+        fila.precio_min, fila.precio_max, fila.total_autores = minimo, maximo, autores
+        fila.min_pendiente = fila.max_pendiente = False
+        db.add(fila)
+        try:
+            db.commit()
+            return fila
+        except IntegrityError:
+            db.rollback()
+            if intento:
+                raise
+
+
+def obtener_estadisticas(db: Session) -> dict:
+    """Lectura O(1) por clave primaria; solo recalcula un extremo si se borró o cambió."""
+    fila = db.get(E, FILA_ID)
+    if fila is None:
+        fila = recalcular(db)
+    elif fila.min_pendiente or fila.max_pendiente:
+        if fila.min_pendiente:
+            fila.precio_min = db.scalar(select(func.min(models.Libro.precio)))
+        if fila.max_pendiente:
+            fila.precio_max = db.scalar(select(func.max(models.Libro.precio)))
+        fila.min_pendiente = fila.max_pendiente = False
+        db.commit()
+
+    total = fila.total_libros
+    return {
+        "total_libros": total,
+        "total_autores": fila.total_autores,
+        "precio_promedio": fila.suma_precios / total if total else 0,
+        "precio_mas_alto": fila.precio_max if total else 0,
+        "precio_mas_bajo": fila.precio_min if total else 0,
+    }
@@ -1,8 +1,13 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 import models, schemas, crud
 from database import SessionLocal, engine, get_db
-from typing import List
+from typing import List, Optional, Union
+from comun.pagination import CursorInvalido
+from comun.bulk import BulkInvalido, importar
+from comun.export import exportar
+from estadisticas import attach as attach_estadisticas, obtener_estadisticas
+from prestamos import PrestamoRechazado
 from crud import (
     get_user_by_email,
     create_user,
@@ -20,6 +25,9 @@ models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="CRUD de Libros")
 
+# Las altas/bajas masivas de las sesiones de la app mantienen la fila de estadísticas
+attach_estadisticas(SessionLocal)
+
 # Dependencia para obtener la sesión de BD
 def get_db():
     db = SessionLocal()
@@ -40,8 +48,21 @@ def crear_usuario(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return create_user(db, user)
 
 
-@app.get("/users/", response_model=List[schemas.User])
-def listar_usuarios(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+# Sin `cursor` se pagina por offset (lista); con `cursor` (vacío = primera página)
+# se pagina por clave y se devuelve {items, next_cursor}
+def _pagina_keyset(listar, db: Session, cursor: str, limit: int):
+    try:
+        items, next_cursor = listar(db, cursor=cursor, limit=limit)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@app.get("/users/", response_model=Union[List[schemas.User], schemas.PaginaUsers])
+def listar_usuarios(skip: int = 0, limit: int = Query(10, ge=1, le=10000), cursor: Optional[str] = None,
+                    db: Session = Depends(get_db)):
+    if cursor is not None:
+        return _pagina_keyset(crud.get_users_keyset, db, cursor, limit)
     return get_users(db, skip=skip, limit=limit)
 
 
@@ -97,34 +118,61 @@ def crear_libro(libro: schemas.LibroCreate, db: Session = Depends(get_db)):
     return crud.create_libro(db, libro)
 
 
-@app.get("/libros/", response_model=List[schemas.Libro])
-def listar_libros(db: Session = Depends(get_db)):
-    return crud.get_libros(db)
+@app.post("/libros/bulk")
+async def crear_libros_bulk(request: Request, db: Session = Depends(get_db)):
+    """Alta masiva de libros: array JSON o NDJSON, insertado por lotes con errores por fila."""
+    try:
+        return await importar(request, db, schemas.LibroCreate, models.Libro)
+    except BulkInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/libros/", response_model=Union[List[schemas.Libro], schemas.PaginaLibros])
+def listar_libros(skip: int = 0, limit: int = Query(100, ge=1, le=10000), cursor: Optional[str] = None,
+                  db: Session = Depends(get_db)):
+    if cursor is not None:
+        return _pagina_keyset(crud.get_libros_keyset, db, cursor, limit)
+    return crud.get_libros(db, skip=skip, limit=limit)
 
 @app.get("/libros/buscar/")
 def buscar_libros(
+    q: str = Query(None, description="Buscar en título y autor (por palabra o inicio de palabra; "
+                                     "si no hay resultados, como subcadena de 3+ caracteres)"),
     titulo: str = Query(None, description="Buscar por título"),
     autor: str = Query(None, description="Buscar por autor"),
     precio_min: float = Query(None, description="Precio mínimo"),
     precio_max: float = Query(None, description="Precio máximo"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
-    if titulo:
-        libros = crud.buscar_libros_por_titulo(db, titulo)
+    if q:
+        libros, total = crud.buscar_libros(db, q, limit=limit, offset=offset)
+    elif titulo:
+        libros, total = crud.buscar_libros_por_titulo(db, titulo, limit=limit, offset=offset)
     elif autor:
-        libros = crud.buscar_libros_por_autor(db, autor)
-    elif precio_min and precio_max:
-        libros = crud.obtener_libros_por_precio(db, precio_min, precio_max)
+        libros, total = crud.buscar_libros_por_autor(db, autor, limit=limit, offset=offset)
     else:
-        libros = db.query(models.Libro).all()
+        if precio_min and precio_max:
+            libros = crud.obtener_libros_por_precio(db, precio_min, precio_max)
+        else:
+            libros = db.query(models.Libro).all()
+        total = len(libros)
 
     return {
         "libros": libros,
-        "total": len(libros)
+        "total": total
     }
 
 
 
+@app.get("/libros/export")
+def exportar_libros(formato: str = Query("ndjson", description="ndjson o csv"), db: Session = Depends(get_db)):
+    """Catálogo completo en streaming (NDJSON o CSV) para los reportes nocturnos."""
+    stmt = crud.consulta_export_libros()
+    return exportar(db.get_bind(), stmt, "libros", formato)
+
+
 @app.get("/libros/{libro_id}", response_model=schemas.Libro)
 def obtener_libro(libro_id: int, db: Session = Depends(get_db)):
     db_libro = crud.get_libro(db, libro_id)
@@ -151,25 +199,8 @@ def eliminar_libro(libro_id: int, db: Session = Depends(get_db)):
 
 @app.get("/estadisticas/")
 def estadisticas_libros(db: Session = Depends(get_db)):
-    """Estadísticas básicas de la librería"""
-    total_libros = db.query(models.Libro).count()
-    total_autores = db.query(models.Autor).count()
-
-    if total_libros > 0:
-        precios = [libro.precio for libro in db.query(models.Libro).all()]
-        precio_promedio = sum(precios) / len(precios)
-        precio_max = max(precios)
-        precio_min = min(precios)
-    else:
-        precio_promedio = precio_max = precio_min = 0
-
-    return {
-        "total_libros": total_libros,
-        "total_autores": total_autores,
-        "precio_promedio": precio_promedio,
-        "precio_mas_alto": precio_max,
-        "precio_mas_bajo": precio_min
-    }
+    """Estadísticas básicas de la librería (fila mantenida por eventos, lectura O(1))"""
+    return obtener_estadisticas(db)
 
 # ------------------------
 # CRUD PRÉSTAMOS
@@ -177,14 +208,19 @@ def estadisticas_libros(db: Session = Depends(get_db)):
 
 @app.post("/loans/", response_model=schemas.Loan)
 def crear_prestamo(prestamo: schemas.LoanCreate, db: Session = Depends(get_db)):
-    loan = crud.create_loan(db, prestamo)
-    if not loan:
-        raise HTTPException(status_code=400, detail="No se pudo crear el préstamo")
-    return loan
-
-@app.get("/loans/", response_model=List[schemas.Loan])
-def listar_prestamos(db: Session = Depends(get_db)):
-    return crud.get_loans(db)
+    try:
+        return crud.create_loan(db, prestamo)
+    except PrestamoRechazado as e:
+        # 404 si falta el usuario/libro, 409 si se viola una regla de préstamo
+        status_code = 404 if e.regla.endswith("_inexistente") else 409
+        raise HTTPException(status_code=status_code, detail={"regla": e.regla, "mensaje": str(e)})
+
+@app.get("/loans/", response_model=Union[List[schemas.Loan], schemas.PaginaLoans])
+def listar_prestamos(skip: int = 0, limit: int = Query(10, ge=1, le=10000), cursor: Optional[str] = None,
+                     db: Session = Depends(get_db)):
+    if cursor is not None:
+        return _pagina_keyset(crud.get_loans_keyset, db, cursor, limit)
+    return crud.get_loans(db, skip=skip, limit=limit)
 
 @app.get("/loans/{loan_id}", response_model=schemas.Loan)
 def obtener_prestamo(loan_id: int, db: Session = Depends(get_db)):
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, DateTime, Index, event, false, func
 from sqlalchemy.orm import relationship
 from database import Base
+from comun.busqueda import Dependencia, IndiceBusqueda
 
 class Autor(Base):
     __tablename__ = "autores"
@@ -51,3 +52,47 @@ class Loan(Base):
     # Relaciones
     user = relationship("User", back_populates="loans")
     book = relationship("Libro", back_populates="loans")
+
+
+# Un solo préstamo activo por libro: índice único parcial (solo filas sin devolver).
+# Solo en motores con índices parciales; en otros sería un unique de book_id sin condición.
+uq_loans_libro_activo = Index(
+    "uq_loans_libro_activo", Loan.book_id, unique=True,
+    sqlite_where=Loan.is_returned == false(), postgresql_where=Loan.is_returned == false(),
+).ddl_if(dialect=("sqlite", "postgresql"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _crear_indice_prestamos(target, connection, **kw):
+    # create_all no agrega índices a tablas que ya existían (libros.db): se crea aquí si falta
+    if connection.dialect.name in ("sqlite", "postgresql"):
+        uq_loans_libro_activo.create(connection, checkfirst=True)
+
+
+class EstadisticasLibreria(Base):
+    """Fila única (id=1) con agregados de la librería mantenidos por eventos del ORM."""
+    __tablename__ = "estadisticas_libreria"
+
+    id = Column(Integer, primary_key=True)
+    total_libros = Column(Integer, nullable=False, default=0)
+    suma_precios = Column(Float, nullable=False, default=0.0)
+    precio_min = Column(Float, nullable=True)
+    precio_max = Column(Float, nullable=True)
+    total_autores = Column(Integer, nullable=False, default=0)
+    # Se borró/abarató el extremo: recalcular solo ese valor en la próxima lectura
+    min_pendiente = Column(Boolean, nullable=False, default=False)
+    max_pendiente = Column(Boolean, nullable=False, default=False)
+
+
+# Índice de texto completo de libros (FTS5 en SQLite, tsvector en PostgreSQL).
+# Se crea con create_all y lo mantienen triggers; renombrar un autor reindexa sus libros.
+indice_libros = IndiceBusqueda(
+    "libros",
+    columnas={
+        "titulo": "{fila}.titulo",
+        "autor": "(SELECT nombre FROM autores WHERE autores.id = {fila}.autor_id)",
+    },
+    pesos=(5.0, 2.0),
+    dependencias=[Dependencia("autores", fk="autor_id", columnas=["nombre"])],
+)
+indice_libros.registrar(Base.metadata)
@@ -0,0 +1,76 @@
+import os
+
+from sqlalchemy import exists, false, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+# Préstamos activos (sin devolver) permitidos por usuario
+MAX_PRESTAMOS_ACTIVOS = int(os.getenv("MAX_PRESTAMOS_ACTIVOS", "3"))
+
+L = models.Loan
+
+
+class PrestamoRechazado(ValueError):
+    """El préstamo viola una regla; `regla` indica cuál."""
+
+    MENSAJES = {
+        "usuario_inexistente": "El usuario no existe",
+        "libro_inexistente": "El libro no existe",
+        "limite_usuario": f"El usuario ya tiene {MAX_PRESTAMOS_ACTIVOS} préstamos activos",
+        "libro_prestado": "El libro ya está prestado",
+    }
+
+    def __init__(self, regla: str):
+        self.regla = regla
+        super().__init__(self.MENSAJES[regla])
+
+
+def _activos(user_id: int):
+    return select(func.count(L.id)).where(L.user_id == user_id, L.is_returned == false())
+
+
+def crear_prestamo(db: Session, user_id: int, book_id: int) -> "models.Loan":
+    """
+    Crea el préstamo en una transacción y un solo INSERT ... SELECT condicional:
+    el límite por usuario va en el WHERE (se evalúa junto con el insert) y el
+    "un préstamo activo por libro" lo garantiza el índice único parcial
+    uq_loans_libro_activo, así dos requests concurrentes no pueden prestar el
+    mismo libro. En SQLite el insert toma el lock de escritura y serializa la
+    verificación; en PostgreSQL se bloquea antes la fila del usuario
+    (SELECT ... FOR UPDATE) para que el conteo no se lea en paralelo.
+    Solo si el insert no entra se consulta cuál regla falló.
+    """
+    try:
+        if db.get_bind().dialect.name != "sqlite":
+            db.execute(select(models.User.id).where(models.User.id == user_id).with_for_update())
+        condicion = (
+            exists().where(models.User.id == user_id)
+            & exists().where(models.Libro.id == book_id)
+            & (_activos(user_id).scalar_subquery() < MAX_PRESTAMOS_ACTIVOS)
+        )
+        stmt = (
+            insert(L)
+            .from_select(["user_id", "book_id", "is_returned"],
+                         select(literal(user_id), literal(book_id), false()).where(condicion))
+            .returning(L.id)
+        )
+        loan_id = db.execute(stmt).scalar()
+        if loan_id is None:
+            db.rollback()
+            raise PrestamoRechazado(_regla_fallida(db, user_id))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise PrestamoRechazado("libro_prestado") from None
+    return db.get(L, loan_id)
+
+
+def _regla_fallida(db: Session, user_id: int) -> str:
+    # Camino de error: una consulta por regla, en el orden en que se informan
+    if db.get(models.User, user_id) is None:
+        return "usuario_inexistente"
+    if db.scalar(_activos(user_id)) >= MAX_PRESTAMOS_ACTIVOS:
+        return "limite_usuario"
+    return "libro_inexistente"
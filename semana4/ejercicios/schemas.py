@@ -145,4 +145,17 @@ class Loan(LoanBase):
     is_returned: bool
 
     class Config:
-        from_attributes = True        
\ No newline at end of file
+        from_attributes = True        
+
+# Respuestas paginadas por cursor
+class PaginaUsers(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None
+
+class PaginaLibros(BaseModel):
+    items: List[Libro]
+    next_cursor: Optional[str] = None
+
+class PaginaLoans(BaseModel):
+    items: List[Loan]
+    next_cursor: Optional[str] = None
@@ -49,3 +49,125 @@ def test_delete_libro():
     assert response.status_code == 200
     check = client.get(f"/libros/{libro_id}")
     assert check.status_code == 404
+
+def test_get_libros_con_cursor():
+    autor_id = client.post("/autores/", json={"nombre": "Autor Cursor", "nacionalidad": "Chilena"}).json()["id"]
+    creados = [client.post("/libros/", json={"titulo": f"Cursor {i}", "precio": 10 + i, "paginas": 100,
+                                              "autor_id": autor_id}).json()["id"] for i in range(5)]
+    vistos, cursor = [], ""
+    while cursor is not None:
+        pagina = client.get("/libros/", params={"cursor": cursor, "limit": 2}).json()
+        vistos += [l["id"] for l in pagina["items"]]
+        cursor = pagina["next_cursor"]
+    # Recorre todo en orden de id, sin repetir y pasando por los libros recién creados
+    assert vistos == sorted(set(vistos))
+    assert vistos[-len(creados):] == creados
+
+def test_get_libros_cursor_o_limit_invalidos():
+    # [null] y [[]] son base64/JSON válidos pero no son un id
+    for cursor in ("no-es-un-cursor", "W251bGxd", "W1tdXQ"):
+        assert client.get("/libros/", params={"cursor": cursor}).status_code == 400
+    for limit in (0, -1):
+        assert client.get("/libros/", params={"cursor": "", "limit": limit}).status_code == 422
+
+def test_bulk_libros_json_y_ndjson():
+    filas = [
+        {"titulo": "Bulk A", "precio": 10, "paginas": 100},
+        {"titulo": "Bulk B", "precio": 0, "paginas": 100},
+        {"titulo": "Bulk C", "precio": 12, "paginas": 120},
+    ]
+    data = client.post("/libros/bulk", json=filas).json()
+    assert (data["insertados"], data["con_error"]) == (2, 1)
+    assert data["errores"][0]["fila"] == 2
+
+    ndjson = '{"titulo": "Bulk D", "precio": 5, "paginas": 50}\n{"titulo": ""}\n'
+    data = client.post("/libros/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"}).json()
+    assert (data["total"], data["insertados"], data["con_error"]) == (2, 1, 1)
+
+def test_export_libros_csv():
+    response = client.get("/libros/export", params={"formato": "csv"})
+    assert response.status_code == 200
+    lineas = response.text.splitlines()
+    assert lineas[0] == "id,titulo,precio,paginas,is_available,autor_id,autor"
+    assert len(lineas) - 1 == len(client.get("/libros/", params={"limit": 10000}).json())
+
+def _estadisticas_esperadas():
+    libros = client.get("/libros/", params={"limit": 10000}).json()
+    precios = [l["precio"] for l in libros]
+    return len(libros), max(precios), min(precios), sum(precios) / len(precios)
+
+def test_estadisticas_incrementales():
+    client.get("/estadisticas/")  # crea la fila; desde aquí la mantienen los eventos
+    autor_id = client.post("/autores/", json={"nombre": "Autora Stats", "nacionalidad": "Chilena"}).json()["id"]
+    caro = client.post("/libros/", json={"titulo": "Caro", "precio": 9999, "paginas": 10, "autor_id": autor_id}).json()
+    barato = client.post("/libros/", json={"titulo": "Barato", "precio": 0.01, "paginas": 10}).json()
+    client.post("/libros/bulk", json=[{"titulo": "Bulk Stats", "precio": 33, "paginas": 10}])
+
+    stats = client.get("/estadisticas/").json()
+    total, maximo, minimo, promedio = _estadisticas_esperadas()
+    assert (stats["total_libros"], stats["precio_mas_alto"], stats["precio_mas_bajo"]) == (total, maximo, minimo)
+    assert abs(stats["precio_promedio"] - promedio) < 1e-6
+    assert stats["total_autores"] == len(client.get("/autores/").json())
+
+    # Borrar y abaratar los extremos: min/max se recalculan en la siguiente lectura
+    client.delete(f"/libros/{barato['id']}")
+    client.put(f"/libros/{caro['id']}", json={"precio": 1})
+    stats = client.get("/estadisticas/").json()
+    total, maximo, minimo, promedio = _estadisticas_esperadas()
+    assert (stats["total_libros"], stats["precio_mas_alto"], stats["precio_mas_bajo"]) == (total, maximo, minimo)
+    assert abs(stats["precio_promedio"] - promedio) < 1e-6
+
+def test_estadisticas_primera_lectura_concurrente(tmp_path):
+    import threading
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    import estadisticas, models
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    Sesion = sessionmaker(bind=engine)
+    # Ambas lecturas ven la tabla vacía antes de que cualquiera confirme su INSERT
+    barrera, esperando = threading.Barrier(2, timeout=5), threading.local()
+
+    @event.listens_for(Sesion, "before_commit")
+    def _sincronizar(session):
+        if not getattr(esperando, "hecho", False):
+            esperando.hecho = True
+            barrera.wait()
+
+    resultados, errores = [], []
+
+    def leer():
+        try:
+            with Sesion() as db:
+                resultados.append(estadisticas.obtener_estadisticas(db)["total_libros"])
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=leer) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert errores == [] and resultados == [0, 0]
+
+
+def test_buscar_libros_fts():
+    autor_id = client.post("/autores/", json={"nombre": "Gabriel García Márquez", "nacionalidad": "Colombiana"}).json()["id"]
+    libro = client.post("/libros/", json={"titulo": "Crónica de una muerte anunciada", "precio": 20, "paginas": 120,
+                                          "autor_id": autor_id}).json()
+
+    # Sin acentos y con la última palabra como prefijo
+    data = client.get("/libros/buscar/", params={"q": "garcia cron"}).json()
+    assert [l["id"] for l in data["libros"]] == [libro["id"]]
+    assert client.get("/libros/buscar/", params={"autor": "marq"}).json()["total"] >= 1
+    # Subcadena en medio de una palabra: se resuelve con el índice de trigramas
+    assert libro["id"] in [l["id"] for l in client.get("/libros/buscar/", params={"titulo": "nunciada"}).json()["libros"]]
+    assert libro["id"] in [l["id"] for l in client.get("/libros/buscar/", params={"autor": "rquez"}).json()["libros"]]
+    # El filtro por título no busca en el autor
+    assert libro["id"] not in [l["id"] for l in client.get("/libros/buscar/", params={"titulo": "garcia"}).json()["libros"]]
+
+    client.put(f"/libros/{libro['id']}", json={"titulo": "Cien años de soledad"})
+    assert libro["id"] not in [l["id"] for l in client.get("/libros/buscar/", params={"q": "cronica"}).json()["libros"]]
+    pagina = client.get("/libros/buscar/", params={"titulo": "soledad", "limit": 1}).json()
+    assert len(pagina["libros"]) == 1 and pagina["total"] >= 1
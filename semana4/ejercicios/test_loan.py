@@ -1,40 +1,129 @@
+import uuid
+
+import pytest
 from fastapi.testclient import TestClient
 from main import app
 
 client = TestClient(app)
 
-def test_create_loan():
-    users = client.get("/users/").json()
-    libros = client.get("/libros/").json()
-    assert users and libros, "Debe haber al menos un usuario y un libro"
+def _usuario_y_libro():
+    # Datos propios de cada test: no dependen del orden ni de lo que ya tenga libros.db
+    sufijo = uuid.uuid4().hex[:8]
+    user = client.post("/users/", json={"email": f"loan_{sufijo}@example.com", "username": f"loan_{sufijo}",
+                                        "password": "secret123"}).json()
+    libro = client.post("/libros/", json={"titulo": f"Libro {sufijo}", "precio": 10, "paginas": 100}).json()
+    return user["id"], libro["id"]
+
+def _ids_prestamos():
+    return [l["id"] for l in client.get("/loans/", params={"limit": 10000}).json()]
+
+@pytest.fixture()
+def crear_prestamo():
+    """Crea préstamos propios del test y al terminar borra los que sigan existiendo."""
+    creados = []
 
+    def crear():
+        user_id, book_id = _usuario_y_libro()
+        response = client.post("/loans/", json={"user_id": user_id, "book_id": book_id})
+        assert response.status_code == 200
+        creados.append(response.json()["id"])
+        return response.json()
+
+    yield crear
+    existentes = set(_ids_prestamos())
+    for loan_id in creados:
+        if loan_id in existentes:
+            client.delete(f"/loans/{loan_id}")
+
+def test_create_loan():
+    user_id, book_id = _usuario_y_libro()
     response = client.post("/loans/", json={
-        "user_id": users[0]["id"],
-        "book_id": libros[0]["id"]
+        "user_id": user_id,
+        "book_id": book_id
     })
     assert response.status_code == 200
     data = response.json()
-    assert data["user_id"] == users[0]["id"]
-    assert data["book_id"] == libros[0]["id"]
+    assert data["user_id"] == user_id
+    assert data["book_id"] == book_id
     assert data["is_returned"] is False
+    client.delete(f"/loans/{data['id']}")
 
 def test_get_loans():
     response = client.get("/loans/")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
-def test_return_loan():
-    loans = client.get("/loans/").json()
-    loan_id = loans[0]["id"]
+def test_get_loans_con_cursor(crear_prestamo):
+    creados = [crear_prestamo()["id"] for _ in range(3)]
+    vistos, cursor = [], ""
+    while cursor is not None:
+        pagina = client.get("/loans/", params={"cursor": cursor, "limit": 2}).json()
+        vistos += [l["id"] for l in pagina["items"]]
+        cursor = pagina["next_cursor"]
+    # En orden de id, sin repetir y pasando por los préstamos recién creados
+    assert vistos == sorted(set(vistos))
+    assert vistos[-len(creados):] == creados
+
+def test_return_loan(crear_prestamo):
+    loan_id = crear_prestamo()["id"]
     response = client.put(f"/loans/{loan_id}/return")
     assert response.status_code == 200
     assert response.json()["is_returned"] is True
 
-def test_delete_loan():
-    loans = client.get("/loans/").json()
-    loan_id = loans[-1]["id"]
+def test_delete_loan(crear_prestamo):
+    loan_id = crear_prestamo()["id"]
     response = client.delete(f"/loans/{loan_id}")
     assert response.status_code == 200
-    check = client.get("/loans/").json()
-    ids = [loan["id"] for loan in check]
-    assert loan_id not in ids
+    assert loan_id not in _ids_prestamos()
+
+def test_prestamos_concurrentes_respetan_reglas(tmp_path):
+    # SQLite en archivo (no en memoria) para que cada hilo use su propia conexión
+    import threading
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import models
+    from prestamos import MAX_PRESTAMOS_ACTIVOS, PrestamoRechazado, crear_prestamo
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'prestamos.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    models.Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    with Sesion() as db:
+        db.add_all([models.User(email=f"u{i}@x.com", username=f"u{i}", hashed_password="x") for i in range(12)])
+        db.add_all([models.Libro(titulo=f"Libro {i}", precio=10, paginas=10) for i in range(12)])
+        db.commit()
+
+    def correr(pedidos):
+        resultados, barrera, lock = [], threading.Barrier(len(pedidos)), threading.Lock()
+
+        def pedir(user_id, book_id):
+            barrera.wait()
+            with Sesion() as db:
+                try:
+                    crear_prestamo(db, user_id, book_id)
+                    resultado = "ok"
+                except PrestamoRechazado as e:
+                    resultado = e.regla
+            with lock:
+                resultados.append(resultado)
+
+        hilos = [threading.Thread(target=pedir, args=p) for p in pedidos]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return resultados
+
+    # 11 usuarios piden el mismo libro a la vez: se presta una sola vez
+    resultados = correr([(user_id, 1) for user_id in range(1, 12)])
+    assert resultados.count("ok") == 1 and resultados.count("libro_prestado") == 10
+
+    # Otro usuario pide 11 libros distintos a la vez: solo entran MAX_PRESTAMOS_ACTIVOS
+    resultados = correr([(12, book_id) for book_id in range(2, 13)])
+    assert resultados.count("ok") == MAX_PRESTAMOS_ACTIVOS
+    assert resultados.count("limite_usuario") == 11 - MAX_PRESTAMOS_ACTIVOS
+
+    with pytest.raises(PrestamoRechazado) as error, Sesion() as db:
+        crear_prestamo(db, 1, 999)
+    assert error.value.regla == "libro_inexistente"
+    engine.dispose()
@@ -53,3 +53,15 @@ def test_delete_user():
     assert response.status_code == 200
     check = client.get(f"/users/{user_id}")
     assert check.status_code == 404
+
+def test_get_users_con_cursor():
+    todos = [u["id"] for u in client.get("/users/", params={"limit": 1000}).json()]
+    vistos, cursor = [], ""
+    while cursor is not None:
+        pagina = client.get("/users/", params={"cursor": cursor, "limit": 2}).json()
+        vistos += [u["id"] for u in pagina["items"]]
+        cursor = pagina["next_cursor"]
+    assert vistos == sorted(todos)
+
+def test_get_users_cursor_invalido():
+    assert client.get("/users/", params={"cursor": "no-es-un-cursor"}).status_code == 400
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import Integer, case, cast, event, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Segundos de vida del resultado cacheado (red de seguridad para escrituras fuera del ORM
+# o de otros procesos; las escrituras del ORM en este proceso invalidan al instante)
+ESTADISTICAS_CACHE_TTL = float(os.getenv("ESTADISTICAS_CACHE_TTL", "300"))
+MAX_BUCKETS = 50
+
+
+def _resumen(fila) -> Dict[str, Any]:
+    total, promedio, maximo, minimo = fila
+    return {
+        "total": total,
+        "precio_promedio": promedio or 0,
+        "precio_max": maximo or 0,
+        "precio_min": minimo or 0,
+    }
+
+
+def calcular_estadisticas(db: Session, por_categoria: bool = False, buckets: int = 0) -> Dict[str, Any]:
+    """
+    Estadísticas de precios calculadas en la base de datos: un solo SELECT con
+    COUNT/AVG/MAX/MIN (más uno agrupado por categoria_id y otro para el
+    histograma si se piden), sin traer filas de productos a Python.
+    """
+    p = models.Producto
+    agregados = (func.count(p.id), func.avg(p.precio), func.max(p.precio), func.min(p.precio))
+    resultado = _resumen(db.execute(select(*agregados)).one())
+
+    if por_categoria:
+        filas = db.execute(select(p.categoria_id, *agregados).group_by(p.categoria_id).order_by(p.categoria_id))
+        resultado["por_categoria"] = [{"categoria_id": fila[0], **_resumen(fila[1:])} for fila in filas]
+
+    if buckets:
+        resultado["histograma"] = _histograma(db, resultado["precio_min"], resultado["precio_max"],
+                                              resultado["total"], buckets)
+    return resultado
+
+
+def _histograma(db: Session, minimo: float, maximo: float, total: int, buckets: int):
+    """Histograma de precios de ancho fijo: el bucket de cada fila se calcula en SQL."""
+    if not total:
+        return []
+    ancho = (maximo - minimo) / buckets or 1
+    p = models.Producto
+    # floor explícito: CAST a entero redondea en PostgreSQL/MySQL (solo trunca en SQLite);
+    # el máximo cae en el último bucket
+    indice = cast(func.floor((p.precio - minimo) / ancho), Integer)
+    bucket = case((indice >= buckets, buckets - 1), else_=indice).label("bucket")
+    conteos = dict(db.execute(select(bucket, func.count()).group_by(bucket)).all())
+    return [
+        {"desde": round(minimo + i * ancho, 2), "hasta": round(minimo + (i + 1) * ancho, 2),
+         "total": conteos.get(i, 0)}
+        for i in range(buckets)
+    ]
+
+
+class EstadisticasCache:
+    """
+    Cache en memoria de las estadísticas por (por_categoria, buckets).
+    Se invalida cuando se confirma (after_commit) una sesión que escribió
+    productos, ya sea por flush del ORM o por insert/update/delete masivo
+    (como /productos/bulk). Invalidar en el commit, y no en el flush, evita
+    cachear un resultado que no ve la escritura todavía sin confirmar.
+    Solo se escuchan las sesiones de las fábricas registradas con `attach`.
+    """
+
+    def __init__(self, ttl: float = ESTADISTICAS_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._datos: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, db: Session, por_categoria: bool = False, buckets: int = 0) -> Dict[str, Any]:
+        clave = (por_categoria, buckets)
+        with self._lock:
+            guardado = self._datos.get(clave)
+            version = self.version
+            if guardado is not None and guardado[0] == version and time.monotonic() - guardado[1] < self.ttl:
+                self.hits += 1
+                return guardado[2]
+            self.misses += 1
+        resultado = calcular_estadisticas(db, por_categoria=por_categoria, buckets=buckets)
+        with self._lock:
+            # Si hubo una invalidación mientras se calculaba, no se guarda un dato viejo
+            if self.version == version:
+                self._datos[clave] = (version, time.monotonic(), resultado)
+        return resultado
+
+    def invalidar(self):
+        with self._lock:
+            self.version += 1
+            self._datos.clear()
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"version": self.version, "entradas": len(self._datos), "hits": self.hits,
+                    "misses": self.misses}
+
+    def attach(self, session_factory):
+        """Escucha las escrituras de productos de las sesiones de `session_factory` (sessionmaker o clase)."""
+        if event.contains(session_factory, "after_commit", self._invalidar_al_confirmar):
+            return
+        event.listen(session_factory, "after_flush", _marcar_flush)
+        event.listen(session_factory, "do_orm_execute", _marcar_escritura_masiva)
+        event.listen(session_factory, "after_commit", self._invalidar_al_confirmar)
+        event.listen(session_factory, "after_transaction_end", _descartar)
+
+    def _invalidar_al_confirmar(self, session):
+        if session.info.pop("productos_modificados", False):
+            self.invalidar()
+
+
+estadisticas_cache = EstadisticasCache()
+
+
+def _toca_productos(objetos) -> bool:
+    return any(isinstance(obj, models.Producto) for obj in objetos)
+
+
+def _marcar_flush(session, flush_context):
+    if _toca_productos(session.new) or _toca_productos(session.dirty) or _toca_productos(session.deleted):
+        session.info["productos_modificados"] = True
+
+
+def _marcar_escritura_masiva(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is models.Producto:
+        orm_execute_state.session.info["productos_modificados"] = True
+
+
+def _descartar(session, transaction):
+    # Fin de la transacción raíz (commit ya procesado o rollback): la marca no pasa a la siguiente.
+    # Los savepoints que se deshacen (reintentos del bulk) no borran la marca del lote que sí entró.
+    if transaction.parent is None:
+        session.info.pop("productos_modificados", None)
@@ -1,33 +1,72 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from . import models, schemas, crud
-from .database import SessionLocal, engine, get_db
-from typing import List
+from .database import (SessionLocal, SesionInternaAsync, engine, get_db, query_instrumentation, DB_MODE,
+                       pool_autoscaler, pool_telemetry, async_pool_telemetry)
+from .async_routes import router as async_router
+from comun.bulkhead import en_bulkhead, get_bulkhead, metricas_bulkheads
+from comun.bulk import BulkInvalido, importar
+from comun.export import exportar
+from .estadisticas import MAX_BUCKETS, estadisticas_cache
+from comun.pagination import CursorInvalido
+from comun.routing import registrar_pin_primario
+from typing import List, Optional, Union
 
 # Crear tablas
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="API Productos Mejorada")
 
+# La cache de estadísticas se invalida con los commits de las sesiones de la app (sync y async)
+estadisticas_cache.attach(SessionLocal)
+estadisticas_cache.attach(SesionInternaAsync)
+
+# Tras una escritura, el cliente lee del primario unos segundos (cookie)
+registrar_pin_primario(app)
+
+# CRUD de categorías y productos: versión sync (Session) o async (AsyncSession, DB_MODE=async).
+# Se registra solo una de las dos al final del módulo, así ninguna tapa a la otra
+sync_router = APIRouter()
+
+
+# Sentencias SQL por request (headers X-DB-Queries / X-DB-Time-ms) y N+1
+@app.middleware("http")
+async def contar_consultas(request: Request, call_next):
+    with query_instrumentation.request_scope(f"{request.method} {request.url.path}") as queries:
+        response = await call_next(request)
+    response.headers["X-DB-Queries"] = str(queries.statements)
+    response.headers["X-DB-Time-ms"] = f"{queries.total_ms:.2f}"
+    return response
+
 # -------------------------------
 # CRUD Categorías
 # -------------------------------
-@app.post("/categorias/", response_model=schemas.Categoria)
+@sync_router.post("/categorias/", response_model=schemas.Categoria, dependencies=[en_bulkhead("escrituras")])
 def crear_categoria(categoria: schemas.CategoriaCreate, db: Session = Depends(get_db)):
     return crud.crear_categoria(db=db, categoria=categoria)
 
-@app.get("/categorias/", response_model=List[schemas.Categoria])
+@app.post("/categorias/bulk")
+async def crear_categorias_bulk(request: Request, db: Session = Depends(get_db)):
+    """Alta masiva: array JSON o NDJSON (Content-Type: application/x-ndjson)."""
+    try:
+        return await importar(request, db, schemas.CategoriaCreate, models.Categoria,
+                              ejecutar=get_bulkhead("escrituras").run)
+    except BulkInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@sync_router.get("/categorias/", response_model=List[schemas.Categoria], dependencies=[en_bulkhead("lecturas")])
 def listar_categorias(db: Session = Depends(get_db)):
     return crud.obtener_categorias(db)
 
-@app.get("/categorias/{categoria_id}", response_model=schemas.CategoriaConProductos)
+@sync_router.get("/categorias/{categoria_id}", response_model=schemas.CategoriaConProductos,
+         dependencies=[en_bulkhead("lecturas")])
 def obtener_categoria(categoria_id: int, db: Session = Depends(get_db)):
     categoria = crud.obtener_categoria_con_productos(db, categoria_id=categoria_id)
     if categoria is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     return categoria
 
-@app.get("/categorias/{categoria_id}/productos/")
+@sync_router.get("/categorias/{categoria_id}/productos/", dependencies=[en_bulkhead("lecturas")])
 def productos_por_categoria(categoria_id: int, db: Session = Depends(get_db)):
     productos = crud.obtener_productos_por_categoria(db, categoria_id=categoria_id)
     return {
@@ -39,41 +78,73 @@ def productos_por_categoria(categoria_id: int, db: Session = Depends(get_db)):
 # -------------------------------
 # CRUD Productos
 # -------------------------------
-@app.post("/productos/", response_model=schemas.Producto)
+@sync_router.post("/productos/", response_model=schemas.Producto, dependencies=[en_bulkhead("escrituras")])
 def crear_producto(producto: schemas.ProductoCreate, db: Session = Depends(get_db)):
     try:
         return crud.crear_producto(db=db, producto=producto)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/productos/", response_model=List[schemas.ProductoConCategoria])
+@app.post("/productos/bulk")
+async def crear_productos_bulk(request: Request, db: Session = Depends(get_db)):
+    """Alta masiva: array JSON o NDJSON, validado e insertado por lotes con errores por fila."""
+    try:
+        return await importar(request, db, schemas.ProductoCreate, models.Producto,
+                              validar=crud.validar_producto_nuevo, ejecutar=get_bulkhead("escrituras").run)
+    except BulkInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@sync_router.get("/productos/", response_model=Union[List[schemas.ProductoConCategoria], schemas.PaginaProductos],
+         dependencies=[en_bulkhead("lecturas")])
 def listar_productos_con_categoria(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (vacío = primera página)"),
     db: Session = Depends(get_db)
 ):
-    return crud.obtener_productos_con_categoria(db, skip=skip, limit=limit)
+    # Sin cursor se mantiene la paginación por offset (respuesta en lista)
+    if cursor is None:
+        return crud.obtener_productos_con_categoria(db, skip=skip, limit=limit)
+    try:
+        items, next_cursor = crud.obtener_productos_con_categoria_keyset(db, cursor=cursor, limit=limit)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
-@app.get("/productos/buscar/")
+@sync_router.get("/productos/buscar/", dependencies=[en_bulkhead("lecturas")])
 def buscar_productos(
-    q: str = Query(..., min_length=1, description="Término de búsqueda"),
+    q: str = Query(..., min_length=1, description="Palabras o inicios de palabra en nombre, descripción o "
+                                                  "categoría; si no hay resultados se busca como subcadena "
+                                                  "(3+ caracteres)"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
-    productos = crud.buscar_productos(db, busqueda=q)
+    productos, total = crud.buscar_productos(db, busqueda=q, limit=limit, offset=offset)
     return {
         "busqueda": q,
         "productos": productos,
-        "total": len(productos)
+        "total": total
     }
 
-@app.get("/productos/{producto_id}", response_model=schemas.Producto)
+@app.get("/productos/export")
+def exportar_productos(
+    formato: str = Query("ndjson", description="ndjson o csv"),
+    q: Optional[str] = Query(None, description="Filtro opcional por nombre o descripción"),
+    db: Session = Depends(get_db)
+):
+    """Catálogo completo en streaming (NDJSON o CSV), con memoria acotada"""
+    stmt = crud.consulta_export_productos(busqueda=q)
+    return exportar(db.get_bind(clause=stmt), stmt, "productos", formato)
+
+@sync_router.get("/productos/{producto_id}", response_model=schemas.Producto, dependencies=[en_bulkhead("lecturas")])
 def obtener_producto(producto_id: int, db: Session = Depends(get_db)):
     producto = crud.obtener_producto(db, producto_id=producto_id)
     if producto is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     return producto
 
-@app.patch("/productos/{producto_id}", response_model=schemas.Producto)
+@sync_router.patch("/productos/{producto_id}", response_model=schemas.Producto, dependencies=[en_bulkhead("escrituras")])
 def actualizar_producto(
     producto_id: int,
     producto: schemas.ProductoUpdate,
@@ -84,7 +155,7 @@ def actualizar_producto(
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     return db_producto
 
-@app.delete("/productos/{producto_id}")
+@sync_router.delete("/productos/{producto_id}", dependencies=[en_bulkhead("escrituras")])
 def eliminar_producto(producto_id: int, db: Session = Depends(get_db)):
     producto = crud.eliminar_producto(db, producto_id=producto_id)
     if producto is None:
@@ -94,21 +165,31 @@ def eliminar_producto(producto_id: int, db: Session = Depends(get_db)):
 # -------------------------------
 # Estadísticas
 # -------------------------------
-@app.get("/productos/stats/resumen")
-def estadisticas_productos(db: Session = Depends(get_db)):
-    total = crud.contar_productos(db)
-    productos = crud.obtener_productos(db, limit=total)
+@app.get("/productos/stats/resumen", dependencies=[en_bulkhead("reportes")])
+def estadisticas_productos(
+    por_categoria: bool = Query(False, description="Agregar también por categoria_id"),
+    buckets: int = Query(0, ge=0, le=MAX_BUCKETS, description="Buckets del histograma de precios (0 = sin histograma)"),
+    db: Session = Depends(get_db)
+):
+    return estadisticas_cache.obtener(db, por_categoria=por_categoria, buckets=buckets)
+
+# -------------------------------
+# Métricas de bulkheads
+# -------------------------------
+@app.get("/metrics/bulkheads")
+async def metricas_de_bulkheads():
+    return metricas_bulkheads()
 
-    if not productos:
-        return {"total": 0, "precio_promedio": 0, "precio_max": 0, "precio_min": 0}
+@app.get("/metrics/sql")
+def metricas_sql(limit: int = 20):
+    return query_instrumentation.snapshot(limit=limit)
 
-    precios = [p.precio for p in productos]
-    return {
-        "total": total,
-        "precio_promedio": sum(precios) / len(precios),
-        "precio_max": max(precios),
-        "precio_min": min(precios)
-    }
+@app.get("/metrics/pool")
+async def metricas_pool():
+    return {**pool_telemetry.snapshot(), "autoscaler": pool_autoscaler.estado(),
+            "async": async_pool_telemetry.snapshot() if async_pool_telemetry.engine is not None else None}
+
+app.include_router(async_router if DB_MODE == "async" else sync_router)
 
 # -------------------------------
 # Run server
@@ -3,6 +3,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from comun.busqueda import Dependencia, IndiceBusqueda
 from .database import Base
 
 # ------------------------
@@ -63,3 +64,18 @@ class Producto(Base):
 
     # Relación con categoría
     categoria = relationship("Categoria", back_populates="productos")
+
+
+# Índice de texto completo de productos (FTS5 en SQLite, tsvector en PostgreSQL).
+# Se crea con create_all y lo mantienen triggers; el nombre de categoría se reindexa si cambia.
+indice_productos = IndiceBusqueda(
+    "productos",
+    columnas={
+        "nombre": "{fila}.nombre",
+        "descripcion": "{fila}.descripcion",
+        "categoria": "(SELECT nombre FROM categorias WHERE categorias.id = {fila}.categoria_id)",
+    },
+    pesos=(10.0, 3.0, 1.0),
+    dependencias=[Dependencia("categorias", fk="categoria_id", columnas=["nombre"])],
+)
+indice_productos.registrar(Base.metadata)
@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+# Repeticiones del mismo fingerprint en un request para marcarlo como N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+class NPlusOneError(RuntimeError):
+    """Se lanza en modo estricto cuando un request repite la misma consulta N veces."""
+
+
+def fingerprint(statement: str) -> str:
+    """SQL normalizado: sin literales, con listas IN colapsadas y espacios unificados."""
+    normalizado = _SPACES.sub(" ", _LITERALS.sub("?", statement)).strip()
+    return _IN_LIST.sub("IN (...)", normalizado.replace("%s", "?"))
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+class FingerprintStats:
+    __slots__ = ("sql", "count", "total_ms", "max_ms", "samples", "n_plus_one")
+
+    def __init__(self, sql: str, max_samples: int):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: deque = deque(maxlen=max_samples)  # ventana para percentiles
+        self.n_plus_one = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordenados = sorted(self.samples)
+        return {
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "p50_ms": round(_percentil(ordenados, 0.50), 3),
+            "p95_ms": round(_percentil(ordenados, 0.95), 3),
+            "p99_ms": round(_percentil(ordenados, 0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "n_plus_one_requests": self.n_plus_one,
+        }
+
+
+class RequestQueries:
+    """Sentencias ejecutadas durante un request (objeto mutable compartido con el threadpool)."""
+
+    __slots__ = ("nombre", "statements", "total_ms", "por_fingerprint")
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.statements = 0
+        self.total_ms = 0.0
+        self.por_fingerprint: Dict[str, int] = {}
+
+
+_request_actual: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def current_request_queries() -> Optional[RequestQueries]:
+    return _request_actual.get()
+
+
+class QueryInstrumentation:
+    """
+    Instrumenta un engine con before/after_cursor_execute: agrupa las sentencias
+    por fingerprint (conteo, tiempo total y percentiles), cuenta sentencias por
+    request y marca como N+1 los fingerprints SELECT que se repiten al menos
+    `threshold` veces en el mismo request (típico de relaciones lazy en un loop).
+    """
+
+    def __init__(self, threshold: int = N_PLUS_ONE_THRESHOLD, strict: bool = False,
+                 max_fingerprints: int = 1000, max_samples: int = 500, max_events: int = 50):
+        self.threshold = threshold
+        self.strict = strict
+        self.max_fingerprints = max_fingerprints
+        self.max_samples = max_samples
+        self.stats: Dict[str, FingerprintStats] = {}
+        self.n_plus_one_events: deque = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("instrumentation_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            start = conn.info["instrumentation_start"].pop()
+            self.record(statement, (time.perf_counter() - start) * 1000)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(exception_context):
+            # La sentencia falló: no habrá after_cursor_execute
+            conn = exception_context.connection
+            if conn is not None and conn.info.get("instrumentation_start"):
+                conn.info["instrumentation_start"].pop()
+
+    def record(self, statement: str, duration_ms: float):
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                if len(self.stats) >= self.max_fingerprints:
+                    stats = None
+                else:
+                    stats = self.stats[key] = FingerprintStats(key, self.max_samples)
+            if stats is not None:
+                stats.count += 1
+                stats.total_ms += duration_ms
+                stats.max_ms = max(stats.max_ms, duration_ms)
+                stats.samples.append(duration_ms)
+        req = _request_actual.get()
+        if req is not None:
+            req.statements += 1
+            req.total_ms += duration_ms
+            req.por_fingerprint[key] = req.por_fingerprint.get(key, 0) + 1
+
+    # --- por request ---
+    @contextmanager
+    def request_scope(self, nombre: str):
+        req = RequestQueries(nombre)
+        token = _request_actual.set(req)
+        try:
+            yield req
+        finally:
+            _request_actual.reset(token)
+        self._revisar_n_plus_one(req)
+
+    def _revisar_n_plus_one(self, req: RequestQueries):
+        sospechosos = [(sql, n) for sql, n in req.por_fingerprint.items()
+                       if n >= self.threshold and sql.lstrip().upper().startswith("SELECT")]
+        if not sospechosos:
+            return
+        for sql, n in sospechosos:
+            event_ = {"timestamp": time.time(), "request": req.nombre, "repeticiones": n, "sql": sql}
+            with self._lock:
+                self.n_plus_one_events.append(event_)
+                if sql in self.stats:
+                    self.stats[sql].n_plus_one += 1
+            print(f"⚠️  Posible N+1 en {req.nombre}: {n} veces -> {sql[:120]}")
+        if self.strict:
+            sql, n = max(sospechosos, key=lambda s: s[1])
+            raise NPlusOneError(f"N+1 en {req.nombre}: la misma consulta se ejecutó {n} veces:\n{sql}")
+
+    # --- métricas ---
+    def snapshot(self, limit: int = 20, order_by: str = "total_ms") -> Dict[str, Any]:
+        with self._lock:
+            filas = [s.to_dict() for s in self.stats.values()]
+            eventos = list(self.n_plus_one_events)
+        filas.sort(key=lambda f: f.get(order_by, 0), reverse=True)
+        return {
+            "fingerprints": len(filas),
+            "statements": sum(f["count"] for f in filas),
+            "top": filas[:limit],
+            "n_plus_one_threshold": self.threshold,
+            "n_plus_one_events": eventos,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.n_plus_one_events.clear()
@@ -62,6 +62,11 @@ class ProductoConCategoria(Producto):
         from_attributes = True
 
 
+class PaginaProductos(BaseModel):
+    items: List[ProductoConCategoria]
+    next_cursor: Optional[str] = None
+
+
 class CategoriaConProductos(Categoria):
     productos: List[Producto] = []
 
@@ -0,0 +1,103 @@
+import anyio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from .async_routes import router
+from .database import Base, async_url, get_async_db
+
+
+def _cliente_async(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    Base.metadata.create_all(create_engine(url))
+    engine = create_async_engine(async_url(url), pool_size=2, max_overflow=0)
+    Sesion = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with Sesion() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return TestClient(app)
+
+
+def test_async_url_cambia_solo_el_driver():
+    assert async_url("sqlite:///./fastapi_app.db") == "sqlite+aiosqlite:///./fastapi_app.db"
+    assert async_url("postgresql+psycopg2://u@h/db") == "postgresql+asyncpg://u@h/db"
+    assert async_url("mysql+pymysql://root@localhost/x") == "mysql+aiomysql://root@localhost/x"
+
+
+def test_crud_async_de_productos(tmp_path):
+    client = _cliente_async(tmp_path)
+    categoria = client.post("/categorias/", json={"nombre": "Hogar", "descripcion": "Casa"}).json()
+    for i in range(3):
+        response = client.post("/productos/", json={
+            "nombre": f"Lámpara {i}", "precio": 10.0 + i, "descripcion": "Luz", "categoria_id": categoria["id"]})
+        assert response.status_code == 200
+
+    productos = client.get("/productos/").json()
+    assert [p["categoria"]["nombre"] for p in productos] == ["Hogar"] * 3
+
+    pagina = client.get("/productos/", params={"cursor": "", "limit": 2}).json()
+    siguiente = client.get("/productos/", params={"cursor": pagina["next_cursor"], "limit": 2}).json()
+    assert [p["nombre"] for p in pagina["items"] + siguiente["items"]] == [f"Lámpara {i}" for i in range(3)]
+
+    assert len(client.get(f"/categorias/{categoria['id']}").json()["productos"]) == 3
+    producto_id = productos[0]["id"]
+    assert client.patch(f"/productos/{producto_id}", json={"precio": 99.0}).json()["precio"] == 99.0
+    assert client.patch(f"/productos/{producto_id}", json={"precio": -1}).status_code == 400
+    assert client.delete(f"/productos/{producto_id}").status_code == 200
+    assert client.get(f"/productos/{producto_id}").status_code == 404
+
+
+def test_requests_concurrentes_limitados_por_el_pool(tmp_path):
+    """Con pool_size=2 y sin overflow, 20 requests concurrentes esperan conexión sin usar hilos."""
+    client = _cliente_async(tmp_path)
+    client.post("/categorias/", json={"nombre": "A", "descripcion": "a"})
+
+    async def main():
+        import httpx
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            respuestas = []
+
+            async def pedir():
+                respuestas.append((await ac.get("/categorias/")).status_code)
+
+            async with anyio.create_task_group() as tg:
+                for _ in range(20):
+                    tg.start_soon(pedir)
+            return respuestas
+
+    assert anyio.run(main) == [200] * 20
+
+
+
+def _app_en_modo(monkeypatch, modo):
+    """Importa una copia de main.py con el DB_MODE indicado (sin tocar la app de los demás tests)."""
+    import importlib.util
+    from pathlib import Path
+    from . import database
+
+    monkeypatch.setattr(database, "DB_MODE", modo)
+    spec = importlib.util.spec_from_file_location(f"{__package__}._main_{modo}", Path(__file__).with_name("main.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def test_la_app_registra_una_sola_version_de_cada_ruta(monkeypatch):
+    for modo in ("sync", "async"):
+        modulo = _app_en_modo(monkeypatch, modo)
+        esperado = router if modo == "async" else modulo.sync_router
+        otro = modulo.sync_router if modo == "async" else router
+        assert {r.path for r in esperado.routes} == {r.path for r in otro.routes}
+        # Cada operación del OpenAPI la atiende el endpoint de la versión elegida
+        operaciones = {(metodo.upper(), ruta): op["operationId"]
+                       for ruta, ops in modulo.app.openapi()["paths"].items() for metodo, op in ops.items()}
+        for r in esperado.routes:
+            for metodo in r.methods:
+                assert operaciones[(metodo, r.path)] == r.unique_id
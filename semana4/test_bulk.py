@@ -0,0 +1,80 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from comun import bulk
+
+
+def test_bulk_productos_array_json_con_errores_por_fila(client: TestClient):
+    filas = [{"nombre": f"Producto {i}", "precio": 10.0 + i, "descripcion": "importado"} for i in range(5)]
+    filas.insert(2, {"nombre": "  ", "precio": 1.0, "descripcion": "x"})
+    filas.append({"nombre": "Negativo", "precio": -1, "descripcion": "x"})
+
+    response = client.post("/productos/bulk", json=filas)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["total"], data["insertados"], data["con_error"]) == (7, 5, 2)
+    assert [e["fila"] for e in data["errores"]] == [3, 7]
+    assert data["errores"][1]["error"] == "El precio no puede ser negativo"
+
+    nombres = [p["nombre"] for p in client.get("/productos/", params={"limit": 100}).json()]
+    assert "Producto 4" in nombres and "Negativo" not in nombres
+
+
+def test_bulk_categorias_ndjson_por_lotes(client: TestClient, monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_CHUNK_SIZE", 2)
+    client.post("/categorias/", json={"nombre": "Existente", "descripcion": "x"})
+    lineas = [json.dumps({"nombre": f"Cat {i}", "descripcion": "x"}) for i in range(4)]
+    lineas.insert(1, json.dumps({"nombre": "Existente", "descripcion": "duplicada"}))
+    lineas.append("{no es json")
+
+    response = client.post("/categorias/bulk", content="\n".join(lineas) + "\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    data = response.json()
+    # La duplicada hace fallar su lote: se reintenta fila a fila y solo ella queda con error
+    assert (data["total"], data["insertados"], data["con_error"]) == (6, 4, 2)
+    assert [e["fila"] for e in data["errores"]] == [2, 6]
+    assert len(client.get("/categorias/").json()) == 5
+
+
+def test_bulk_cuerpo_invalido(client: TestClient):
+    assert client.post("/productos/bulk", json={"nombre": "x"}).status_code == 400
+
+
+def test_bulk_lee_el_siguiente_lote_mientras_escribe(db_session):
+    import anyio
+    from starlette.concurrency import run_in_threadpool
+    from starlette.requests import Request
+
+    from . import models, schemas
+
+    lineas = [json.dumps({"nombre": f"Solapada {i}", "descripcion": "x"}).encode() + b"\n" for i in range(6)]
+
+    async def receive():
+        await anyio.sleep(0.01)  # el cuerpo llega de a poco, como desde la red
+        linea = lineas.pop(0)
+        return {"type": "http.request", "body": linea, "more_body": bool(lineas)}
+
+    request = Request({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/x-ndjson")]},
+                      receive)
+    eventos = []
+
+    def validar(item):
+        eventos.append("lee")
+
+    async def ejecutar(func, *args):
+        eventos.append("escribe")
+        await anyio.sleep(0.05)
+        await run_in_threadpool(func, *args)
+        eventos.append("fin")
+
+    async def importar():
+        return await bulk.importar(request, db_session, schemas.CategoriaCreate, models.Categoria,
+                                   validar=validar, chunk_size=2, ejecutar=ejecutar)
+
+    data = anyio.run(importar)
+    assert (data["total"], data["insertados"], data["con_error"]) == (6, 6, 0)
+    # Mientras se escribe el primer lote ya se están leyendo filas del siguiente
+    primera = eventos.index("escribe")
+    assert "lee" in eventos[primera:eventos.index("fin")]
+    assert eventos.count("escribe") == 3
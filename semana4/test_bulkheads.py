@@ -0,0 +1,73 @@
+import threading
+import time
+
+import anyio
+from fastapi.testclient import TestClient
+
+from comun.bulkhead import Bulkhead
+
+
+def test_bulkhead_saturado_no_bloquea_otros():
+    """Un bulkhead lleno encola sus propias tareas sin afectar a los demás."""
+    reportes = Bulkhead("reportes_test", 1)
+    lecturas = Bulkhead("lecturas_test", 1)
+    liberar = threading.Event()
+    tiempos = {}
+
+    def reporte_lento():
+        liberar.wait(2)
+
+    def lectura_rapida():
+        tiempos["lectura"] = time.perf_counter()
+
+    async def main():
+        inicio = time.perf_counter()
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(reportes.run, reporte_lento)
+            tg.start_soon(reportes.run, reporte_lento)
+            await anyio.sleep(0.05)
+            assert reportes.metricas()["en_cola"] == 1
+
+            await lecturas.run(lectura_rapida)
+            tiempos["inicio"] = inicio
+            liberar.set()
+
+    anyio.run(main)
+
+    assert tiempos["lectura"] - tiempos["inicio"] < 1
+    assert reportes.metricas()["max_en_cola"] == 1
+    assert reportes.metricas()["total_llamadas"] == 2
+
+
+def test_metricas_de_bulkheads(client: TestClient):
+    client.post("/categorias/", json={"nombre": "Jardín", "descripcion": "Plantas"})
+    client.get("/productos/stats/resumen")
+
+    response = client.get("/metrics/bulkheads")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["escrituras"]["total_llamadas"] >= 1
+    assert data["reportes"]["capacidad"] > 0
+
+
+def test_el_token_cubre_las_dependencias_del_request():
+    """Las dependencias síncronas (get_db, auth...) se resuelven con el token del bulkhead tomado."""
+    from fastapi import Depends, FastAPI
+
+    from comun.bulkhead import en_bulkhead, get_bulkhead
+
+    vistos = []
+
+    def dependencia_sync():
+        vistos.append(get_bulkhead("deps_test").metricas()["en_uso"])
+
+    app = FastAPI()
+
+    @app.get("/x", dependencies=[en_bulkhead("deps_test")])
+    def endpoint(_=Depends(dependencia_sync)):
+        vistos.append(get_bulkhead("deps_test").metricas()["en_uso"])
+        return {}
+
+    assert TestClient(app).get("/x").status_code == 200
+    assert vistos == [1, 1]
+    assert get_bulkhead("deps_test").metricas()["en_uso"] == 0
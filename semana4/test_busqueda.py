@@ -0,0 +1,67 @@
+from fastapi.testclient import TestClient
+
+from . import models
+
+
+def _buscar(client, q, **params):
+    return client.get("/productos/buscar/", params={"q": q, **params}).json()
+
+
+def test_busqueda_fts_ranking_prefijo_y_paginacion(client: TestClient):
+    categoria_id = client.post("/categorias/", json={"nombre": "Electrónica", "descripcion": "x"}).json()["id"]
+    client.post("/productos/bulk", json=[
+        {"nombre": "Funda", "precio": 5.0, "descripcion": "Protege tu laptop", "categoria_id": categoria_id},
+        {"nombre": "Laptop Gamer", "precio": 900.0, "descripcion": "Portátil potente", "categoria_id": categoria_id},
+        {"nombre": "Canción", "precio": 1.0, "descripcion": "Música"},
+    ])
+
+    # La última palabra es prefijo y el nombre pesa más que la descripción
+    data = _buscar(client, "lap")
+    assert data["total"] == 2
+    assert [p["nombre"] for p in data["productos"]] == ["Laptop Gamer", "Funda"]
+    pagina = _buscar(client, "lap", limit=1, offset=1)
+    assert pagina["total"] == 2 and [p["nombre"] for p in pagina["productos"]] == ["Funda"]
+
+    # Sin distinguir acentos; el nombre de la categoría también se indexa
+    assert _buscar(client, "cancion")["total"] == 1
+    assert _buscar(client, "electronica portatil")["total"] == 1
+    # La sintaxis FTS del usuario no rompe la consulta
+    assert _buscar(client, '"; OR * (')["total"] == 0
+    # Subcadena en medio de una palabra: la palabra no coincide y se usa el índice de trigramas
+    assert {p["nombre"] for p in _buscar(client, "aptop")["productos"]} == {"Laptop Gamer", "Funda"}
+    assert [p["nombre"] for p in _buscar(client, "amer")["productos"]] == ["Laptop Gamer"]
+    # Menos de 3 caracteres no se buscan como subcadena (no hay trigramas que filtren)
+    assert _buscar(client, "pt")["total"] == 0
+
+
+def test_indice_anterior_sin_trigramas_se_completa(db_session):
+    db_session.add(models.Producto(nombre="Laptop Gamer", precio=900.0, descripcion="x"))
+    db_session.flush()
+    conn = db_session.connection()
+    # Índice de una versión anterior: sin tabla de trigramas
+    conn.exec_driver_sql("DROP TABLE productos_fts_tri")
+    models.indice_productos.backend("sqlite").crear(conn)
+    assert models.indice_productos.buscar(db_session, models.Producto, "amer")[1] == 1
+    # Los triggers recreados mantienen las dos tablas
+    db_session.add(models.Producto(nombre="Gamepad", precio=30.0, descripcion="x"))
+    db_session.flush()
+    assert models.indice_productos.buscar(db_session, models.Producto, "amepa")[1] == 1
+
+
+def test_busqueda_se_mantiene_con_escrituras(client: TestClient, db_session):
+    categoria_id = client.post("/categorias/", json={"nombre": "Audio", "descripcion": "x"}).json()["id"]
+    producto = client.post("/productos/", json={"nombre": "Parlante", "precio": 50.0, "descripcion": "x",
+                                                "categoria_id": categoria_id}).json()
+    assert _buscar(client, "parlante")["total"] == 1
+
+    client.patch(f"/productos/{producto['id']}", json={"nombre": "Audífonos"})
+    assert _buscar(client, "parlante")["total"] == 0
+    assert _buscar(client, "audifonos")["total"] == 1
+
+    # Renombrar la categoría reindexa sus productos (trigger de la tabla relacionada)
+    db_session.get(models.Categoria, categoria_id).nombre = "Sonido"
+    db_session.commit()
+    assert _buscar(client, "sonido")["total"] == 1
+
+    client.delete(f"/productos/{producto['id']}")
+    assert _buscar(client, "audifonos")["total"] == 0
@@ -0,0 +1,78 @@
+from fastapi.testclient import TestClient
+
+from .estadisticas import estadisticas_cache
+
+
+def _crear(client, nombre, precio, categoria_id=None):
+    client.post("/productos/", json={"nombre": nombre, "precio": precio, "descripcion": "x",
+                                     "categoria_id": categoria_id})
+
+
+def test_estadisticas_en_sql_con_grupos_e_histograma(client: TestClient):
+    estadisticas_cache.invalidar()
+    categoria_id = client.post("/categorias/", json={"nombre": "Audio", "descripcion": "x"}).json()["id"]
+    for nombre, precio in (("A", 10.0), ("B", 20.0), ("C", 30.0)):
+        _crear(client, nombre, precio, categoria_id)
+    _crear(client, "D", 110.0)
+
+    data = client.get("/productos/stats/resumen", params={"por_categoria": True, "buckets": 4}).json()
+    assert (data["total"], data["precio_min"], data["precio_max"], data["precio_promedio"]) == (4, 10.0, 110.0, 42.5)
+    grupos = {g["categoria_id"]: g for g in data["por_categoria"]}
+    assert grupos[categoria_id]["total"] == 3 and grupos[categoria_id]["precio_promedio"] == 20.0
+    assert grupos[None]["total"] == 1
+    assert [b["total"] for b in data["histograma"]] == [3, 0, 0, 1]
+    assert data["histograma"][0] == {"desde": 10.0, "hasta": 35.0, "total": 3}
+
+
+def test_histograma_no_redondea_al_bucket_siguiente(client: TestClient):
+    estadisticas_cache.invalidar()
+    # Ancho 25: 20 y 70 están en la mitad superior de sus buckets (0 y 2)
+    for nombre, precio in (("A", 0.0), ("B", 20.0), ("C", 70.0), ("D", 100.0)):
+        _crear(client, nombre, precio)
+    data = client.get("/productos/stats/resumen", params={"buckets": 4}).json()
+    assert [b["total"] for b in data["histograma"]] == [2, 0, 1, 1]
+
+
+def test_cache_se_invalida_con_escrituras(client: TestClient):
+    estadisticas_cache.invalidar()
+    _crear(client, "A", 10.0)
+    assert client.get("/productos/stats/resumen").json()["total"] == 1
+    hits = estadisticas_cache.hits
+    assert client.get("/productos/stats/resumen").json()["total"] == 1
+    assert estadisticas_cache.hits == hits + 1
+
+    # Alta por el ORM y alta masiva (insert del bulk) invalidan al confirmar
+    _crear(client, "B", 20.0)
+    assert client.get("/productos/stats/resumen").json()["total"] == 2
+    client.post("/productos/bulk", json=[{"nombre": "C", "precio": 30.0, "descripcion": "x"}])
+    data = client.get("/productos/stats/resumen").json()
+    assert (data["total"], data["precio_max"]) == (3, 30.0)
+
+    producto_id = client.get("/productos/").json()[0]["id"]
+    client.delete(f"/productos/{producto_id}")
+    assert client.get("/productos/stats/resumen").json()["total"] == 2
+
+
+def test_cache_solo_escucha_las_sesiones_registradas():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session, sessionmaker
+
+    from . import models
+    from .database import Base
+    from .estadisticas import EstadisticasCache
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    cache = EstadisticasCache()
+    Registrada = sessionmaker(bind=engine)
+    cache.attach(Registrada)
+    cache.attach(Registrada)
+
+    with Session(engine) as db:
+        db.add(models.Producto(nombre="Ajena", precio=1.0, descripcion="x"))
+        db.commit()
+    assert cache.version == 0
+    with Registrada() as db:
+        db.add(models.Producto(nombre="Propia", precio=2.0, descripcion="x"))
+        db.commit()
+    assert cache.version == 1
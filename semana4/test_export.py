@@ -0,0 +1,29 @@
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+from comun import export
+
+
+def test_export_productos_ndjson_y_csv_por_lotes(client: TestClient, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_SIZE", 2)
+    categoria_id = client.post("/categorias/", json={"nombre": "Hogar", "descripcion": "x"}).json()["id"]
+    filas = [{"nombre": f"Silla {i}", "precio": 10.0 + i, "descripcion": "madera, \"roble\"",
+              "categoria_id": categoria_id} for i in range(5)]
+    client.post("/productos/bulk", json=filas)
+
+    response = client.get("/productos/export")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lineas = [json.loads(l) for l in response.text.splitlines()]
+    assert [l["nombre"] for l in lineas] == [f"Silla {i}" for i in range(5)]
+    assert lineas[0]["categoria"] == "Hogar"
+
+    response = client.get("/productos/export", params={"formato": "csv", "q": "Silla 3"})
+    assert 'filename="productos.csv"' in response.headers["content-disposition"]
+    filas_csv = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(filas_csv) == 1
+    assert filas_csv[0]["descripcion"] == 'madera, "roble"'
+
+    assert client.get("/productos/export", params={"formato": "xml"}).status_code == 400
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import anyio
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
+
+from comun.pool_metrics import (INTERNOS_QUEUEPOOL, AsyncQueuePoolInstrumentado, PoolAutoscaler, PoolTelemetry,
+                                QueuePoolInstrumentado, redimensionar_pool, soporta_redimensionar)
+
+
+def _engine(tmp_path, pool_size=1, max_overflow=0, timeout=0.2):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePoolInstrumentado,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=timeout,
+        pool_pre_ping=True,
+    )
+    telemetria = PoolTelemetry()
+    telemetria.attach(engine)
+    return engine, telemetria
+
+
+def _retener(engine, segundos, listo):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        listo.set()
+        time.sleep(segundos)
+
+
+def test_espera_timeout_e_invalidaciones(tmp_path):
+    engine, telemetria = _engine(tmp_path)
+    listo = threading.Event()
+    hilo = threading.Thread(target=_retener, args=(engine, 0.5, listo))
+    hilo.start()
+    listo.wait()
+
+    assert telemetria.snapshot()["in_use"] == 1
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    hilo.join()
+
+    with engine.connect() as conn:
+        conn.invalidate()
+
+    datos = telemetria.snapshot()
+    assert datos["timeouts"] == 1
+    assert datos["espera_ms"]["max"] >= 150
+    assert datos["retenida_max_ms"] >= 400
+    assert datos["invalidaciones"] == 1
+    assert datos["in_use"] == 0
+
+
+def test_autoscaler_crece_con_espera_y_luego_achica(tmp_path):
+    engine, telemetria = _engine(tmp_path)
+    autoscaler = PoolAutoscaler(telemetria, min_size=1, max_size=3, max_overflow_limit=0,
+                                target_wait_ms=20, step=2)
+    listo = threading.Event()
+    hilo = threading.Thread(target=_retener, args=(engine, 0.4, listo))
+    hilo.start()
+    listo.wait()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    decision = autoscaler.tick()
+    assert decision["pool_size"] == [1, 3]
+    # Con el pool más grande ya no hay que esperar a que termine el otro hilo
+    with engine.connect() as c1, engine.connect() as c2:
+        c1.execute(text("SELECT 1"))
+        c2.execute(text("SELECT 1"))
+    hilo.join()
+    assert engine.pool.checkedout() == 0
+
+    # Sin espera y con poco uso vuelve hacia el mínimo
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    telemetria.ventana()
+    assert autoscaler.tick()["pool_size"] == [3, 1]
+    assert engine.pool.size() == 1
+
+
+def test_queuepool_conserva_los_internos_que_usa_redimensionar_pool():
+    # Si falla tras actualizar SQLAlchemy, hay que adaptar redimensionar_pool
+    pool = QueuePool(lambda: None, pool_size=2, max_overflow=3)
+    for attr in INTERNOS_QUEUEPOOL:
+        assert hasattr(pool, attr), attr
+    assert pool._pool.maxsize == 2 and pool._max_overflow == 3
+    assert soporta_redimensionar(pool)
+    redimensionar_pool(pool, 4, 1)
+    assert (pool.size(), pool._max_overflow, pool.overflow()) == (4, 1, -4)
+
+
+def test_telemetria_del_pool_async(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}",
+                                 poolclass=AsyncQueuePoolInstrumentado, pool_size=2, max_overflow=0)
+    telemetria = PoolTelemetry()
+    telemetria.attach(engine.sync_engine)
+
+    async def consultar():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await engine.dispose()
+
+    anyio.run(consultar)
+    datos = telemetria.snapshot()
+    assert datos["checkouts"] == 1
+    assert datos["conexiones"]["creadas"] == 1
+    assert datos["espera_ms"]["max"] >= 0
@@ -114,4 +114,26 @@ def test_validacion_precio_negativo(client: TestClient):
             "descripcion": "Precio negativo"
         }
     )
-    assert response.status_code == 400
\ No newline at end of file
+    assert response.status_code == 400
+
+
+def test_listar_productos_con_cursor(client: TestClient):
+    """Test paginación por cursor: recorre todo sin repetir aunque se inserte entre páginas"""
+    for i in range(5):
+        client.post("/productos/", json={"nombre": f"P{i}", "precio": 1.0 + i, "descripcion": "x"})
+
+    response = client.get("/productos/", params={"cursor": "", "limit": 2})
+    assert response.status_code == 200
+    pagina = response.json()
+    vistos = [p["nombre"] for p in pagina["items"]]
+    assert vistos == ["P0", "P1"]
+
+    # Un insert entre páginas no desplaza la siguiente página
+    client.post("/productos/", json={"nombre": "P5", "precio": 6.0, "descripcion": "x"})
+    while pagina["next_cursor"]:
+        pagina = client.get("/productos/", params={"cursor": pagina["next_cursor"], "limit": 2}).json()
+        vistos += [p["nombre"] for p in pagina["items"]]
+    assert vistos == [f"P{i}" for i in range(6)]
+
+    for cursor in ("no-es-un-cursor", "W251bGxd", "W1tdXQ"):
+        assert client.get("/productos/", params={"cursor": cursor}).status_code == 400
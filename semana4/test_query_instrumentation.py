@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import Base
+from .query_instrumentation import NPlusOneError, QueryInstrumentation
+
+
+def _engine_con_categorias(n: int = 6):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for i in range(n):
+            categoria = models.Categoria(nombre=f"Cat {i}", descripcion="x")
+            categoria.productos = [models.Producto(nombre=f"P{i}", precio=1.0, descripcion="x")]
+            session.add(categoria)
+        session.commit()
+    return engine
+
+
+def test_lazy_categoria_productos_se_marca_como_n_plus_one():
+    """Recorrer Categoria.productos en un loop repite la misma consulta por categoría."""
+    engine = _engine_con_categorias()
+    instrumentation = QueryInstrumentation(threshold=5)
+    instrumentation.attach(engine)
+
+    with Session(engine) as session, instrumentation.request_scope("GET /categorias/") as req:
+        total = sum(len(c.productos) for c in session.query(models.Categoria).all())
+
+    assert total == 6
+    assert req.statements == 7
+    evento = instrumentation.snapshot()["n_plus_one_events"][0]
+    assert evento["repeticiones"] == 6 and "productos" in evento["sql"]
+
+    # Con selectinload son 2 consultas y no hay N+1
+    from sqlalchemy.orm import selectinload
+    instrumentation.strict = True
+    with Session(engine) as session, instrumentation.request_scope("GET /categorias/") as req:
+        session.query(models.Categoria).options(selectinload(models.Categoria.productos)).all()
+    assert req.statements == 2
+
+    with Session(engine) as session, pytest.raises(NPlusOneError):
+        with instrumentation.request_scope("GET /categorias/"):
+            [c.productos for c in session.query(models.Categoria).all()]
+
+
+def test_headers_de_consultas_por_request(client):
+    response = client.get("/categorias/")
+    assert "X-DB-Queries" in response.headers
+    assert client.get("/metrics/sql").status_code == 200
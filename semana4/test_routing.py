@@ -0,0 +1,71 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from . import models
+from .database import Base
+from comun.routing import RoutingSession, registrar_pin_primario
+
+
+def _engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}", connect_args={"check_same_thread": False})
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False})
+    for engine in (primary, replica):
+        Base.metadata.create_all(engine)
+    # La réplica "atrasada" tiene solo una categoría
+    with replica.begin() as conn:
+        conn.execute(models.Categoria.__table__.insert(), {"nombre": "Replica", "descripcion": "r"})
+    return primary, replica
+
+
+def test_lecturas_a_replica_y_escrituras_al_primario(tmp_path):
+    primary, replica = _engines(tmp_path)
+    Sesion = sessionmaker(class_=RoutingSession, primary=primary, replicas=[replica])
+
+    with Sesion() as db:
+        assert [c.nombre for c in db.query(models.Categoria)] == ["Replica"]
+
+        db.add(models.Categoria(nombre="Nueva", descripcion="n"))
+        db.commit()
+        # Read-your-writes: después de escribir, la sesión lee del primario
+        assert [c.nombre for c in db.query(models.Categoria)] == ["Nueva"]
+
+    with Sesion() as db:
+        assert [c.nombre for c in db.query(models.Categoria)] == ["Replica"]
+        db.execute(update(models.Categoria).values(descripcion="x"))
+        assert [c.nombre for c in db.query(models.Categoria)] == ["Nueva"]
+
+    # Sin réplicas se comporta como una sesión normal sobre el primario
+    with sessionmaker(class_=RoutingSession, primary=primary, replicas=[])() as db:
+        assert db.query(models.Categoria).count() == 1
+
+
+def test_cookie_fija_al_cliente_en_el_primario_tras_escribir(tmp_path):
+    primary, replica = _engines(tmp_path)
+    Sesion = sessionmaker(class_=RoutingSession, primary=primary, replicas=[replica])
+
+    def get_db():
+        with Sesion() as db:
+            yield db
+
+    app = FastAPI()
+    registrar_pin_primario(app, segundos=5)
+
+    @app.get("/categorias")
+    def listar(db=Depends(get_db)):
+        return [c.nombre for c in db.query(models.Categoria)]
+
+    @app.post("/categorias")
+    def crear(db=Depends(get_db)):
+        db.add(models.Categoria(nombre="Nueva", descripcion="n"))
+        db.commit()
+        return {"ok": True}
+
+    escritor = TestClient(app)
+    otro = TestClient(app)
+    assert escritor.get("/categorias").json() == ["Replica"]
+    respuesta = escritor.post("/categorias")
+    assert "primary_until" in respuesta.cookies
+    assert escritor.get("/categorias").json() == ["Nueva"]
+    assert otro.get("/categorias").json() == ["Replica"]
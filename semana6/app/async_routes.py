@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from .database import engine, get_async_db
+from comun.export import exportar
+from .models import User, Proyecto
+from .schemas import ProyectoCreate, ProyectoResponse
+from .auth import get_current_user_async
+
+# Router de proyectos en versión async (DB_MODE=async): mismas rutas que en main.py
+router = APIRouter(prefix="/garden")
+
+
+async def _proyecto_o_404(db: AsyncSession, proyecto_id: int) -> Proyecto:
+    db_proyecto = await db.get(Proyecto, proyecto_id)
+    if not db_proyecto:
+        raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+    return db_proyecto
+
+
+@router.post("/proyectos/", response_model=ProyectoResponse, status_code=status.HTTP_201_CREATED)
+async def create_proyecto(
+    proyecto_data: ProyectoCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    db_proyecto = Proyecto(
+        **proyecto_data.model_dump(),
+        creado_por_id=current_user.id,
+    )
+    db.add(db_proyecto)
+    await db.commit()
+    await db.refresh(db_proyecto)
+    return db_proyecto
+
+
+@router.get("/proyectos/", response_model=List[ProyectoResponse])
+async def get_proyectos(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    return (await db.scalars(select(Proyecto))).all()
+
+
+@router.get("/proyectos/export")
+async def export_proyectos(formato: str = "ndjson", current_user: User = Depends(get_current_user_async)):
+    """Export en streaming: el generador usa el engine síncrono con cursor del servidor (en el threadpool)."""
+    stmt = select(
+        Proyecto.id, Proyecto.nombre, Proyecto.precio, Proyecto.fecha_inicio, Proyecto.estado,
+        Proyecto.servicios_incluidos, Proyecto.creado_por_id,
+    ).order_by(Proyecto.id)
+    return exportar(engine, stmt, "proyectos", formato)
+
+
+@router.get("/proyectos/{proyecto_id}", response_model=ProyectoResponse)
+async def get_proyecto_by_id(
+    proyecto_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    return await _proyecto_o_404(db, proyecto_id)
+
+
+@router.put("/proyectos/{proyecto_id}", response_model=ProyectoResponse)
+async def update_proyecto(
+    proyecto_id: int,
+    proyecto_data: ProyectoCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    db_proyecto = await _proyecto_o_404(db, proyecto_id)
+    if db_proyecto.creado_por_id != current_user.id:
+        raise HTTPException(
+            status_code=403, detail="No tienes permisos para actualizar este proyecto"
+        )
+
+    for key, value in proyecto_data.model_dump().items():
+        setattr(db_proyecto, key, value)
+
+    await db.commit()
+    await db.refresh(db_proyecto)
+    return db_proyecto
+
+
+@router.delete("/proyectos/{proyecto_id}", status_code=status.HTTP_200_OK)
+async def delete_proyecto(
+    proyecto_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    db_proyecto = await _proyecto_o_404(db, proyecto_id)
+    if db_proyecto.creado_por_id != current_user.id:
+        raise HTTPException(
+            status_code=403, detail="No tienes permisos para eliminar este proyecto"
+        )
+
+    await db.delete(db_proyecto)
+    await db.commit()
+    return {"message": "Proyecto eliminado exitosamente."}
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 import warnings
@@ -7,7 +8,8 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-from .database import engine, Base, get_db
+from .database import engine, Base, get_db, DB_MODE, pool_autoscaler, pool_telemetry, async_pool_telemetry
+from .async_routes import router as async_router
 from .models import User, Proyecto
 from .schemas import (
     UserRegister,
@@ -17,6 +19,9 @@ from .schemas import (
     ProyectoCreate,
     ProyectoResponse,
 )
+from comun.bulkhead import bulkhead_route, en_bulkhead, metricas_bulkheads
+from comun.export import exportar
+from comun.routing import registrar_pin_primario
 from .auth import (
     get_password_hash,
     verify_password,
@@ -28,13 +33,16 @@ from .auth import (
 # --- Inicialización de la app ---
 app = FastAPI()
 
-# Router para proyectos
-router = APIRouter(prefix="/garden")
+# Tras una escritura, el cliente lee del primario unos segundos (cookie)
+registrar_pin_primario(app)
+
+# Router para proyectos (con su propio bulkhead)
+router = APIRouter(prefix="/garden", route_class=bulkhead_route("proyectos"))
 
 # -----------------
 # Endpoints de Autenticación
 # -----------------
-@app.post("/register", response_model=UserResponse)
+@app.post("/register", response_model=UserResponse, dependencies=[en_bulkhead("auth")])
 def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
     db_user = db.query(User).filter(User.username == user_data.username).first()
     if db_user:
@@ -53,7 +61,7 @@ def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
     return new_user
 
 
-@app.post("/login", response_model=Token)
+@app.post("/login", response_model=Token, dependencies=[en_bulkhead("auth")])
 def login_for_access_token(user_data: UserLogin, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == user_data.username).first()
     if not user or not verify_password(user_data.password, user.hashed_password):
@@ -66,17 +74,17 @@ def login_for_access_token(user_data: UserLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@app.get("/users/me", response_model=UserResponse)
+@app.get("/users/me", response_model=UserResponse, dependencies=[en_bulkhead("auth")])
 def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-@app.get("/protected")
+@app.get("/protected", dependencies=[en_bulkhead("auth")])
 def protected_endpoint(current_user: User = Depends(get_current_user)):
     return {"message": f"Hello {current_user.username}, you are authenticated."}
 
 
-@app.get("/admin-only")
+@app.get("/admin-only", dependencies=[en_bulkhead("auth")])
 def admin_only_endpoint(current_user: User = Depends(require_admin)):
     return {"message": "Welcome, Admin. This is a restricted area."}
 
@@ -109,6 +117,20 @@ def get_proyectos(
     return proyectos
 
 
+@router.get("/proyectos/export")
+def export_proyectos(
+    formato: str = "ndjson",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Todos los proyectos en streaming (NDJSON o CSV) para los reportes nocturnos."""
+    stmt = select(
+        Proyecto.id, Proyecto.nombre, Proyecto.precio, Proyecto.fecha_inicio, Proyecto.estado,
+        Proyecto.servicios_incluidos, Proyecto.creado_por_id,
+    ).order_by(Proyecto.id)
+    return exportar(db.get_bind(clause=stmt), stmt, "proyectos", formato)
+
+
 @router.get("/proyectos/{proyecto_id}", response_model=ProyectoResponse)
 def get_proyecto_by_id(
     proyecto_id: int,
@@ -165,7 +187,18 @@ def delete_proyecto(
     return {"message": "Proyecto eliminado exitosamente."}
 
 
+@app.get("/metrics/bulkheads")
+async def metricas_de_bulkheads():
+    return metricas_bulkheads()
+
+
+@app.get("/metrics/pool")
+async def metricas_pool():
+    return {**pool_telemetry.snapshot(), "autoscaler": pool_autoscaler.estado(),
+            "async": async_pool_telemetry.snapshot() if async_pool_telemetry.engine is not None else None}
+
+
 # -----------------
-# Registrar el router al final
+# Registrar el router al final (DB_MODE=async usa la versión con AsyncSession)
 # -----------------
-app.include_router(router)
+app.include_router(async_router if DB_MODE == "async" else router)
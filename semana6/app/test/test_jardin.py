@@ -117,4 +117,16 @@ class TestJardineriaAPI:
         )
         assert response.status_code == 422
         errors = response.json()["detail"]
-        assert any("value is greater than 0" in str(error) for error in errors)
\ No newline at end of file
+        assert any("value is greater than 0" in str(error) for error in errors)
+    def test_export_proyectos_ndjson(self, client, session: Session, sample_proyecto_data, auth_headers):
+        """Test del export en streaming: una línea JSON por proyecto."""
+        import json
+        user = session.query(User).first()
+        session.add(Proyecto(**sample_proyecto_data, creado_por_id=user.id))
+        session.commit()
+
+        response = client.get("/garden/proyectos/export", headers=auth_headers)
+        assert response.status_code == 200
+        filas = [json.loads(linea) for linea in response.text.splitlines()]
+        assert filas[-1]["nombre"] == sample_proyecto_data["nombre"]
+        assert filas[-1]["servicios_incluidos"] == sample_proyecto_data["servicios_incluidos"]
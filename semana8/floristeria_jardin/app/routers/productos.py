@@ -4,8 +4,9 @@ from typing import List
 from app.db.database import get_db
 from app.schemas.producto import ProductoCreate, ProductoUpdate, ProductoResponse
 from app.services import producto_service
+from comun.bulkhead import bulkhead_route
 
-router = APIRouter(prefix="/productos", tags=["Productos"])
+router = APIRouter(prefix="/productos", tags=["Productos"], route_class=bulkhead_route("productos"))
 
 @router.post("/", response_model=ProductoResponse, status_code=201)
 def crear_producto(producto: ProductoCreate, db: Session = Depends(get_db)):